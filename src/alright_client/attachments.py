@@ -0,0 +1,418 @@
+"""Streaming reader for deal attachments in data boxes.
+
+algod only returns whole boxes, so ranges are read through the read-only
+read_data method under simulate, which needs no signature or fee. DataBoxReader
+is a file-like object that fetches fixed-size chunks lazily, prefetching the
+next few in a thread pool, which close() shuts down. open_attachments opens
+both accounts' data boxes of a deal concurrently.
+
+A data box sealed with seal_data (DataSealedFlag in that account's data byte)
+ends with sha256 of the data before it. The sender computes the digest and the
+contract stores it as given, so only readers check it. The reader hides those
+32 bytes, hashes the data as it is read in order and raises IntegrityError on
+a mismatch once the end is reached.
+
+Attachments are usually text that compresses well, and data boxes cost
+BoxByteMBR per byte. prepare_attachment frames the data as independently
+zlib-compressed chunks behind an index, so a range still maps to a few frames.
+A write at index 0 whose data_index carries CompressedWriteFlag makes
+attach_data set DataCompressedFlag, and one without it clears the flag, so the
+method's signature stays as it was. open_attachments then wraps a flagged box
+in a CompressedReader, which decompresses only the frames a read touches.
+"""
+
+import base64
+import hashlib
+import io
+import struct
+import zlib
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from algosdk import abi, transaction
+from algosdk.v2client.models import SimulateRequest, SimulateRequestTransactionGroup
+
+from alright_client.layout import (
+    CompressedWriteFlag,
+    DataAttachedFlag,
+    DataCompressedFlag,
+    DataSealedFlag,
+    data_box_cost,
+)
+from alright_client.relayer import BoxBudgetSelector, MaxAppReferences, box_refs_needed
+
+# (offset, length) -> (data box length, bytes from offset)
+Fetch = Callable[[int, int], tuple[int, bytes]]
+
+DataBoxMaxLength = 32768
+ChunkSize = 4032  # read_data returns 8 + chunk bytes under the 4096 stack limit
+DigestLength = 32
+# App args of attach_data besides the data take 63 of the 2048 bytes allowed
+AttachChunkSize = 1984
+
+FrameMagic = b"ALZ\x01"
+# Magic, plain bytes per frame, frame count, plain length. Then one uint32 end
+# offset per frame, counted from the end of that index, then the frames.
+FrameHeader = struct.Struct(">4sIIQ")
+FrameSize = 16384
+
+ReadDataSelector = abi.Method.from_signature(
+    "read_data(byte[64],uint64,uint64)byte[]"
+).get_selector()
+
+
+class IntegrityError(ValueError):
+    pass
+
+
+def data_box_key(address: bytes, deal_key: bytes) -> bytes:
+    # Each account's data box is its address + the deal hash
+    return address + deal_key[1:]
+
+
+class DataBoxReader(io.RawIOBase):
+    def __init__(
+        self,
+        fetch: Fetch,
+        sealed: bool = False,
+        chunk_size: int = ChunkSize,
+        prefetch: int = 4,
+        executor: ThreadPoolExecutor | None = None,
+    ) -> None:
+        super().__init__()
+        self._fetch = fetch
+        self._chunk_size = chunk_size
+        self._prefetch = prefetch
+        self._chunks: dict[int, Future] = {}
+        self._position = 0
+        box_length, first = fetch(0, chunk_size)
+        # A pool passed in belongs to the caller, one made here to close()
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=prefetch)
+        self._chunks[0] = self._done(first)
+        self.sealed = sealed
+        self.length = box_length - DigestLength if sealed else box_length
+        self._box_length = box_length
+        self._hash = hashlib.sha256() if sealed else None
+        self._hashed = 0
+
+    @staticmethod
+    def _done(value: bytes) -> Future:
+        future: Future = Future()
+        future.set_result(value)
+        return future
+
+    def _chunk_future(self, index: int) -> Future:
+        future = self._chunks.get(index)
+        if future is None:
+            future = self._executor.submit(
+                lambda: self._fetch(index * self._chunk_size, self._chunk_size)[1]
+            )
+            self._chunks[index] = future
+        return future
+
+    def _chunk(self, index: int) -> bytes:
+        last = (self._box_length - 1) // self._chunk_size
+        for ahead in range(index + 1, min(index + 1 + self._prefetch, last + 1)):
+            self._chunk_future(ahead)
+        return self._chunk_future(index).result()
+
+    def close(self) -> None:
+        if not self.closed and self._owns_executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        super().close()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.length
+        self._position = max(0, min(offset, self.length))
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self.length - self._position)
+        if size <= 0:
+            return 0
+        index, start = divmod(self._position, self._chunk_size)
+        data = self._chunk(index)[start : start + size]
+        buffer[: len(data)] = data
+        if self._hash is not None and self._position == self._hashed:
+            self._hash.update(data)
+            self._hashed += len(data)
+            if self._hashed == self.length:
+                self._check_digest()
+        self._position += len(data)
+        return len(data)
+
+    def _digest(self) -> bytes:
+        digest = b""
+        offset = self.length
+        while len(digest) < DigestLength:
+            index, start = divmod(offset + len(digest), self._chunk_size)
+            digest += self._chunk(index)[start : start + DigestLength - len(digest)]
+        return digest
+
+    def _check_digest(self) -> None:
+        if self._hash.digest() != self._digest():
+            raise IntegrityError("Attachment does not match its sealed digest")
+
+    def verify(self) -> bool:
+        # Hash whatever has not been read in order yet, without moving the reader
+        if self._hash is None:
+            return False
+        position = self._position
+        self.seek(self._hashed)
+        while self._hashed < self.length:
+            self.read(self._chunk_size)
+        self.seek(position)
+        return True
+
+
+class SimulateFetcher:
+    """Calls read_data under simulate for one data box.
+
+    `sender` only has to exist with enough Algos for the fees. The read is
+    padded with box_budget calls so the group's box refs cover the box.
+    """
+
+    def __init__(self, algod_client, app_id: int, sender: str, data_key: bytes):
+        self.algod_client = algod_client
+        self.app_id = app_id
+        self.sender = sender
+        self.data_key = data_key
+        # Unknown until the first read, so that one covers the largest box
+        self.box_length = DataBoxMaxLength
+
+    def __call__(self, offset: int, length: int) -> tuple[int, bytes]:
+        sp = self.algod_client.suggested_params()
+        refs = box_refs_needed(self.box_length)
+        txns = []
+        while refs > MaxAppReferences:
+            txns.append(
+                transaction.ApplicationNoOpTxn(
+                    self.sender,
+                    sp,
+                    self.app_id,
+                    app_args=[BoxBudgetSelector],
+                    boxes=[(0, b"")] * MaxAppReferences,
+                )
+            )
+            refs -= MaxAppReferences
+        txns.append(
+            transaction.ApplicationNoOpTxn(
+                self.sender,
+                sp,
+                self.app_id,
+                app_args=[
+                    ReadDataSelector,
+                    self.data_key,
+                    offset.to_bytes(8, "big"),
+                    length.to_bytes(8, "big"),
+                ],
+                boxes=[(0, self.data_key)] + [(0, b"")] * (refs - 1),
+            )
+        )
+        if len(txns) > 1:
+            txns = transaction.assign_group_id(txns)
+        response = self.algod_client.simulate_transactions(
+            SimulateRequest(
+                txn_groups=[
+                    SimulateRequestTransactionGroup(
+                        txns=[transaction.SignedTransaction(txn, None) for txn in txns]
+                    )
+                ],
+                allow_empty_signatures=True,
+                allow_more_logs=True,
+            )
+        )
+        group = response["txn-groups"][0]
+        if group.get("failure-message"):
+            raise RuntimeError(group["failure-message"])
+        # ABI return log: 4-byte prefix + uint16 length + box length + data
+        returned = base64.b64decode(group["txn-results"][-1]["txn-result"]["logs"][-1])
+        box_length = int.from_bytes(returned[6:14], "big")
+        self.box_length = box_length
+        return box_length, returned[14:]
+
+
+def open_attachments(
+    fetcher: Callable[[bytes], Fetch],
+    deal_key: bytes,
+    deal,
+    **reader_options,
+) -> dict[bytes, io.RawIOBase | None]:
+    """Open both accounts' data boxes of a deal at once.
+
+    `fetcher` builds a Fetch for a data box key, e.g.
+    lambda key: SimulateFetcher(algod_client, app_id, sender, key). Accounts
+    without an attachment map to None. Compressed boxes come back wrapped in a
+    CompressedReader, whose reads are already decompressed. Close the readers,
+    e.g. with `with`, to stop their prefetch threads.
+    """
+    accounts = (
+        (deal.first_acc_address, deal.first_acc_data),
+        (deal.second_acc_address, deal.second_acc_data),
+    )
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = {
+            address: pool.submit(
+                DataBoxReader,
+                fetcher(data_box_key(address, deal_key)),
+                bool(flags & DataSealedFlag),
+                **reader_options,
+            )
+            for address, flags in accounts
+            if flags & DataAttachedFlag
+        }
+    readers = {}
+    try:
+        for address, flags in accounts:
+            reader = futures[address].result() if address in futures else None
+            if reader is not None and flags & DataCompressedFlag:
+                reader = CompressedReader(reader)
+            readers[address] = reader
+    except Exception:
+        # Close the readers that did open before passing the error on
+        for future in futures.values():
+            if future.exception() is None:
+                future.result().close()
+        raise
+    return readers
+
+
+def compress_frames(data: bytes, frame_size: int = FrameSize, level: int = 9) -> bytes:
+    frames = [
+        zlib.compress(data[i : i + frame_size], level)
+        for i in range(0, len(data), frame_size)
+    ]
+    ends, end = [], 0
+    for frame in frames:
+        end += len(frame)
+        ends.append(end)
+    return b"".join(
+        (
+            FrameHeader.pack(FrameMagic, frame_size, len(frames), len(data)),
+            struct.pack(f">{len(ends)}I", *ends),
+            *frames,
+        )
+    )
+
+
+def prepare_attachment(
+    data: bytes, compress: bool = True, seal: bool = False
+) -> tuple[int, list[tuple[int, bytes]], bytes | None]:
+    """data_length, the (data_index, data) writes and the digest for seal_data.
+
+    Compressed frames are used when they are smaller, and then the first
+    write's data_index carries CompressedWriteFlag. With seal, the box keeps
+    32 bytes at the end for the digest. Send the writes in order, as the first
+    one sets or clears the compressed flag. The deal's Algo deposits must
+    cover data_box_cost(data_length).
+    """
+    payload = data
+    compressed = False
+    if compress:
+        framed = compress_frames(data)
+        if len(framed) < len(data):
+            payload, compressed = framed, True
+    data_length = len(payload) + (DigestLength if seal else 0)
+    if data_length > DataBoxMaxLength:
+        raise ValueError(f"Attachment needs {data_length} bytes of data box")
+    writes = [
+        (i, payload[i : i + AttachChunkSize])
+        for i in range(0, len(payload), AttachChunkSize)
+    ]
+    if compressed:
+        writes[0] = (CompressedWriteFlag, writes[0][1])
+    digest = hashlib.sha256(payload).digest() if seal else None
+    return data_length, writes, digest
+
+
+class CompressedReader(io.RawIOBase):
+    """Reads the plain data of compressed frames from a seekable raw reader.
+
+    Keeps the last `cached_frames` decompressed frames.
+    """
+
+    def __init__(self, raw: io.RawIOBase, cached_frames: int = 2) -> None:
+        super().__init__()
+        self._raw = raw
+        magic, self._frame_size, count, self.length = FrameHeader.unpack(
+            self._read_raw(0, FrameHeader.size)
+        )
+        if magic != FrameMagic:
+            raise ValueError("Not compressed frames")
+        self._data_start = FrameHeader.size + 4 * count
+        self._ends = (
+            0,
+            *struct.unpack(f">{count}I", self._read_raw(FrameHeader.size, 4 * count)),
+        )
+        self._frames: OrderedDict[int, bytes] = OrderedDict()
+        self._cached_frames = cached_frames
+        self._position = 0
+
+    def close(self) -> None:
+        self._raw.close()
+        super().close()
+
+    def _read_raw(self, offset: int, size: int) -> bytes:
+        self._raw.seek(offset)
+        data = b""
+        while len(data) < size:
+            chunk = self._raw.read(size - len(data))
+            if not chunk:
+                raise ValueError("Compressed frames end early")
+            data += chunk
+        return data
+
+    def _frame(self, index: int) -> bytes:
+        frame = self._frames.get(index)
+        if frame is None:
+            start, end = self._ends[index], self._ends[index + 1]
+            frame = zlib.decompress(
+                self._read_raw(self._data_start + start, end - start)
+            )
+            self._frames[index] = frame
+            if len(self._frames) > self._cached_frames:
+                self._frames.popitem(last=False)
+        else:
+            self._frames.move_to_end(index)
+        return frame
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.length
+        self._position = max(0, min(offset, self.length))
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self.length - self._position)
+        if size <= 0:
+            return 0
+        index, start = divmod(self._position, self._frame_size)
+        data = self._frame(index)[start : start + size]
+        buffer[: len(data)] = data
+        self._position += len(data)
+        return len(data)
@@ -0,0 +1,113 @@
+"""Portfolio benchmark: load_portfolios against reading accounts one by one.
+
+LocalBoxStore stands in for algod: boxes live in a dict and every read sleeps
+for `latency` seconds, like one round trip. Each account gets a full deal list,
+with every deal shared by two of the accounts.
+
+    python -m alright_client.bench_portfolio [accounts] [latency ms] [workers]
+"""
+
+import hashlib
+import sys
+import time
+
+from alright_client.layout import (
+    Deal,
+    DealListSlots,
+    ZeroDealKey,
+    create_deal_key,
+    decode_deal,
+    deal_list_keys,
+    encode_deal,
+)
+from alright_client.portfolio import load_portfolios
+
+
+class LocalBoxStore:
+    def __init__(self, latency: float) -> None:
+        self.boxes: dict[bytes, bytes] = {}
+        self.latency = latency
+        self.reads = 0
+
+    def __call__(self, name: bytes) -> bytes | None:
+        self.reads += 1
+        time.sleep(self.latency)
+        return self.boxes.get(name)
+
+
+def populate(store: LocalBoxStore, accounts: int) -> list[bytes]:
+    # Account i deals with the next DealListSlots accounts, and they with it
+    addresses = [hashlib.sha256(i.to_bytes(4, "big")).digest() for i in range(accounts)]
+    lists = {address: [] for address in addresses}
+    per_account = DealListSlots // 2
+    for i, address in enumerate(addresses):
+        for step in range(1, per_account + 1):
+            other = addresses[(i + step) % accounts]
+            note = f"deal {i} {step}".encode()
+            deal_key = create_deal_key(address, other, note)
+            first, second = max(address, other), min(address, other)
+            store.boxes[deal_key] = encode_deal(
+                Deal._make(
+                    (2, 2, first, 10**6, 0, 0, 0, second, 5, 31566704)
+                    + (0,) * 6
+                    + (note,)
+                )
+            )
+            lists[address].append(deal_key)
+            lists[other].append(deal_key)
+    for address, keys in lists.items():
+        keys = keys[:DealListSlots]
+        store.boxes[address] = b"".join(keys) + ZeroDealKey * (
+            DealListSlots - len(keys)
+        )
+    return addresses
+
+
+def load_sequential(fetch, addresses: list[bytes]) -> dict[bytes, list[Deal]]:
+    # The deal list, then each deal box, one read at a time
+    portfolios = {}
+    for address in addresses:
+        deal_list = fetch(address)
+        if deal_list is None:
+            continue
+        portfolios[address] = [
+            decode_deal(value)
+            for deal_key in deal_list_keys(deal_list)
+            if deal_key != ZeroDealKey and (value := fetch(deal_key)) is not None
+        ]
+    return portfolios
+
+
+def main(accounts: int = 200, latency_ms: float = 2.0, workers: int = 64) -> None:
+    store = LocalBoxStore(latency_ms / 1000)
+    addresses = populate(store, accounts)
+    print(f"{accounts} accounts, {latency_ms} ms per read, {workers} workers")
+    print(f"{'loader':<20}{'reads':>10}{'seconds':>10}{'deals':>10}")
+
+    store.reads = 0
+    started = time.perf_counter()
+    sequential = load_sequential(store, addresses)
+    elapsed = time.perf_counter() - started
+    deals = sum(len(deals) for deals in sequential.values())
+    print(f"{'sequential':<20}{store.reads:>10}{elapsed:>10.2f}{deals:>10}")
+
+    store.reads = 0
+    started = time.perf_counter()
+    portfolio = load_portfolios(store, addresses, max_workers=workers)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{'load_portfolios':<20}{store.reads:>10}{elapsed:>10.2f}{len(portfolio):>10}"
+    )
+
+    for address in addresses:
+        if [deal for _, _, deal in portfolio.deals_of(address)] != sequential[address]:
+            raise AssertionError("Loaders disagree")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(
+        int(args[0]) if args else 200,
+        float(args[1]) if len(args) > 1 else 2.0,
+        int(args[2]) if len(args) > 2 else 64,
+    )
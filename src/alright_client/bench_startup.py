@@ -0,0 +1,62 @@
+"""Startup benchmark: import time of the runtime module against the alternatives.
+
+Each candidate is imported in a fresh interpreter, `runs` times, and the
+median import time and whole-process wall time are printed. Candidates that
+cannot be imported here, such as the contract without its build tooling,
+are reported as unavailable.
+
+    python -m alright_client.bench_startup [runs]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+Candidates = {
+    "runtime": "import alright_client.runtime",
+    "layout + algosdk.abi": "import alright_client.layout, algosdk.abi",
+    "contract (pyteal, beaker)": "import alright",
+}
+Probe = (
+    "import time; started = time.perf_counter(); {statement}; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def measure(statement: str, runs: int) -> tuple[float, float] | None:
+    # (median import seconds, median process seconds), or None if it fails
+    src = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, (src, os.environ.get("PYTHONPATH")))),
+    )
+    imports, processes = [], []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", Probe.format(statement=statement)],
+            capture_output=True,
+            text=True,
+            env=env,
+        )
+        processes.append(time.perf_counter() - started)
+        if result.returncode != 0:
+            return None
+        imports.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(imports), statistics.median(processes)
+
+
+def main(runs: int = 10) -> None:
+    print(f"{'candidate':<28}{'import ms':>12}{'process ms':>12}")
+    for name, statement in Candidates.items():
+        timing = measure(statement, runs)
+        if timing is None:
+            print(f"{name:<28}{'unavailable':>24}")
+        else:
+            print(f"{name:<28}{timing[0] * 1000:>12.2f}{timing[1] * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
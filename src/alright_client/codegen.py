@@ -0,0 +1,304 @@
+"""Generate alright_client/runtime.py from the built app spec.
+
+runtime.py is a standalone module for short-lived processes: method selectors,
+app-arg encoders and return decoders for every ABI method, the fixed-offset
+deal decoder and box key derivation. It needs only the standard library, so it
+loads without pyteal, beaker or algosdk. Regenerate it after every build:
+
+    python -m alright_client.codegen artifacts src/alright_client/runtime.py
+"""
+
+import hashlib
+import inspect
+import json
+import re
+import sys
+from pathlib import Path
+
+from alright_client import layout
+
+MaxAppArgs = 16  # Selector + 15 ABI args, ARC-4 packs anything beyond in a tuple
+TxnTypes = {"txn", "pay", "keyreg", "acfg", "axfer", "afrz", "appl"}
+# Reference type -> (local list for the Call, index of the first entry it adds)
+# The locals are prefixed so they cannot shadow a parameter, e.g. assets
+ReferenceTypes = {
+    "account": ("_foreign_accounts", 1),
+    "asset": ("_foreign_assets", 0),
+    "application": ("_foreign_apps", 1),
+}
+StaticFormats = {
+    "byte": "B",
+    "bool": "?",
+    "uint8": "B",
+    "uint16": "H",
+    "uint32": "I",
+    "uint64": "Q",
+}
+
+Header = '''"""Runtime helpers for AlrightApp, generated by alright_client.codegen.
+
+Do not edit: regenerate it from {source} after every build.
+It imports only struct up front, hashlib on the first key derivation. Each
+method function returns a Call whose app_args, accounts, assets and apps go
+straight into an application call. Transaction arguments are not encoded: they
+are the `txn_args` transactions just before the call in its group.
+"""
+
+import struct
+from typing import NamedTuple
+
+APP_NAME = {name!r}
+RETURN_PREFIX = bytes.fromhex("151f7c75")
+GLOBAL_KEYS = {global_keys!r}
+RESERVED_PREFIXES = {reserved!r}
+
+
+class Call(NamedTuple):
+    app_args: list
+    accounts: list
+    assets: list
+    apps: list
+    txn_args: int
+
+
+def _u64(value):
+    return value.to_bytes(8, "big")
+
+
+def _fixed(value, length):
+    if len(value) != length:
+        raise ValueError(f"Expected {{length}} bytes, got {{len(value)}}")
+    return bytes(value)
+
+
+def _dynamic(value):
+    if isinstance(value, str):
+        value = value.encode()
+    return len(value).to_bytes(2, "big") + value
+
+
+def _array(items, encode):
+    items = list(items)
+    return len(items).to_bytes(2, "big") + b"".join(encode(item) for item in items)
+
+
+def _reference(refs, value, first_index):
+    # Index into the call's foreign array, added on first use
+    if value not in refs:
+        refs.append(value)
+    return (refs.index(value) + first_index).to_bytes(1, "big")
+
+
+def _bytes_return(value):
+    return value[2:]
+
+
+def _string_return(value):
+    return value[2:].decode()
+
+
+def _uint64_return(value):
+    return int.from_bytes(value, "big")
+
+'''
+
+
+def static_tuple_format(abi_type: str) -> str | None:
+    # "(byte,uint64,...)" of fixed-width scalars -> struct format, else None
+    match = re.fullmatch(r"\((.*)\)", abi_type)
+    if not match:
+        return None
+    formats = [StaticFormats.get(part) for part in match.group(1).split(",")]
+    if None in formats:
+        return None
+    return ">" + "".join(formats)
+
+
+def arg_encoder(abi_type: str, name: str, structs: dict[str, str]) -> str:
+    if abi_type in ReferenceTypes:
+        refs, first_index = ReferenceTypes[abi_type]
+        return f"_reference({refs}, {name}, {first_index})"
+    if abi_type == "uint64":
+        return f"_u64({name})"
+    if abi_type in ("byte", "uint8"):
+        return f"{name}.to_bytes(1, 'big')"
+    if abi_type == "address":
+        return f"_fixed({name}, 32)"
+    if abi_type in ("string", "byte[]"):
+        return f"_dynamic({name})"
+    if match := re.fullmatch(r"byte\[(\d+)\]", abi_type):
+        return f"_fixed({name}, {match.group(1)})"
+    if abi_type == "uint64[]":
+        return f"_array({name}, _u64)"
+    if match := re.fullmatch(r"byte\[(\d+)\]\[\]", abi_type):
+        return f"_array({name}, lambda item: _fixed(item, {match.group(1)}))"
+    if abi_type.endswith("[]") and (fmt := static_tuple_format(abi_type[:-2])):
+        struct_name = structs.setdefault(fmt, f"_STRUCT_{len(structs)}")
+        return f"_array({name}, lambda item: {struct_name}.pack(*item))"
+    raise ValueError(f"No runtime encoder for ABI type {abi_type}")
+
+
+def return_decoder(abi_type: str) -> str | None:
+    if abi_type == "void":
+        return None
+    if abi_type == "uint64":
+        return "_uint64_return"
+    if abi_type == "string":
+        return "_string_return"
+    if abi_type == "byte[]":
+        return "_bytes_return"
+    if abi_type == "address" or re.fullmatch(r"byte\[\d+\]", abi_type):
+        return "bytes"
+    raise ValueError(f"No runtime decoder for ABI type {abi_type}")
+
+
+def method_source(method: dict, structs: dict[str, str]) -> tuple[str, str]:
+    args = method["args"]
+    signature = "{}({}){}".format(
+        method["name"],
+        ",".join(arg["type"] for arg in args),
+        method["returns"]["type"],
+    )
+    selector = hashlib.new("sha512_256", signature.encode()).digest()[:4]
+    constant = method["name"].upper()
+    value_args = [arg for arg in args if arg["type"] not in TxnTypes]
+    if len(value_args) + 1 > MaxAppArgs:
+        raise ValueError(f"{signature} needs ARC-4 tuple packing")
+    params = ", ".join(arg["name"] for arg in value_args)
+    encoded = "".join(
+        f"            {arg_encoder(arg['type'], arg['name'], structs)},\n"
+        for arg in value_args
+    )
+    source = (
+        f"# {signature}\n"
+        f"{constant} = bytes.fromhex({selector.hex()!r})\n\n\n"
+        f"def {method['name']}({params}) -> Call:\n"
+        f"    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []\n"
+        f"    return Call(\n"
+        f"        [\n"
+        f"            {constant},\n"
+        f"{encoded}"
+        f"        ],\n"
+        f"        _foreign_accounts,\n"
+        f"        _foreign_assets,\n"
+        f"        _foreign_apps,\n"
+        f"        {len(args) - len(value_args)},\n"
+        f"    )\n"
+    )
+    return signature, source
+
+
+def generate(contract: dict, application: dict, source: str) -> str:
+    structs: dict[str, str] = {}
+    methods = [method_source(method, structs) for method in contract["methods"]]
+    schema = application["schema"]["global"]
+    parts = [
+        Header.format(
+            source=source,
+            name=contract["name"],
+            global_keys=tuple(sorted(schema["declared"])),
+            reserved=tuple(sorted(schema["reserved"])),
+        )
+    ]
+    parts += [f"{name} = struct.Struct({fmt!r})\n" for fmt, name in structs.items()]
+    parts += ["\n" + method + "\n" for _, method in methods]
+    parts.append(
+        "\nSELECTORS = {\n"
+        + "".join(
+            f"    {signature.split('(')[0].upper()}: {signature!r},\n"
+            for signature, _ in methods
+        )
+        + "}\n"
+        + "RETURN_DECODERS = {\n"
+        + "".join(
+            f"    {method['name'].upper()}: {return_decoder(method['returns']['type'])},\n"
+            for method in contract["methods"]
+        )
+        + "}\n"
+    )
+    parts.append("""
+
+def decode_return(selector, log):
+    # Last log of an app call, decoded for the method with that selector
+    if log[:4] != RETURN_PREFIX:
+        raise ValueError("Not an ARC-4 return log")
+    decoder = RETURN_DECODERS[selector]
+    return None if decoder is None else decoder(log[4:])
+
+""")
+    # Deal layout and key derivation, copied from alright_client.layout
+    parts.append(
+        f"\n# Deal box layout\n"
+        f"DealHeader = struct.Struct({layout.DealHeader.format!r})\n"
+        f"DealHeaderLength = {layout.DealHeaderLength}\n"
+        f"DealNoteOffset = {layout.DealNoteOffset}\n"
+        f"DealFields = {layout.Deal._fields!r}\n"
+        f"DealDetailsKeyLength = {layout.DealDetailsKeyLength}\n"
+        f"DealDataKeyLength = {layout.DealDataKeyLength}\n"
+        f"DealListBoxLength = {layout.DealListBoxLength}\n"
+        f"ZeroDealKey = bytes(DealDetailsKeyLength)\n"
+        f"HashedDealKeyPrefix = {layout.HashedDealKeyPrefix!r}\n"
+        f"LegsKeyPrefix = {layout.LegsKeyPrefix!r}\n"
+        f"DataAttachedFlag = {layout.DataAttachedFlag}\n"
+        f"DealLegsFlag = {layout.DealLegsFlag}\n"
+        f"DataSealedFlag = {layout.DataSealedFlag}\n"
+        f"DataCompressedFlag = {layout.DataCompressedFlag}\n"
+        f"CompressedWriteFlag = {layout.CompressedWriteFlag}\n"
+        f"DealVersion = {layout.DealVersion}\n"
+        f"DealVersionShift = {layout.DealVersionShift}\n"
+        f"BoxFlatMBR = {layout.BoxFlatMBR}\n"
+        f"BoxByteMBR = {layout.BoxByteMBR}\n"
+        f"\n\nclass Deal(NamedTuple):\n"
+        + "".join(
+            f"    {field}: {'bytes' if field.endswith('address') or field == 'deal_note' else 'int'}\n"
+            for field in layout.Deal._fields
+        )
+    )
+    for function in (
+        layout.decode_deal,
+        layout.deal_version,
+        layout.deal_box_cost,
+        layout.data_box_cost,
+        layout.legs_box_key,
+        layout.is_hashed_deal,
+        layout.twin_deal_key,
+        layout.deal_list_keys,
+    ):
+        parts.append("\n\n" + inspect.getsource(function))
+    parts.append("""
+
+def create_deal_key(
+    sender: bytes, their_address: bytes, deal_note: bytes, key_prefix: bytes = b"D"
+) -> bytes:
+    # Whichever account is "greater" goes first, as in the contract. Loading
+    # hashlib takes longer than the rest of this module, so it waits until here
+    import hashlib
+
+    if sender > their_address:
+        return key_prefix + hashlib.sha256(sender + their_address + deal_note).digest()
+    return key_prefix + hashlib.sha256(their_address + sender + deal_note).digest()
+
+
+def data_box_key(address: bytes, deal_key: bytes) -> bytes:
+    return address + deal_key[1:]
+""")
+    return "".join(parts)
+
+
+def main(argv: list[str] | None = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    artifacts, output = Path(argv[0]), Path(argv[1])
+    contract = json.loads((artifacts / "contract.json").read_text())
+    application = json.loads((artifacts / "application.json").read_text())
+    source = generate(contract, application, f"{artifacts.name}/contract.json")
+    try:
+        import black
+
+        source = black.format_str(source, mode=black.Mode())
+    except ImportError:
+        pass
+    output.write_text(source)
+
+
+if __name__ == "__main__":
+    main()
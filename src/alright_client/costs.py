@@ -0,0 +1,101 @@
+"""Collector for the cost records of an instrumented contract build.
+
+A build made with ALRIGHT_INSTRUMENT=1 ends every deal method call with a
+CallCostEvent log: method selector, box bytes touched, inner txns sent and the
+opcode budget at entry and exit. CostCollector folds those records into
+per-method histograms and suggests box_budget padding from what it has seen.
+"""
+
+import base64
+import struct
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from typing import NamedTuple
+
+from alright_client.relayer import BoxReadBudget
+from alright_client.stream import iter_transactions
+
+# Mirrors CallCostEvent in alright.py
+CallCostEvent = 0xF0
+CallCostRecord = struct.Struct(">B4sQQQQ")  # 37 bytes
+AppCallBudget = 700  # Opcode budget every app call in the group adds
+
+
+class CallCost(NamedTuple):
+    event: int
+    selector: bytes
+    box_bytes: int
+    inner_txns: int
+    entry_budget: int
+    exit_budget: int
+
+    @property
+    def opcodes(self) -> int:
+        # Budget spent in the method body, after routing
+        return self.entry_budget - self.exit_budget
+
+
+def decode_cost_record(log: bytes) -> CallCost | None:
+    if len(log) != CallCostRecord.size or log[0] != CallCostEvent:
+        return None
+    return CallCost._make(CallCostRecord.unpack(log))
+
+
+def _bucket(value: int) -> int:
+    # Power-of-two histogram buckets, keyed by their upper bound
+    return 1 << max(0, value - 1).bit_length() if value > 0 else 0
+
+
+class CostCollector:
+    def __init__(self, methods: dict[bytes, str] | None = None) -> None:
+        # Selector -> method name, e.g. from replay.method_names
+        self.methods = methods or {}
+        self.calls: Counter[str] = Counter()
+        self.opcodes: defaultdict[str, Counter[int]] = defaultdict(Counter)
+        self.box_bytes: defaultdict[str, Counter[int]] = defaultdict(Counter)
+        self.inner_txns: defaultdict[str, Counter[int]] = defaultdict(Counter)
+        self.peak_opcodes: Counter[str] = Counter()
+        self.peak_box_bytes: Counter[str] = Counter()
+
+    def add(self, cost: CallCost) -> None:
+        method = self.methods.get(cost.selector, cost.selector.hex())
+        self.calls[method] += 1
+        self.opcodes[method][_bucket(cost.opcodes)] += 1
+        self.box_bytes[method][_bucket(cost.box_bytes)] += 1
+        self.inner_txns[method][cost.inner_txns] += 1
+        self.peak_opcodes[method] = max(self.peak_opcodes[method], cost.opcodes)
+        self.peak_box_bytes[method] = max(self.peak_box_bytes[method], cost.box_bytes)
+
+    def add_logs(self, logs: Iterable[bytes]) -> None:
+        for log in logs:
+            cost = decode_cost_record(log)
+            if cost is not None:
+                self.add(cost)
+
+    def add_records(self, records: Iterable[dict]) -> None:
+        # Indexer transaction JSON, e.g. from stream.read_feed
+        b64decode = base64.b64decode
+        for txn in iter_transactions(records):
+            logs = txn.get("logs")
+            if logs:
+                self.add_logs(b64decode(log) for log in logs)
+
+    def histograms(self) -> dict[str, dict[str, dict[int, int]]]:
+        return {
+            method: {
+                "opcodes": dict(sorted(self.opcodes[method].items())),
+                "box_bytes": dict(sorted(self.box_bytes[method].items())),
+                "inner_txns": dict(sorted(self.inner_txns[method].items())),
+            }
+            for method in sorted(self.calls)
+        }
+
+    def suggested_padding(self, method: str) -> tuple[int, int]:
+        """(box refs, box_budget calls) covering the worst call seen so far.
+
+        Box refs are counted across the group, and every extra app call adds
+        another 700 opcodes of budget on top of the method's own call.
+        """
+        box_refs = -(-self.peak_box_bytes[method] // BoxReadBudget)
+        extra_budget = max(0, self.peak_opcodes[method] - AppCallBudget)
+        return box_refs, -(-extra_budget // AppCallBudget)
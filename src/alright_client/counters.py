@@ -0,0 +1,77 @@
+"""Read helper for the deal counters kept in the app's global state.
+
+Besides total_deals, active_deals and completed_deals, count_deal in alright.py
+buckets every matched and completed deal by asset class and by epoch in the
+reserved_global_uint_value slots. deal_counters turns the raw global state into
+those breakdowns in one read, instead of scanning deals.
+"""
+
+import base64
+from typing import NamedTuple
+
+# Mirrors count_deal in alright.py
+ReservedUintPrefix = b"reserved_global_uint_value"
+EpochRounds = 216_000
+EpochSlots = 8
+AssetClasses = ("algo", "asa", "legs")
+Kinds = {b"m": 0, b"c": 1}  # matched, completed
+
+
+class DealCounters(NamedTuple):
+    total_deals: int
+    active_deals: int
+    completed_deals: int
+    # Asset class -> (matched, completed)
+    by_class: dict[str, tuple[int, int]]
+    # Epoch number -> (matched, completed), for the epochs still in the ring
+    by_epoch: dict[int, tuple[int, int]]
+
+
+def decode_global_state(entries: list[dict]) -> dict[bytes, int | bytes]:
+    # algod application params "global-state": base64 keys, type 1 bytes, 2 uint
+    state: dict[bytes, int | bytes] = {}
+    for entry in entries:
+        value = entry["value"]
+        state[base64.b64decode(entry["key"])] = (
+            value.get("uint", 0)
+            if value["type"] == 2
+            else base64.b64decode(value.get("bytes", ""))
+        )
+    return state
+
+
+def epoch_of(round_: int) -> int:
+    return round_ // EpochRounds
+
+
+def deal_counters(
+    state: dict[bytes, int | bytes], current_round: int | None = None
+) -> DealCounters:
+    """Aggregate the counter slots of a decoded global state.
+
+    With current_round, epochs older than the ring can still hold are left out,
+    as their slots are only reset when a deal next lands in them.
+    """
+    by_class = {name: [0, 0] for name in AssetClasses}
+    by_epoch: dict[int, list[int]] = {}
+    oldest = None if current_round is None else epoch_of(current_round) - EpochSlots + 1
+    for key, value in state.items():
+        if not key.startswith(ReservedUintPrefix) or not isinstance(value, int):
+            continue
+        bucket = key[len(ReservedUintPrefix) :]
+        if len(bucket) != 3 or bucket[:1] not in Kinds:
+            continue
+        kind = Kinds[bucket[:1]]
+        if bucket[1:2] == b"a" and bucket[2] < len(AssetClasses):
+            by_class[AssetClasses[bucket[2]]][kind] += value
+        elif bucket[1:2] == b"e":
+            epoch, count = value >> 32, value & 0xFFFFFFFF
+            if oldest is None or epoch >= oldest:
+                by_epoch.setdefault(epoch, [0, 0])[kind] = count
+    return DealCounters(
+        state.get(b"total_deals", 0),
+        state.get(b"active_deals", 0),
+        state.get(b"completed_deals", 0),
+        {name: tuple(counts) for name, counts in by_class.items()},
+        {epoch: tuple(by_epoch[epoch]) for epoch in sorted(by_epoch)},
+    )
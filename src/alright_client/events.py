@@ -0,0 +1,100 @@
+import struct
+from collections.abc import Iterable, Iterator
+from typing import NamedTuple
+
+from alright_client.layout import DealHeader, DealLeg, decode_legs
+
+# Mirrors the event codes in alright.py
+DealCreatedEvent = 1
+DealMatchedEvent = 2
+DataAttachedEvent = 3
+DisbursementAdjustedEvent = 4
+DisbursementAgreedEvent = 5
+DealRecalledEvent = 6
+DealRejectedEvent = 7
+DealDisbursedEvent = 8
+# Variable-width note record logged by create_hashed_deal
+DealNoteEvent = 9
+# Variable-width legs record logged by add_deal_legs and adjust_leg_disbursement
+DealLegsEvent = 10
+
+EventNames = {
+    DealCreatedEvent: "create",
+    DealMatchedEvent: "match",
+    DataAttachedEvent: "attach",
+    DisbursementAdjustedEvent: "adjust",
+    DisbursementAgreedEvent: "agree",
+    DealRecalledEvent: "recall",
+    DealRejectedEvent: "reject",
+    DealDisbursedEvent: "disburse",
+}
+
+# Event code (1) + deal key (33) + deal header (148)
+DealEventRecord = struct.Struct(">B33s" + DealHeader.format.lstrip(">"))
+DealEventLength = DealEventRecord.size
+
+
+class DealEvent(NamedTuple):
+    event: int
+    deal_key: bytes
+    first_acc_status: int
+    second_acc_status: int
+    first_acc_address: bytes
+    first_acc_dep_amount: int
+    first_acc_dep_asset: int
+    first_acc_col_amount: int
+    first_acc_col_asset: int
+    second_acc_address: bytes
+    second_acc_dep_amount: int
+    second_acc_dep_asset: int
+    second_acc_col_amount: int
+    second_acc_col_asset: int
+    first_acc_forward_amount: int
+    second_acc_forward_amount: int
+    first_acc_data: int
+    second_acc_data: int
+
+
+class LegsEvent(NamedTuple):
+    event: int  # DealLegsEvent
+    deal_key: bytes
+    legs: list[DealLeg]
+
+
+def decode_event(log: bytes) -> DealEvent | None:
+    # ABI return values are logged too, but those start with 0x151f7c75
+    if len(log) != DealEventLength or log[0] not in EventNames:
+        return None
+    return DealEvent._make(DealEventRecord.unpack(log))
+
+
+def decode_note_event(log: bytes) -> tuple[bytes, bytes] | None:
+    # Returns (deal key, deal_note)
+    if len(log) < 34 or log[0] != DealNoteEvent:
+        return None
+    return log[1:34], log[34:]
+
+
+def decode_legs_event(log: bytes) -> tuple[bytes, list[DealLeg]] | None:
+    # Returns (deal key, legs) with the legs as they now stand in the legs box
+    if len(log) < 34 or log[0] != DealLegsEvent:
+        return None
+    return log[1:34], decode_legs(log[34:])
+
+
+def decode_events(logs: Iterable[bytes]) -> Iterator[DealEvent]:
+    unpack = DealEventRecord.unpack
+    for log in logs:
+        if len(log) == DealEventLength and log[0] in EventNames:
+            yield DealEvent._make(unpack(log))
+
+
+def decode_deal_and_legs_events(
+    logs: Iterable[bytes],
+) -> Iterator[DealEvent | LegsEvent]:
+    # decode_events plus the legs records, in log order
+    for log in logs:
+        if len(log) == DealEventLength and log[0] in EventNames:
+            yield DealEvent._make(DealEventRecord.unpack(log))
+        elif len(log) >= 34 and log[0] == DealLegsEvent:
+            yield LegsEvent(DealLegsEvent, log[1:34], decode_legs(log[34:]))
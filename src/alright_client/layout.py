@@ -0,0 +1,193 @@
+import base64
+import hashlib
+import struct
+from typing import NamedTuple
+
+# Mirrors the MBR math and box layouts in alright.py without importing pyteal
+BoxFlatMBR = 2500
+BoxByteMBR = 400
+DealListKeyLength = 32
+DealListBoxLength = 1023
+DealListCost = BoxFlatMBR + (BoxByteMBR * (DealListBoxLength + DealListKeyLength))
+DealListSlots = DealListBoxLength // 33
+DealDetailsKeyLength = 33
+DealDetailsBoxLength = 1024  # Upper bound, deal boxes are sized to their contents
+DealDetailsCost = BoxFlatMBR + (
+    BoxByteMBR * (DealDetailsBoxLength + DealDetailsKeyLength)
+)
+DealDataKeyLength = 64
+
+# Fixed-width head of the ABI-encoded DealValue, fields in declaration order
+DealHeader = struct.Struct(">BB32sQQQQ32sQQQQQQBB")  # 148 bytes
+DealHeaderLength = DealHeader.size
+# Head + uint16 offset of deal_note + uint16 length of deal_note
+DealNoteOffset = DealHeaderLength + 4
+DealNoteMaxLength = DealDetailsBoxLength - DealNoteOffset  # 872
+# Hashed deals keep sha256(deal_note) as the note, under an "H" key
+HashedDealKeyPrefix = b"H"
+HashedDealBoxLength = DealNoteOffset + 32
+# Bit flags in first_acc_data/second_acc_data
+DataAttachedFlag = 1
+DealLegsFlag = 2  # In the creator's data byte only, the deal has a legs box
+DataSealedFlag = 4  # Data box ends with the sha256 of the data before it
+DataCompressedFlag = 8  # Data box holds compressed frames, see attachments.py
+# Top bit of attach_data's data_index: the data written at index 0 is compressed
+CompressedWriteFlag = 1 << 63
+# Schema version of a deal box, in the high nibble of second_acc_data. Version 0
+# boxes predate it and share the version 1 layout. load_deal in alright.py
+# upgrades older boxes in place the next time a method touches them.
+DealVersion = 1
+DealVersionShift = 4
+# Extra legs live in an "L" + deal hash box as packed (flags, asset, amount, forward)
+LegsKeyPrefix = b"L"
+DealLegRecord = struct.Struct(">BQQQ")  # 25 bytes
+LegLength = DealLegRecord.size
+MaxDealLegs = 8
+LegSecondAccount = 1
+LegCollateral = 2
+
+ZeroAddress = bytes(32)
+ZeroDealKey = bytes(DealDetailsKeyLength)
+
+
+class Deal(NamedTuple):
+    first_acc_status: int
+    second_acc_status: int
+    first_acc_address: bytes
+    first_acc_dep_amount: int
+    first_acc_dep_asset: int
+    first_acc_col_amount: int
+    first_acc_col_asset: int
+    second_acc_address: bytes
+    second_acc_dep_amount: int
+    second_acc_dep_asset: int
+    second_acc_col_amount: int
+    second_acc_col_asset: int
+    first_acc_forward_amount: int
+    second_acc_forward_amount: int
+    first_acc_data: int
+    second_acc_data: int
+    deal_note: bytes
+
+
+class DealLeg(NamedTuple):
+    flags: int
+    asset: int
+    amount: int
+    forward_amount: int = 0
+
+
+def decode_deal(value: bytes) -> Deal:
+    # Versions 0 and 1 share one layout, a new version gets its own branch here
+    version = value[DealHeaderLength - 1] >> DealVersionShift
+    if version > DealVersion:
+        raise ValueError(f"Deal schema version {version} is newer than this client")
+    note_length = int.from_bytes(value[DealHeaderLength + 2 : DealNoteOffset], "big")
+    return Deal(
+        *DealHeader.unpack_from(value),
+        value[DealNoteOffset : DealNoteOffset + note_length],
+    )
+
+
+def deal_version(deal: Deal) -> int:
+    return deal.second_acc_data >> DealVersionShift
+
+
+def encode_deal(deal: Deal) -> bytes:
+    return b"".join(
+        (
+            DealHeader.pack(*deal[:-1]),
+            (DealHeaderLength + 2).to_bytes(2, "big"),
+            len(deal.deal_note).to_bytes(2, "big"),
+            deal.deal_note,
+        )
+    )
+
+
+def deal_box_cost(deal_box_length: int) -> int:
+    return BoxFlatMBR + (BoxByteMBR * (deal_box_length + DealDetailsKeyLength))
+
+
+def data_box_cost(data_length: int) -> int:
+    return BoxFlatMBR + (BoxByteMBR * (data_length + DealDataKeyLength))
+
+
+def legs_box_key(deal_key: bytes) -> bytes:
+    return LegsKeyPrefix + deal_key[1:]
+
+
+def deal_has_legs(deal: Deal) -> bool:
+    return bool((deal.first_acc_data | deal.second_acc_data) & DealLegsFlag)
+
+
+def decode_legs(value: bytes) -> list[DealLeg]:
+    return [DealLeg._make(leg) for leg in DealLegRecord.iter_unpack(value)]
+
+
+def encode_legs(legs: list[DealLeg]) -> bytes:
+    return b"".join(DealLegRecord.pack(*leg) for leg in legs)
+
+
+def legs_cost(legs: list[DealLeg]) -> int:
+    # Exact payment add_deal_legs expects for the legs box
+    return deal_box_cost(len(legs) * LegLength)
+
+
+def create_deal_key(
+    sender: bytes, their_address: bytes, deal_note: bytes, key_prefix: bytes = b"D"
+) -> bytes:
+    # Whichever account is "greater" goes first, as in the contract
+    if sender > their_address:
+        return key_prefix + hashlib.sha256(sender + their_address + deal_note).digest()
+    return key_prefix + hashlib.sha256(their_address + sender + deal_note).digest()
+
+
+def is_hashed_deal(deal_key: bytes) -> bool:
+    return deal_key[:1] == HashedDealKeyPrefix
+
+
+def twin_deal_key(deal_key: bytes) -> bytes:
+    # The key a deal of the other kind, "D" or "H", would have for the same
+    # accounts and note. Creating a deal asserts it has no box, so the create
+    # call needs a box reference for it too.
+    if is_hashed_deal(deal_key):
+        return b"D" + deal_key[1:]
+    return HashedDealKeyPrefix + deal_key[1:]
+
+
+def verify_deal_note(deal_key: bytes, deal: Deal, deal_note: bytes) -> bool:
+    # Hashed deals store the note's sha256, so compare against that instead
+    if is_hashed_deal(deal_key):
+        return deal.deal_note == hashlib.sha256(deal_note).digest()
+    return deal.deal_note == deal_note
+
+
+def deal_list_keys(deal_list: bytes) -> list[bytes]:
+    # Deal keys box is 1023 bytes with 31x 33-byte slots
+    return [
+        deal_list[i : i + DealDetailsKeyLength]
+        for i in range(0, DealListBoxLength, DealDetailsKeyLength)
+    ]
+
+
+def free_key_index(deal_list: bytes | None) -> int | None:
+    if deal_list is None:
+        return 0
+    for index, key in enumerate(deal_list_keys(deal_list)):
+        if key == ZeroDealKey:
+            return index
+    return None
+
+
+def address_bytes(address: str) -> bytes:
+    # Algorand addresses are base32(public key + 4-byte checksum) without padding
+    raw = base64.b32decode(address + "=" * (-len(address) % 8))
+    public_key, checksum = raw[:32], raw[32:]
+    if hashlib.new("sha512_256", public_key).digest()[-4:] != checksum:
+        raise ValueError(f"Invalid address checksum: {address}")
+    return public_key
+
+
+def encode_address(public_key: bytes) -> str:
+    checksum = hashlib.new("sha512_256", public_key).digest()[-4:]
+    return base64.b32encode(public_key + checksum).decode().rstrip("=")
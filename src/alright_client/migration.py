@@ -0,0 +1,144 @@
+"""Background migration of deal boxes to the current schema version.
+
+load_deal upgrades a deal box the first time any method touches it, so no
+migration has to run before a new version ships. Deals that sit untouched keep
+their old version until then. BatchMigrator walks those in the background,
+sending migrate_deals calls from a funded account at a fixed pace, so that
+old versions eventually disappear and their decoders can be dropped.
+"""
+
+import copy
+import threading
+from collections.abc import Iterable, Iterator
+
+from algosdk import abi, transaction
+from algosdk.atomic_transaction_composer import TransactionSigner
+
+from alright_client.layout import (
+    DealDetailsKeyLength,
+    DealHeaderLength,
+    DealVersion,
+    DealVersionShift,
+    HashedDealKeyPrefix,
+)
+from alright_client.relayer import MaxAppReferences, MaxGroupSize, txn_fee
+
+MigrateSelector = abi.Method.from_signature(
+    "migrate_deals(byte[33][])uint64"
+).get_selector()
+DealKeysType = abi.ABIType.from_string("byte[33][]")
+
+
+def stale_deal_keys(boxes: Iterable[tuple[bytes, bytes]]) -> Iterator[bytes]:
+    # Keys of deal boxes older than DealVersion, from (name, value) pairs such as
+    # snapshot.algod_boxes yields
+    for name, value in boxes:
+        if (
+            len(name) == DealDetailsKeyLength
+            and name[:1] in (b"D", HashedDealKeyPrefix)
+            and value[DealHeaderLength - 1] >> DealVersionShift < DealVersion
+        ):
+            yield name
+
+
+def migration_groups(
+    sender: str,
+    sp: transaction.SuggestedParams,
+    app_id: int,
+    deal_keys: Iterable[bytes],
+) -> list[list[transaction.Transaction]]:
+    """Unsigned groups of migrate_deals calls covering `deal_keys`.
+
+    A deal box fits one box reference, so each call takes as many keys as it
+    has references, and a group as many calls as it can hold. Raises ValueError
+    for a key that is not a deal key, which the contract would reject.
+    """
+    call_sp = copy.copy(sp)
+    call_sp.flat_fee = True
+    call_sp.fee = txn_fee(sp)
+    deal_keys = list(deal_keys)
+    for key in deal_keys:
+        if len(key) != DealDetailsKeyLength or key[:1] not in (
+            b"D",
+            HashedDealKeyPrefix,
+        ):
+            raise ValueError(f"Not a deal key: {key.hex()}")
+    calls = [
+        transaction.ApplicationNoOpTxn(
+            sender,
+            call_sp,
+            app_id,
+            app_args=[
+                MigrateSelector,
+                DealKeysType.encode(
+                    [list(key) for key in deal_keys[i : i + MaxAppReferences]]
+                ),
+            ],
+            boxes=[(0, key) for key in deal_keys[i : i + MaxAppReferences]],
+        )
+        for i in range(0, len(deal_keys), MaxAppReferences)
+    ]
+    return [
+        transaction.assign_group_id(calls[i : i + MaxGroupSize])
+        for i in range(0, len(calls), MaxGroupSize)
+    ]
+
+
+class BatchMigrator(threading.Thread):
+    """Sends migrate_deals groups for `deal_keys`, `groups_per_round` a round.
+
+    Stops early on stop(). `migrated` counts groups confirmed so far. A group
+    that fails is logged in `errors` and skipped; its deals still migrate when
+    a method touches them.
+    """
+
+    def __init__(
+        self,
+        algod_client,
+        app_id: int,
+        sender: str,
+        signer: TransactionSigner,
+        deal_keys: Iterable[bytes],
+        groups_per_round: int = 1,
+    ) -> None:
+        super().__init__(daemon=True)
+        self.algod_client = algod_client
+        self.app_id = app_id
+        self.sender = sender
+        self.signer = signer
+        self.deal_keys = list(deal_keys)
+        self.groups_per_round = groups_per_round
+        self.migrated = 0
+        self.errors: list[Exception] = []
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        # Fresh params for every batch, as a long run outlasts their validity
+        batch = MaxAppReferences * MaxGroupSize * self.groups_per_round
+        for i in range(0, len(self.deal_keys), batch):
+            if self._stop_event.is_set():
+                return
+            groups = migration_groups(
+                self.sender,
+                self.algod_client.suggested_params(),
+                self.app_id,
+                self.deal_keys[i : i + batch],
+            )
+            txids = []
+            for group in groups:
+                try:
+                    signed = self.signer.sign_transactions(
+                        group, list(range(len(group)))
+                    )
+                    txids.append(self.algod_client.send_transactions(signed))
+                except Exception as error:
+                    self.errors.append(error)
+            for txid in txids:
+                try:
+                    transaction.wait_for_confirmation(self.algod_client, txid, 4)
+                    self.migrated += 1
+                except Exception as error:
+                    self.errors.append(error)
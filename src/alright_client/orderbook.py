@@ -0,0 +1,192 @@
+"""In-memory order book over pending deals, for counterparty discovery.
+
+A deal is an open offer while its status pair is (1,0) or (0,1): the creating
+account has deposited and the named counterparty has yet to match. Offers are
+indexed by the creator's (deposit asset, collateral asset) pair and kept sorted
+by deposit amount, so range queries and best-match lookups are a bisect away.
+
+The book is fed with deal events (OrderBook.apply, e.g. from stream.consume), a
+stream.DealView, or deal box values decoded with layout.decode_deal.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from typing import Any, NamedTuple
+
+from alright_client.events import (
+    DealCreatedEvent,
+    DealDisbursedEvent,
+    DealEvent,
+    DealMatchedEvent,
+    DealRecalledEvent,
+    DealRejectedEvent,
+)
+
+# Events after which a deal is no longer open. Data and legs events can come
+# while the deal is still an offer, so they leave it in the book.
+ClosingEvents = frozenset(
+    (DealMatchedEvent, DealRecalledEvent, DealRejectedEvent, DealDisbursedEvent)
+)
+
+
+class Offer(NamedTuple):
+    deal_key: bytes
+    creator: bytes
+    counterparty: bytes
+    dep_asset: int
+    dep_amount: int
+    col_asset: int
+    col_amount: int
+    # What the counterparty has to put in to match
+    want_dep_asset: int
+    want_dep_amount: int
+    want_col_asset: int
+    want_col_amount: int
+
+
+def offer_from_deal(deal_key: bytes, deal: Any) -> Offer | None:
+    # Any record with the deal header fields: layout.Deal, events.DealEvent
+    statuses = (deal.first_acc_status, deal.second_acc_status)
+    if statuses == (1, 0):
+        return Offer(
+            deal_key,
+            deal.first_acc_address,
+            deal.second_acc_address,
+            deal.first_acc_dep_asset,
+            deal.first_acc_dep_amount,
+            deal.first_acc_col_asset,
+            deal.first_acc_col_amount,
+            deal.second_acc_dep_asset,
+            deal.second_acc_dep_amount,
+            deal.second_acc_col_asset,
+            deal.second_acc_col_amount,
+        )
+    if statuses == (0, 1):
+        return Offer(
+            deal_key,
+            deal.second_acc_address,
+            deal.first_acc_address,
+            deal.second_acc_dep_asset,
+            deal.second_acc_dep_amount,
+            deal.second_acc_col_asset,
+            deal.second_acc_col_amount,
+            deal.first_acc_dep_asset,
+            deal.first_acc_dep_amount,
+            deal.first_acc_col_asset,
+            deal.first_acc_col_amount,
+        )
+    return None
+
+
+class OrderBook:
+    def __init__(self) -> None:
+        self.offers: dict[bytes, Offer] = {}
+        # (dep_asset, col_asset) and (counterparty, dep_asset, col_asset)
+        # -> [(dep_amount, deal_key)] kept sorted
+        self._books: defaultdict[tuple, list[tuple[int, bytes]]] = defaultdict(list)
+        # Counterparty address -> deal keys of offers addressed to it
+        self._by_counterparty: defaultdict[bytes, set[bytes]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self.offers)
+
+    @staticmethod
+    def _book_keys(offer: Offer) -> tuple[tuple, tuple]:
+        return (
+            (offer.dep_asset, offer.col_asset),
+            (offer.counterparty, offer.dep_asset, offer.col_asset),
+        )
+
+    def add(self, offer: Offer) -> None:
+        if offer.deal_key in self.offers:
+            self.remove(offer.deal_key)
+        self.offers[offer.deal_key] = offer
+        for book_key in self._book_keys(offer):
+            insort(self._books[book_key], (offer.dep_amount, offer.deal_key))
+        self._by_counterparty[offer.counterparty].add(offer.deal_key)
+
+    def remove(self, deal_key: bytes) -> Offer | None:
+        offer = self.offers.pop(deal_key, None)
+        if offer is None:
+            return None
+        for book_key in self._book_keys(offer):
+            book = self._books[book_key]
+            del book[bisect_left(book, (offer.dep_amount, deal_key))]
+            if not book:
+                del self._books[book_key]
+        keys = self._by_counterparty[offer.counterparty]
+        keys.discard(deal_key)
+        if not keys:
+            del self._by_counterparty[offer.counterparty]
+        return offer
+
+    def add_deal(self, deal_key: bytes, deal: Any) -> None:
+        offer = offer_from_deal(deal_key, deal)
+        if offer is None:
+            self.remove(deal_key)
+        else:
+            self.add(offer)
+
+    def apply(self, event: DealEvent) -> None:
+        # Only a create event opens an offer, only a closing event ends it
+        if event.event == DealCreatedEvent:
+            self.add_deal(event.deal_key, event)
+        elif event.event in ClosingEvents:
+            self.remove(event.deal_key)
+
+    @classmethod
+    def from_deals(cls, deals: Iterable[tuple[bytes, Any]]) -> "OrderBook":
+        # e.g. DealView.deals.items() or (key, decode_deal(value)) from boxes
+        book = cls()
+        for deal_key, deal in deals:
+            book.add_deal(deal_key, deal)
+        return book
+
+    def range(
+        self,
+        dep_asset: int,
+        col_asset: int,
+        min_amount: int = 0,
+        max_amount: int | None = None,
+        counterparty: bytes | None = None,
+    ) -> Iterator[Offer]:
+        # Offers for the asset pair with min_amount <= dep_amount <= max_amount,
+        # in ascending amount order, optionally only those addressed to one account
+        if counterparty is None:
+            book = self._books.get((dep_asset, col_asset))
+        else:
+            book = self._books.get((counterparty, dep_asset, col_asset))
+        if not book:
+            return
+        stop = len(book)
+        if max_amount is not None:
+            stop = bisect_right(book, (max_amount, b"\xff" * 34))
+        offers = self.offers
+        for i in range(bisect_left(book, (min_amount,)), stop):
+            yield offers[book[i][1]]
+
+    def best_match(
+        self,
+        dep_asset: int,
+        col_asset: int,
+        amount: int,
+        counterparty: bytes | None = None,
+    ) -> Offer | None:
+        # The smallest offer of at least `amount`, ties broken by deal key
+        book = self._books.get(
+            (dep_asset, col_asset)
+            if counterparty is None
+            else (counterparty, dep_asset, col_asset)
+        )
+        if not book:
+            return None
+        i = bisect_left(book, (amount,))
+        return self.offers[book[i][1]] if i < len(book) else None
+
+    def offers_for(self, counterparty: bytes) -> list[Offer]:
+        # Every open offer the given account can match, by deal key
+        return [
+            self.offers[deal_key]
+            for deal_key in sorted(self._by_counterparty.get(counterparty, ()))
+        ]
@@ -0,0 +1,148 @@
+"""Bulk portfolio loader: the deals of many accounts, fetched concurrently.
+
+Reading one account means its deal list box, then each non-zero slot's deal
+box, one round trip at a time. load_portfolios overlaps all of them: deal list
+reads go out together, and each deal key is queued as soon as the first list
+naming it arrives. Every deal is in two lists, so each key is read only once.
+At most `max_workers` requests are in flight.
+
+The result is columnar, with one typed array per DealHeader field and one row
+per deal. Addresses are packed 32 bytes per row. This keeps thousands of deals
+in a few compact buffers and lets callers total a column without building a
+Deal per row.
+"""
+
+import re
+from array import array
+from collections.abc import Callable, Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import NamedTuple
+
+from alright_client.layout import (
+    Deal,
+    DealHeader,
+    DealHeaderLength,
+    DealNoteOffset,
+    ZeroDealKey,
+    deal_list_keys,
+)
+from alright_client.shards import read_box
+
+# Box name -> value, or None if there is no such box
+BoxFetcher = Callable[[bytes], bytes | None]
+
+# Column per DealHeader field: typecode of an array, or None for packed addresses
+ColumnTypes = {
+    "B": "B",
+    "Q": "Q",
+    "32s": None,
+}
+DealColumns = tuple(
+    (field, ColumnTypes[fmt])
+    for field, fmt in zip(Deal._fields, re.findall(r"\d*\w", DealHeader.format[1:]))
+)
+
+
+class Portfolio(NamedTuple):
+    deal_keys: list[bytes]
+    # Field name -> array, or bytearray of 32-byte addresses
+    columns: dict[str, array | bytearray]
+    deal_notes: list[bytes]
+    # Account -> (key index, row) of its deals, in deal list order
+    holdings: dict[bytes, list[tuple[int, int]]]
+
+    def __len__(self) -> int:
+        return len(self.deal_keys)
+
+    def value(self, field: str, row: int) -> int | bytes:
+        column = self.columns[field]
+        if isinstance(column, bytearray):
+            return bytes(column[row * 32 : row * 32 + 32])
+        return column[row]
+
+    def deal(self, row: int) -> Deal:
+        return Deal(
+            *(self.value(field, row) for field, _ in DealColumns),
+            self.deal_notes[row],
+        )
+
+    def deals_of(self, address: bytes) -> list[tuple[int, bytes, Deal]]:
+        # (key index, deal key, deal) as account_deals would return them
+        return [
+            (index, self.deal_keys[row], self.deal(row))
+            for index, row in self.holdings.get(address, [])
+        ]
+
+
+def box_fetcher(algod_client, app_id: int) -> BoxFetcher:
+    return lambda name: read_box(algod_client, app_id, name)
+
+
+def _append_deal(columns: dict[str, array | bytearray], value: bytes) -> bytes:
+    # Appends the header fields of one deal box, returns its deal note
+    for (field, typecode), item in zip(DealColumns, DealHeader.unpack_from(value)):
+        if typecode is None:
+            columns[field].extend(item)
+        else:
+            columns[field].append(item)
+    note_length = int.from_bytes(value[DealHeaderLength + 2 : DealNoteOffset], "big")
+    return value[DealNoteOffset : DealNoteOffset + note_length]
+
+
+def load_portfolios(
+    fetch: BoxFetcher, addresses: Iterable[bytes], max_workers: int = 32
+) -> Portfolio:
+    """Deals of every address in `addresses`, as one Portfolio.
+
+    Accounts without a deal list box and deals deleted between the two reads
+    are left out.
+    """
+    addresses = list(dict.fromkeys(addresses))
+    lists: dict[bytes, list[tuple[int, bytes]]] = {}
+    values: dict[bytes, bytes | None] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending: dict[Future, tuple[bool, bytes]] = {
+            pool.submit(fetch, address): (True, address) for address in addresses
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                is_list, name = pending.pop(future)
+                value = future.result()
+                if not is_list:
+                    values[name] = value
+                    continue
+                if value is None:
+                    continue
+                slots = [
+                    (index, deal_key)
+                    for index, deal_key in enumerate(deal_list_keys(value))
+                    if deal_key != ZeroDealKey
+                ]
+                lists[name] = slots
+                for _, deal_key in slots:
+                    if deal_key not in values:
+                        # Claim the key so the counterparty's list skips it
+                        values[deal_key] = None
+                        pending[pool.submit(fetch, deal_key)] = (False, deal_key)
+
+    columns = {
+        field: bytearray() if typecode is None else array(typecode)
+        for field, typecode in DealColumns
+    }
+    deal_keys, deal_notes, rows = [], [], {}
+    for deal_key, value in values.items():
+        if value is not None:
+            rows[deal_key] = len(deal_keys)
+            deal_keys.append(deal_key)
+            deal_notes.append(_append_deal(columns, value))
+    holdings = {
+        address: [
+            (index, rows[deal_key])
+            for index, deal_key in lists[address]
+            if deal_key in rows
+        ]
+        for address in addresses
+        if address in lists
+    }
+    return Portfolio(deal_keys, columns, deal_notes, holdings)
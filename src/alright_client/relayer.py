@@ -0,0 +1,174 @@
+"""Relayer that pays a user's fees and box budget padding for them.
+
+Fees are pooled across an atomic group and box references count group-wide,
+so the contract needs no relayer mode of its own. The relayer adds one payment
+to itself whose fee covers every outer and inner transaction in the group,
+plus any box_budget calls needed for box read budget. Users build their own
+payments and app call with a flat fee of 0 and sign only those, once the
+relayer has assigned the group id.
+"""
+
+import copy
+from collections.abc import Iterable, Sequence
+
+from algosdk import abi, constants, transaction
+from algosdk.atomic_transaction_composer import TransactionSigner
+
+MaxGroupSize = 16
+MaxAppReferences = 8  # Accounts, assets, apps and boxes per app call on AVM 8
+BoxReadBudget = 1024  # Bytes of box IO per box reference in the group
+
+BoxBudgetSelector = abi.Method.from_signature("box_budget()void").get_selector()
+
+# Most inner txns each method of the contract sends, before legs and assets.
+# Every leg adds up to 2 on disbursement and 1 on recall or reject, and a deal
+# with legs 1 more to return the legs box MBR to its creator. verify_nfd counts
+# only its call to the NFD app, not what that app sends in turn.
+MethodInnerTxns = {
+    "box_budget": 0,
+    "create_deal": 0,
+    "match_deal": 0,
+    "attach_data": 0,
+    "agree_disbursement": 6,
+    "settle_deal": 6,
+    "settle_pair": 0,
+    "adjust_disbursement": 0,
+    "recall_deal": 2,
+    "reject_deal": 2,
+    "create_hashed_deal": 0,
+    "add_deal_legs": 0,
+    "adjust_leg_disbursement": 0,
+    "seal_data": 0,
+    "hello": 0,
+    "change_status": 0,
+    "change_owner": 0,
+    "send_note": 1,
+    "verify_nfd": 1,
+    "opt_in_to_asa": 1,
+    "opt_in_to_asas": 0,
+    "close_out_asas": 1,
+    "migrate_deals": 0,
+    "read_data": 0,
+}
+# Inner txns per asset: an opt-in or close-out each, and for settle_pair one
+# net transfer per account and asset across its deals
+AssetInnerTxns = {"opt_in_to_asas": 1, "close_out_asas": 1, "settle_pair": 2}
+
+
+def inner_txn_count(method: str, legs: int = 0, assets: int = 0) -> int:
+    # assets counts the distinct assets of the call, Algo included
+    count = MethodInnerTxns[method] + AssetInnerTxns.get(method, 0) * assets
+    if not legs or not count:
+        return count
+    if method in ("recall_deal", "reject_deal"):
+        return count + legs + 1
+    return count + 2 * legs + 1
+
+
+def txn_fee(sp: transaction.SuggestedParams) -> int:
+    # Fee per pooled transaction: the network minimum from suggested params,
+    # or sp.fee when that is higher, e.g. a fee raised under congestion
+    return max(sp.min_fee or constants.min_txn_fee, sp.fee)
+
+
+def box_refs_needed(box_bytes: int) -> int:
+    # Every box ref adds 1024 bytes of budget, whether or not it names a box
+    return -(-box_bytes // BoxReadBudget)
+
+
+def relay_group(
+    user_txns: Sequence[transaction.Transaction],
+    relayer: str,
+    sp: transaction.SuggestedParams,
+    app_id: int,
+    inner_txns: int = 0,
+    box_bytes: int = 0,
+    lease: bytes | None = None,
+) -> list[transaction.Transaction]:
+    """Wrap a user's transactions in a group the relayer pays for.
+
+    box_bytes is the box IO the user's calls need beyond their own box refs,
+    covered with box_budget calls sent by the relayer. The fee-payer payment
+    goes first. Whatever fee the user's transactions already carry is credited.
+    A lease, e.g. submission.deal_lease, goes on the fee-payer payment, so the
+    relayer cannot land two groups for it while either is valid.
+    """
+    padding = box_refs_needed(box_bytes)
+    padding_calls = -(-padding // MaxAppReferences)
+    group_size = 1 + padding_calls + len(user_txns)
+    if group_size > MaxGroupSize:
+        raise ValueError(f"Group of {group_size} exceeds {MaxGroupSize} transactions")
+
+    free_sp = copy.copy(sp)
+    free_sp.flat_fee = True
+    free_sp.fee = 0
+    paid_sp = copy.copy(free_sp)
+    paid_sp.fee = max(
+        0,
+        txn_fee(sp) * (group_size + inner_txns) - sum(txn.fee for txn in user_txns),
+    )
+
+    relayer_txns: list[transaction.Transaction] = [
+        transaction.PaymentTxn(relayer, paid_sp, relayer, 0, lease=lease)
+    ]
+    for i in range(padding_calls):
+        refs = min(MaxAppReferences, padding - i * MaxAppReferences)
+        relayer_txns.append(
+            transaction.ApplicationNoOpTxn(
+                relayer,
+                free_sp,
+                app_id,
+                app_args=[BoxBudgetSelector],
+                boxes=[(0, b"")] * refs,
+            )
+        )
+    group = [*relayer_txns, *user_txns]
+    return transaction.assign_group_id(group)
+
+
+class Relayer:
+    def __init__(self, algod_client, address: str, signer: TransactionSigner) -> None:
+        self.algod_client = algod_client
+        self.address = address
+        self.signer = signer
+
+    def build(
+        self,
+        app_id: int,
+        user_txns: Sequence[transaction.Transaction],
+        inner_txns: int = 0,
+        box_bytes: int = 0,
+        sp: transaction.SuggestedParams | None = None,
+        lease: bytes | None = None,
+    ) -> list[transaction.Transaction]:
+        if sp is None:
+            sp = self.algod_client.suggested_params()
+        return relay_group(
+            user_txns, self.address, sp, app_id, inner_txns, box_bytes, lease
+        )
+
+    def complete(
+        self,
+        group: Sequence[transaction.Transaction],
+        user_signed: Iterable[transaction.SignedTransaction],
+    ) -> list[transaction.SignedTransaction]:
+        # Sign the relayer's own transactions and slot in the user's signatures
+        by_txid = {stxn.get_txid(): stxn for stxn in user_signed}
+        indexes = [i for i, txn in enumerate(group) if txn.sender == self.address]
+        own = dict(zip(indexes, self.signer.sign_transactions(list(group), indexes)))
+        return [
+            own[i] if i in own else by_txid[txn.get_txid()]
+            for i, txn in enumerate(group)
+        ]
+
+    def submit(
+        self,
+        groups: Iterable[Sequence[transaction.SignedTransaction]],
+        wait_rounds: int = 4,
+    ) -> list[str]:
+        # Send every group before waiting on any, so groups from many users land
+        # in the same rounds and one slow group does not hold up the batch
+        txids = [self.algod_client.send_transactions(list(group)) for group in groups]
+        for txid in txids:
+            transaction.wait_for_confirmation(self.algod_client, txid, wait_rounds)
+        return txids
@@ -0,0 +1,350 @@
+"""Replay recorded app traffic through algod simulate for capacity planning.
+
+export_history writes every group that called the app, all of its transactions
+included, as indexer JSON lines in chain order. replay sends the groups of each
+round to simulate as one request, in their recorded order, against the ledger
+as of the round before. Simulate applies the groups of a request one after the
+other, so each call sees the state the earlier calls of its round left, and
+earlier rounds are already on that ledger. That needs an algod that still holds
+those rounds, such as a local archival or follower node. Pacing follows the
+recorded round times, divided by `speedup`.
+
+With target_app_id the same traffic runs against a candidate build instead.
+The ledger holds none of the candidate's earlier deals, so its state can only
+carry over inside one request: the whole feed goes out as a single request
+against the round before its first group, and pacing does not apply. Keep such
+a feed to a window that one simulate request can hold.
+
+Each app call yields a CallSample with the simulate latency of its request, the
+opcode budget it consumed, its inner txns, the box bytes it wrote and the
+running MBR of all boxes written so far. summarize folds samples per method.
+"""
+
+import base64
+import json
+import statistics
+import time
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from itertools import groupby
+from typing import NamedTuple
+
+from algosdk import logic, transaction
+from algosdk.v2client.models import (
+    SimulateRequest,
+    SimulateRequestTransactionGroup,
+    SimulateTraceConfig,
+)
+
+from alright_client.layout import BoxByteMBR, BoxFlatMBR
+from alright_client.stream import read_feed
+
+
+class CallSample(NamedTuple):
+    round: int
+    method: str
+    latency: float  # Seconds for the simulate request holding its group
+    opcode_cost: int
+    inner_txns: int
+    box_refs: int
+    box_bytes_written: int
+    box_mbr: int  # MBR of every box written during the replay, after this call
+
+
+def method_names(contract_path: str) -> dict[bytes, str]:
+    # Selector -> method name, from artifacts/contract.json
+    from algosdk import abi
+
+    with open(contract_path) as contract_file:
+        contract = abi.Contract.from_json(contract_file.read())
+    return {method.get_selector(): method.name for method in contract.methods}
+
+
+def export_history(
+    indexer_client,
+    app_id: int,
+    path: str,
+    min_round: int | None = None,
+    max_round: int | None = None,
+) -> int:
+    # App calls alone leave out the payments grouped with them, so fetch every
+    # group in full. Returns the number of transactions written.
+    groups: dict[str, list[dict]] = {}
+    singles: list[dict] = []
+    next_page = None
+    while True:
+        page = indexer_client.search_transactions(
+            application_id=app_id,
+            min_round=min_round,
+            max_round=max_round,
+            next_page=next_page,
+            limit=1000,
+        )
+        for txn in page["transactions"]:
+            group_id = txn.get("group")
+            if group_id is None:
+                singles.append(txn)
+            elif group_id not in groups:
+                groups[group_id] = indexer_client.search_transactions(
+                    group_id=group_id, round_num=txn["confirmed-round"]
+                )["transactions"]
+        next_page = page.get("next-token")
+        if not page["transactions"] or not next_page:
+            break
+    txns = singles + [txn for group in groups.values() for txn in group]
+    txns.sort(key=lambda txn: (txn["confirmed-round"], txn["intra-round-offset"]))
+    with open(path, "w") as history:
+        for txn in txns:
+            history.write(json.dumps(txn, separators=(",", ":")) + "\n")
+    return len(txns)
+
+
+def read_groups(records: Iterable[dict]) -> Iterator[list[dict]]:
+    group: list[dict] = []
+    for record in records:
+        if group and (
+            record.get("group") is None
+            or record.get("group") != group[0].get("group")
+            or record["confirmed-round"] != group[0]["confirmed-round"]
+        ):
+            yield group
+            group = []
+        group.append(record)
+    if group:
+        yield group
+
+
+def build_transaction(
+    record: dict, app_id: int | None = None
+) -> transaction.Transaction:
+    """Rebuild an unsigned transaction from its indexer JSON.
+
+    app_id retargets app calls, e.g. to a candidate build on the same ledger.
+    Box references need an indexer that returns them.
+    """
+    b64 = base64.b64decode
+    sp = transaction.SuggestedParams(
+        fee=record["fee"],
+        first=record["first-valid"],
+        last=record["last-valid"],
+        gh=record["genesis-hash"],
+        gen=record.get("genesis-id"),
+        flat_fee=True,
+    )
+    common = dict(
+        note=b64(record["note"]) if "note" in record else None,
+        lease=b64(record["lease"]) if "lease" in record else None,
+        rekey_to=record.get("rekey-to"),
+    )
+    sender = record["sender"]
+    tx_type = record["tx-type"]
+    if tx_type == "pay":
+        pay = record["payment-transaction"]
+        txn = transaction.PaymentTxn(
+            sender,
+            sp,
+            pay["receiver"],
+            pay["amount"],
+            close_remainder_to=pay.get("close-remainder-to"),
+            **common,
+        )
+    elif tx_type == "axfer":
+        axfer = record["asset-transfer-transaction"]
+        txn = transaction.AssetTransferTxn(
+            sender,
+            sp,
+            axfer["receiver"],
+            axfer["amount"],
+            axfer["asset-id"],
+            close_assets_to=axfer.get("close-to"),
+            **common,
+        )
+    elif tx_type == "appl":
+        appl = record["application-transaction"]
+        recorded_app = appl["application-id"]
+        txn = transaction.ApplicationCallTxn(
+            sender,
+            sp,
+            recorded_app if app_id is None else app_id,
+            transaction.OnComplete[
+                {
+                    "noop": "NoOpOC",
+                    "optin": "OptInOC",
+                    "closeout": "CloseOutOC",
+                    "clear": "ClearStateOC",
+                    "update": "UpdateApplicationOC",
+                    "delete": "DeleteApplicationOC",
+                }[appl["on-completion"]]
+            ],
+            app_args=[b64(arg) for arg in appl.get("application-args", [])],
+            accounts=appl.get("accounts"),
+            foreign_apps=appl.get("foreign-apps"),
+            foreign_assets=appl.get("foreign-assets"),
+            boxes=[
+                (
+                    0 if ref["app"] in (0, recorded_app) else ref["app"],
+                    b64(ref.get("name", "")),
+                )
+                for ref in appl.get("box-references", [])
+            ],
+            **common,
+        )
+    else:
+        raise ValueError(f"Cannot replay {tx_type} transactions")
+    if "group" in record:
+        txn.group = b64(record["group"])
+    return txn
+
+
+def _count_inner(txn_result: dict) -> int:
+    inner = txn_result.get("inner-txns", [])
+    return len(inner) + sum(_count_inner(txn) for txn in inner)
+
+
+def _box_changes(trace: dict) -> Iterator[dict]:
+    for step in trace.get("approval-program-trace", []):
+        for change in step.get("state-changes", []):
+            if change.get("app-state-type") == "b":
+                yield change
+    for inner in trace.get("inner-trace", []):
+        yield from _box_changes(inner)
+
+
+def _retarget(
+    txns: list[transaction.Transaction], app_address: str, target_app_id: int
+) -> list[transaction.Transaction]:
+    # Point deposits at the candidate app too, which changes the group id
+    target_address = logic.get_application_address(target_app_id)
+    for txn in txns:
+        if getattr(txn, "receiver", None) == app_address:
+            txn.receiver = target_address
+        txn.group = None
+    return transaction.assign_group_id(txns) if len(txns) > 1 else txns
+
+
+def replay(
+    algod_client,
+    feed_path: str,
+    methods: dict[bytes, str],
+    app_id: int,
+    speedup: float | None = None,
+    target_app_id: int | None = None,
+) -> Iterator[CallSample]:
+    # speedup=None replays as fast as simulate answers. target_app_id runs the
+    # traffic against another app, e.g. a candidate build, on the same ledger.
+    app_address = logic.get_application_address(app_id)
+    if target_app_id is None:
+        batches = (
+            list(round_groups)
+            for _, round_groups in groupby(
+                read_groups(read_feed(feed_path)),
+                key=lambda group: group[0]["confirmed-round"],
+            )
+        )
+    else:
+        batches = iter([list(read_groups(read_feed(feed_path)))])
+    box_sizes: dict[bytes, int] = {}
+    last_time = None
+    for batch in batches:
+        if not batch:
+            continue
+        round_ = batch[0][0]["confirmed-round"]
+        round_time = batch[0][0].get("round-time")
+        if (
+            speedup
+            and target_app_id is None
+            and last_time is not None
+            and round_time is not None
+        ):
+            time.sleep(max(0.0, (round_time - last_time) / speedup))
+        last_time = round_time
+
+        txn_groups = []
+        for group in batch:
+            txns = [build_transaction(record, target_app_id) for record in group]
+            if target_app_id is not None:
+                txns = _retarget(txns, app_address, target_app_id)
+            txn_groups.append(txns)
+        request = SimulateRequest(
+            txn_groups=[
+                SimulateRequestTransactionGroup(
+                    txns=[transaction.SignedTransaction(txn, None) for txn in txns]
+                )
+                for txns in txn_groups
+            ],
+            round=round_ - 1,
+            allow_empty_signatures=True,
+            exec_trace_config=SimulateTraceConfig(enable=True, state_change=True),
+        )
+        started = time.perf_counter()
+        response = algod_client.simulate_transactions(request)
+        latency = time.perf_counter() - started
+
+        for group, txns, group_result in zip(batch, txn_groups, response["txn-groups"]):
+            for record, txn, result in zip(group, txns, group_result["txn-results"]):
+                appl = record.get("application-transaction")
+                if appl is None or appl["application-id"] != app_id:
+                    continue
+                written = 0
+                for change in _box_changes(result.get("exec-trace", {})):
+                    key = base64.b64decode(change["key"])
+                    if change["operation"] == "d":
+                        box_sizes.pop(key, None)
+                    else:
+                        size = len(
+                            base64.b64decode(change["new-value"].get("bytes", ""))
+                        )
+                        box_sizes[key] = size
+                        written += size
+                yield CallSample(
+                    record["confirmed-round"],
+                    (
+                        methods.get(txn.app_args[0][:4], "bare")
+                        if txn.app_args
+                        else "bare"
+                    ),
+                    latency,
+                    result.get("app-budget-consumed", 0),
+                    _count_inner(result["txn-result"]),
+                    len(txn.boxes or ()),
+                    written,
+                    sum(
+                        BoxFlatMBR + BoxByteMBR * (len(key) + size)
+                        for key, size in box_sizes.items()
+                    ),
+                )
+
+
+def summarize(samples: Iterable[CallSample]) -> dict[str, dict[str, float]]:
+    by_method: defaultdict[str, list[CallSample]] = defaultdict(list)
+    for sample in samples:
+        by_method[sample.method].append(sample)
+    summary = {}
+    for method, calls in sorted(by_method.items()):
+        latencies = sorted(call.latency for call in calls)
+        costs = [call.opcode_cost for call in calls]
+        summary[method] = {
+            "calls": len(calls),
+            "latency_p50": latencies[len(latencies) // 2],
+            "latency_p95": latencies[
+                min(len(latencies) - 1, len(latencies) * 95 // 100)
+            ],
+            "opcode_mean": statistics.fmean(costs),
+            "opcode_max": max(costs),
+            "inner_txns_max": max(call.inner_txns for call in calls),
+            "box_bytes_written_mean": statistics.fmean(
+                call.box_bytes_written for call in calls
+            ),
+        }
+    return summary
+
+
+def mbr_series(samples: Iterable[CallSample]) -> list[tuple[int, int]]:
+    # (round, box MBR) at the end of each round that touched boxes
+    series: list[tuple[int, int]] = []
+    for sample in samples:
+        if series and series[-1][0] == sample.round:
+            series[-1] = (sample.round, sample.box_mbr)
+        else:
+            series.append((sample.round, sample.box_mbr))
+    return series
@@ -0,0 +1,793 @@
+"""Runtime helpers for AlrightApp, generated by alright_client.codegen.
+
+Do not edit: regenerate it from artifacts/contract.json after every build.
+It imports only struct up front, hashlib on the first key derivation. Each
+method function returns a Call whose app_args, accounts, assets and apps go
+straight into an application call. Transaction arguments are not encoded: they
+are the `txn_args` transactions just before the call in its group.
+"""
+
+import struct
+from typing import NamedTuple
+
+APP_NAME = "AlrightApp"
+RETURN_PREFIX = bytes.fromhex("151f7c75")
+GLOBAL_KEYS = ("active_deals", "completed_deals", "owner", "status", "total_deals")
+RESERVED_PREFIXES = ("reserved_global_bytes_value", "reserved_global_uint_value")
+
+
+class Call(NamedTuple):
+    app_args: list
+    accounts: list
+    assets: list
+    apps: list
+    txn_args: int
+
+
+def _u64(value):
+    return value.to_bytes(8, "big")
+
+
+def _fixed(value, length):
+    if len(value) != length:
+        raise ValueError(f"Expected {length} bytes, got {len(value)}")
+    return bytes(value)
+
+
+def _dynamic(value):
+    if isinstance(value, str):
+        value = value.encode()
+    return len(value).to_bytes(2, "big") + value
+
+
+def _array(items, encode):
+    items = list(items)
+    return len(items).to_bytes(2, "big") + b"".join(encode(item) for item in items)
+
+
+def _reference(refs, value, first_index):
+    # Index into the call's foreign array, added on first use
+    if value not in refs:
+        refs.append(value)
+    return (refs.index(value) + first_index).to_bytes(1, "big")
+
+
+def _bytes_return(value):
+    return value[2:]
+
+
+def _string_return(value):
+    return value[2:].decode()
+
+
+def _uint64_return(value):
+    return int.from_bytes(value, "big")
+
+
+_STRUCT_0 = struct.Struct(">BQQQ")
+
+# box_budget()void
+BOX_BUDGET = bytes.fromhex("ef784a88")
+
+
+def box_budget() -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            BOX_BUDGET,
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        0,
+    )
+
+
+# create_deal(txn,txn,uint64,uint64,uint64,uint64,uint64,account,uint64,uint64,uint64,uint64,uint64,string,txn)uint64
+CREATE_DEAL = bytes.fromhex("2b0175ec")
+
+
+def create_deal(
+    key_index,
+    your_dep_amount,
+    your_dep_asset,
+    your_col_amount,
+    your_col_asset,
+    their_address,
+    their_key_index,
+    their_dep_amount,
+    their_dep_asset,
+    their_col_amount,
+    their_col_asset,
+    deal_note,
+) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            CREATE_DEAL,
+            _u64(key_index),
+            _u64(your_dep_amount),
+            _u64(your_dep_asset),
+            _u64(your_col_amount),
+            _u64(your_col_asset),
+            _reference(_foreign_accounts, their_address, 1),
+            _u64(their_key_index),
+            _u64(their_dep_amount),
+            _u64(their_dep_asset),
+            _u64(their_col_amount),
+            _u64(their_col_asset),
+            _dynamic(deal_note),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        3,
+    )
+
+
+# match_deal(txn,txn,byte[33],uint64,account,uint64)byte[2]
+MATCH_DEAL = bytes.fromhex("b9f0d94b")
+
+
+def match_deal(deal_key, key_index, their_address, their_key_index) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            MATCH_DEAL,
+            _fixed(deal_key, 33),
+            _u64(key_index),
+            _reference(_foreign_accounts, their_address, 1),
+            _u64(their_key_index),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        2,
+    )
+
+
+# attach_data(byte[33],uint64,uint64,uint64,string)uint64
+ATTACH_DATA = bytes.fromhex("40241f29")
+
+
+def attach_data(deal_key, key_index, data_length, data_index, data) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            ATTACH_DATA,
+            _fixed(deal_key, 33),
+            _u64(key_index),
+            _u64(data_length),
+            _u64(data_index),
+            _dynamic(data),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        0,
+    )
+
+
+# agree_disbursement(byte[33],uint64,account,uint64)string
+AGREE_DISBURSEMENT = bytes.fromhex("f264878b")
+
+
+def agree_disbursement(deal_key, key_index, their_address, their_key_index) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            AGREE_DISBURSEMENT,
+            _fixed(deal_key, 33),
+            _u64(key_index),
+            _reference(_foreign_accounts, their_address, 1),
+            _u64(their_key_index),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        0,
+    )
+
+
+# settle_deal(byte[33],uint64,account,uint64,uint64,uint64,uint64)string
+SETTLE_DEAL = bytes.fromhex("50861d61")
+
+
+def settle_deal(
+    deal_key,
+    key_index,
+    their_address,
+    their_key_index,
+    first_acc_forward_amount,
+    second_acc_forward_amount,
+    nonce,
+) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            SETTLE_DEAL,
+            _fixed(deal_key, 33),
+            _u64(key_index),
+            _reference(_foreign_accounts, their_address, 1),
+            _u64(their_key_index),
+            _u64(first_acc_forward_amount),
+            _u64(second_acc_forward_amount),
+            _u64(nonce),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        0,
+    )
+
+
+# settle_pair(account,byte[33][],uint64[],uint64[])uint64
+SETTLE_PAIR = bytes.fromhex("02e1f0af")
+
+
+def settle_pair(their_address, deal_keys, key_indexes, their_key_indexes) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            SETTLE_PAIR,
+            _reference(_foreign_accounts, their_address, 1),
+            _array(deal_keys, lambda item: _fixed(item, 33)),
+            _array(key_indexes, _u64),
+            _array(their_key_indexes, _u64),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        0,
+    )
+
+
+# adjust_disbursement(byte[33],uint64,account,uint64,uint64,uint64)string
+ADJUST_DISBURSEMENT = bytes.fromhex("6441fee4")
+
+
+def adjust_disbursement(
+    deal_key,
+    key_index,
+    their_address,
+    their_key_index,
+    first_acc_forward_amount,
+    second_acc_forward_amount,
+) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            ADJUST_DISBURSEMENT,
+            _fixed(deal_key, 33),
+            _u64(key_index),
+            _reference(_foreign_accounts, their_address, 1),
+            _u64(their_key_index),
+            _u64(first_acc_forward_amount),
+            _u64(second_acc_forward_amount),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        0,
+    )
+
+
+# recall_deal(byte[33],uint64,account,uint64)string
+RECALL_DEAL = bytes.fromhex("3a483ff6")
+
+
+def recall_deal(deal_key, key_index, their_address, their_key_index) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            RECALL_DEAL,
+            _fixed(deal_key, 33),
+            _u64(key_index),
+            _reference(_foreign_accounts, their_address, 1),
+            _u64(their_key_index),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        0,
+    )
+
+
+# reject_deal(byte[33],uint64,account,uint64)string
+REJECT_DEAL = bytes.fromhex("cb6107bd")
+
+
+def reject_deal(deal_key, key_index, their_address, their_key_index) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            REJECT_DEAL,
+            _fixed(deal_key, 33),
+            _u64(key_index),
+            _reference(_foreign_accounts, their_address, 1),
+            _u64(their_key_index),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        0,
+    )
+
+
+# create_hashed_deal(txn,txn,uint64,uint64,uint64,uint64,uint64,account,uint64,uint64,uint64,uint64,uint64,string,txn)uint64
+CREATE_HASHED_DEAL = bytes.fromhex("47f903b9")
+
+
+def create_hashed_deal(
+    key_index,
+    your_dep_amount,
+    your_dep_asset,
+    your_col_amount,
+    your_col_asset,
+    their_address,
+    their_key_index,
+    their_dep_amount,
+    their_dep_asset,
+    their_col_amount,
+    their_col_asset,
+    deal_note,
+) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            CREATE_HASHED_DEAL,
+            _u64(key_index),
+            _u64(your_dep_amount),
+            _u64(your_dep_asset),
+            _u64(your_col_amount),
+            _u64(your_col_asset),
+            _reference(_foreign_accounts, their_address, 1),
+            _u64(their_key_index),
+            _u64(their_dep_amount),
+            _u64(their_dep_asset),
+            _u64(their_col_amount),
+            _u64(their_col_asset),
+            _dynamic(deal_note),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        3,
+    )
+
+
+# add_deal_legs(pay,byte[33],uint64,account,uint64,(byte,uint64,uint64,uint64)[])uint64
+ADD_DEAL_LEGS = bytes.fromhex("89da006c")
+
+
+def add_deal_legs(deal_key, key_index, their_address, their_key_index, legs) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            ADD_DEAL_LEGS,
+            _fixed(deal_key, 33),
+            _u64(key_index),
+            _reference(_foreign_accounts, their_address, 1),
+            _u64(their_key_index),
+            _array(legs, lambda item: _STRUCT_0.pack(*item)),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        1,
+    )
+
+
+# adjust_leg_disbursement(byte[33],uint64,account,uint64,uint64[])string
+ADJUST_LEG_DISBURSEMENT = bytes.fromhex("c7659ba2")
+
+
+def adjust_leg_disbursement(
+    deal_key, key_index, their_address, their_key_index, forward_amounts
+) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            ADJUST_LEG_DISBURSEMENT,
+            _fixed(deal_key, 33),
+            _u64(key_index),
+            _reference(_foreign_accounts, their_address, 1),
+            _u64(their_key_index),
+            _array(forward_amounts, _u64),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        0,
+    )
+
+
+# seal_data(byte[33],uint64,byte[32])string
+SEAL_DATA = bytes.fromhex("34d1c835")
+
+
+def seal_data(deal_key, key_index, digest) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            SEAL_DATA,
+            _fixed(deal_key, 33),
+            _u64(key_index),
+            _fixed(digest, 32),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        0,
+    )
+
+
+# hello(string)string
+HELLO = bytes.fromhex("02bece11")
+
+
+def hello(name) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            HELLO,
+            _dynamic(name),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        0,
+    )
+
+
+# change_status(string)string
+CHANGE_STATUS = bytes.fromhex("a43db1ca")
+
+
+def change_status(new_status) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            CHANGE_STATUS,
+            _dynamic(new_status),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        0,
+    )
+
+
+# change_owner(address)address
+CHANGE_OWNER = bytes.fromhex("03337bf9")
+
+
+def change_owner(new_owner) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            CHANGE_OWNER,
+            _fixed(new_owner, 32),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        0,
+    )
+
+
+# send_note(address,string)string
+SEND_NOTE = bytes.fromhex("aa82defc")
+
+
+def send_note(receiver, note) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            SEND_NOTE,
+            _fixed(receiver, 32),
+            _dynamic(note),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        0,
+    )
+
+
+# verify_nfd(string,uint64)string
+VERIFY_NFD = bytes.fromhex("077d3f59")
+
+
+def verify_nfd(nfd_name, nfd_app_id) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            VERIFY_NFD,
+            _dynamic(nfd_name),
+            _u64(nfd_app_id),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        0,
+    )
+
+
+# opt_in_to_asa(asset,pay)string
+OPT_IN_TO_ASA = bytes.fromhex("42feff32")
+
+
+def opt_in_to_asa(asset) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            OPT_IN_TO_ASA,
+            _reference(_foreign_assets, asset, 0),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        1,
+    )
+
+
+# opt_in_to_asas(uint64[],pay)uint64
+OPT_IN_TO_ASAS = bytes.fromhex("cb5d8504")
+
+
+def opt_in_to_asas(assets) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            OPT_IN_TO_ASAS,
+            _array(assets, _u64),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        1,
+    )
+
+
+# close_out_asas(uint64[])uint64
+CLOSE_OUT_ASAS = bytes.fromhex("a7260af6")
+
+
+def close_out_asas(assets) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            CLOSE_OUT_ASAS,
+            _array(assets, _u64),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        0,
+    )
+
+
+# migrate_deals(byte[33][])uint64
+MIGRATE_DEALS = bytes.fromhex("714a1318")
+
+
+def migrate_deals(deal_keys) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            MIGRATE_DEALS,
+            _array(deal_keys, lambda item: _fixed(item, 33)),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        0,
+    )
+
+
+# read_data(byte[64],uint64,uint64)byte[]
+READ_DATA = bytes.fromhex("931ab4d5")
+
+
+def read_data(data_key, offset, length) -> Call:
+    _foreign_accounts, _foreign_assets, _foreign_apps = [], [], []
+    return Call(
+        [
+            READ_DATA,
+            _fixed(data_key, 64),
+            _u64(offset),
+            _u64(length),
+        ],
+        _foreign_accounts,
+        _foreign_assets,
+        _foreign_apps,
+        0,
+    )
+
+
+SELECTORS = {
+    BOX_BUDGET: "box_budget()void",
+    CREATE_DEAL: "create_deal(txn,txn,uint64,uint64,uint64,uint64,uint64,account,uint64,uint64,uint64,uint64,uint64,string,txn)uint64",
+    MATCH_DEAL: "match_deal(txn,txn,byte[33],uint64,account,uint64)byte[2]",
+    ATTACH_DATA: "attach_data(byte[33],uint64,uint64,uint64,string)uint64",
+    AGREE_DISBURSEMENT: "agree_disbursement(byte[33],uint64,account,uint64)string",
+    SETTLE_DEAL: "settle_deal(byte[33],uint64,account,uint64,uint64,uint64,uint64)string",
+    SETTLE_PAIR: "settle_pair(account,byte[33][],uint64[],uint64[])uint64",
+    ADJUST_DISBURSEMENT: "adjust_disbursement(byte[33],uint64,account,uint64,uint64,uint64)string",
+    RECALL_DEAL: "recall_deal(byte[33],uint64,account,uint64)string",
+    REJECT_DEAL: "reject_deal(byte[33],uint64,account,uint64)string",
+    CREATE_HASHED_DEAL: "create_hashed_deal(txn,txn,uint64,uint64,uint64,uint64,uint64,account,uint64,uint64,uint64,uint64,uint64,string,txn)uint64",
+    ADD_DEAL_LEGS: "add_deal_legs(pay,byte[33],uint64,account,uint64,(byte,uint64,uint64,uint64)[])uint64",
+    ADJUST_LEG_DISBURSEMENT: "adjust_leg_disbursement(byte[33],uint64,account,uint64,uint64[])string",
+    SEAL_DATA: "seal_data(byte[33],uint64,byte[32])string",
+    HELLO: "hello(string)string",
+    CHANGE_STATUS: "change_status(string)string",
+    CHANGE_OWNER: "change_owner(address)address",
+    SEND_NOTE: "send_note(address,string)string",
+    VERIFY_NFD: "verify_nfd(string,uint64)string",
+    OPT_IN_TO_ASA: "opt_in_to_asa(asset,pay)string",
+    OPT_IN_TO_ASAS: "opt_in_to_asas(uint64[],pay)uint64",
+    CLOSE_OUT_ASAS: "close_out_asas(uint64[])uint64",
+    MIGRATE_DEALS: "migrate_deals(byte[33][])uint64",
+    READ_DATA: "read_data(byte[64],uint64,uint64)byte[]",
+}
+RETURN_DECODERS = {
+    BOX_BUDGET: None,
+    CREATE_DEAL: _uint64_return,
+    MATCH_DEAL: bytes,
+    ATTACH_DATA: _uint64_return,
+    AGREE_DISBURSEMENT: _string_return,
+    SETTLE_DEAL: _string_return,
+    SETTLE_PAIR: _uint64_return,
+    ADJUST_DISBURSEMENT: _string_return,
+    RECALL_DEAL: _string_return,
+    REJECT_DEAL: _string_return,
+    CREATE_HASHED_DEAL: _uint64_return,
+    ADD_DEAL_LEGS: _uint64_return,
+    ADJUST_LEG_DISBURSEMENT: _string_return,
+    SEAL_DATA: _string_return,
+    HELLO: _string_return,
+    CHANGE_STATUS: _string_return,
+    CHANGE_OWNER: bytes,
+    SEND_NOTE: _string_return,
+    VERIFY_NFD: _string_return,
+    OPT_IN_TO_ASA: _string_return,
+    OPT_IN_TO_ASAS: _uint64_return,
+    CLOSE_OUT_ASAS: _uint64_return,
+    MIGRATE_DEALS: _uint64_return,
+    READ_DATA: _bytes_return,
+}
+
+
+def decode_return(selector, log):
+    # Last log of an app call, decoded for the method with that selector
+    if log[:4] != RETURN_PREFIX:
+        raise ValueError("Not an ARC-4 return log")
+    decoder = RETURN_DECODERS[selector]
+    return None if decoder is None else decoder(log[4:])
+
+
+# Deal box layout
+DealHeader = struct.Struct(">BB32sQQQQ32sQQQQQQBB")
+DealHeaderLength = 148
+DealNoteOffset = 152
+DealFields = (
+    "first_acc_status",
+    "second_acc_status",
+    "first_acc_address",
+    "first_acc_dep_amount",
+    "first_acc_dep_asset",
+    "first_acc_col_amount",
+    "first_acc_col_asset",
+    "second_acc_address",
+    "second_acc_dep_amount",
+    "second_acc_dep_asset",
+    "second_acc_col_amount",
+    "second_acc_col_asset",
+    "first_acc_forward_amount",
+    "second_acc_forward_amount",
+    "first_acc_data",
+    "second_acc_data",
+    "deal_note",
+)
+DealDetailsKeyLength = 33
+DealDataKeyLength = 64
+DealListBoxLength = 1023
+ZeroDealKey = bytes(DealDetailsKeyLength)
+HashedDealKeyPrefix = b"H"
+LegsKeyPrefix = b"L"
+DataAttachedFlag = 1
+DealLegsFlag = 2
+DataSealedFlag = 4
+DataCompressedFlag = 8
+CompressedWriteFlag = 9223372036854775808
+DealVersion = 1
+DealVersionShift = 4
+BoxFlatMBR = 2500
+BoxByteMBR = 400
+
+
+class Deal(NamedTuple):
+    first_acc_status: int
+    second_acc_status: int
+    first_acc_address: bytes
+    first_acc_dep_amount: int
+    first_acc_dep_asset: int
+    first_acc_col_amount: int
+    first_acc_col_asset: int
+    second_acc_address: bytes
+    second_acc_dep_amount: int
+    second_acc_dep_asset: int
+    second_acc_col_amount: int
+    second_acc_col_asset: int
+    first_acc_forward_amount: int
+    second_acc_forward_amount: int
+    first_acc_data: int
+    second_acc_data: int
+    deal_note: bytes
+
+
+def decode_deal(value: bytes) -> Deal:
+    # Versions 0 and 1 share one layout, a new version gets its own branch here
+    version = value[DealHeaderLength - 1] >> DealVersionShift
+    if version > DealVersion:
+        raise ValueError(f"Deal schema version {version} is newer than this client")
+    note_length = int.from_bytes(value[DealHeaderLength + 2 : DealNoteOffset], "big")
+    return Deal(
+        *DealHeader.unpack_from(value),
+        value[DealNoteOffset : DealNoteOffset + note_length],
+    )
+
+
+def deal_version(deal: Deal) -> int:
+    return deal.second_acc_data >> DealVersionShift
+
+
+def deal_box_cost(deal_box_length: int) -> int:
+    return BoxFlatMBR + (BoxByteMBR * (deal_box_length + DealDetailsKeyLength))
+
+
+def data_box_cost(data_length: int) -> int:
+    return BoxFlatMBR + (BoxByteMBR * (data_length + DealDataKeyLength))
+
+
+def legs_box_key(deal_key: bytes) -> bytes:
+    return LegsKeyPrefix + deal_key[1:]
+
+
+def is_hashed_deal(deal_key: bytes) -> bool:
+    return deal_key[:1] == HashedDealKeyPrefix
+
+
+def twin_deal_key(deal_key: bytes) -> bytes:
+    # The key a deal of the other kind, "D" or "H", would have for the same
+    # accounts and note. Creating a deal asserts it has no box, so the create
+    # call needs a box reference for it too.
+    if is_hashed_deal(deal_key):
+        return b"D" + deal_key[1:]
+    return HashedDealKeyPrefix + deal_key[1:]
+
+
+def deal_list_keys(deal_list: bytes) -> list[bytes]:
+    # Deal keys box is 1023 bytes with 31x 33-byte slots
+    return [
+        deal_list[i : i + DealDetailsKeyLength]
+        for i in range(0, DealListBoxLength, DealDetailsKeyLength)
+    ]
+
+
+def create_deal_key(
+    sender: bytes, their_address: bytes, deal_note: bytes, key_prefix: bytes = b"D"
+) -> bytes:
+    # Whichever account is "greater" goes first, as in the contract. Loading
+    # hashlib takes longer than the rest of this module, so it waits until here
+    import hashlib
+
+    if sender > their_address:
+        return key_prefix + hashlib.sha256(sender + their_address + deal_note).digest()
+    return key_prefix + hashlib.sha256(their_address + sender + deal_note).digest()
+
+
+def data_box_key(address: bytes, deal_key: bytes) -> bytes:
+    return address + deal_key[1:]
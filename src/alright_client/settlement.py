@@ -0,0 +1,219 @@
+"""Settlement rules of send_disbursements as plain functions.
+
+settlement_plan mirrors the contract transfer for transfer, for any decoded
+deal record (layout.Deal, events.DealEvent or a stream view entry) and its
+extra legs. net_settlement_plan does the same for settle_pair, which pays each
+account its total per asset across many deals. settlement_totals covers the
+primary assets only. It applies the same rules to a NumPy structured array of
+deal headers and sums payouts per account and asset. NumPy is only imported
+there.
+"""
+
+from collections.abc import Iterable
+from typing import Any, NamedTuple
+
+from alright_client.layout import (
+    DealHeaderLength,
+    DealLeg,
+    DealLegsFlag,
+    LegSecondAccount,
+    legs_cost,
+)
+
+
+class Transfer(NamedTuple):
+    receiver: bytes
+    asset: int
+    amount: int
+    note: bytes
+
+
+def _deposit_transfers(
+    asset: int,
+    amount: int,
+    forward: int,
+    owner: bytes,
+    counterparty: bytes,
+) -> list[Transfer]:
+    if amount == forward:
+        transfers = [Transfer(counterparty, asset, amount, b"Payment forward")]
+    elif forward == 0:
+        transfers = [Transfer(owner, asset, amount, b"Payment returned")]
+    elif forward > amount:
+        # The contract panics on the negative remainder
+        raise ValueError("Forward amount exceeds deposit amount")
+    else:
+        transfers = [
+            Transfer(counterparty, asset, forward, b"Partial payment forward"),
+            Transfer(owner, asset, amount - forward, b"Partial payment returned"),
+        ]
+    return transfers
+
+
+def settlement_plan(deal: Any, legs: Iterable[DealLeg] = ()) -> list[Transfer]:
+    # Zero amounts are skipped, as send_algo_or_asa does. Extra legs follow the
+    # primary assets and forward their forward amount, returning the rest. Then
+    # the legs box MBR goes back to the creator, who carries DealLegsFlag.
+    legs = list(legs)
+    transfers = [
+        *_deposit_transfers(
+            deal.first_acc_dep_asset,
+            deal.first_acc_dep_amount,
+            deal.first_acc_forward_amount,
+            deal.first_acc_address,
+            deal.second_acc_address,
+        ),
+        Transfer(
+            deal.first_acc_address,
+            deal.first_acc_col_asset,
+            deal.first_acc_col_amount,
+            b"Collateral returned",
+        ),
+        *_deposit_transfers(
+            deal.second_acc_dep_asset,
+            deal.second_acc_dep_amount,
+            deal.second_acc_forward_amount,
+            deal.second_acc_address,
+            deal.first_acc_address,
+        ),
+        Transfer(
+            deal.second_acc_address,
+            deal.second_acc_col_asset,
+            deal.second_acc_col_amount,
+            b"Collateral returned",
+        ),
+    ]
+    for leg in legs:
+        if leg.flags & LegSecondAccount:
+            owner, counterparty = deal.second_acc_address, deal.first_acc_address
+        else:
+            owner, counterparty = deal.first_acc_address, deal.second_acc_address
+        if leg.forward_amount > leg.amount:
+            raise ValueError("Forward amount exceeds leg amount")
+        transfers += [
+            Transfer(counterparty, leg.asset, leg.forward_amount, b"Leg payment"),
+            Transfer(owner, leg.asset, leg.amount - leg.forward_amount, b"Leg payment"),
+        ]
+    if legs:
+        if deal.first_acc_data & DealLegsFlag:
+            creator = deal.first_acc_address
+        else:
+            creator = deal.second_acc_address
+        transfers.append(
+            Transfer(creator, 0, legs_cost(legs), b"Legs box MBR returned")
+        )
+    return [transfer for transfer in transfers if transfer.amount != 0]
+
+
+def net_settlement_plan(deals: Iterable[Any]) -> list[Transfer]:
+    """Transfers settle_pair sends for `deals`, in the order it sends them.
+
+    Amounts are summed per receiver and asset, in order of first appearance.
+    settle_pair refuses deals with extra legs.
+    """
+    totals: dict[tuple[bytes, int], int] = {}
+    for deal in deals:
+        for transfer in settlement_plan(deal):
+            key = (transfer.receiver, transfer.asset)
+            totals[key] = totals.get(key, 0) + transfer.amount
+    return [
+        Transfer(receiver, asset, amount, b"Net settlement")
+        for (receiver, asset), amount in totals.items()
+    ]
+
+
+def deal_header_dtype():
+    import numpy as np
+
+    u8 = ">u8"
+    return np.dtype(
+        [
+            ("first_acc_status", "u1"),
+            ("second_acc_status", "u1"),
+            ("first_acc_address", "S32"),
+            ("first_acc_dep_amount", u8),
+            ("first_acc_dep_asset", u8),
+            ("first_acc_col_amount", u8),
+            ("first_acc_col_asset", u8),
+            ("second_acc_address", "S32"),
+            ("second_acc_dep_amount", u8),
+            ("second_acc_dep_asset", u8),
+            ("second_acc_col_amount", u8),
+            ("second_acc_col_asset", u8),
+            ("first_acc_forward_amount", u8),
+            ("second_acc_forward_amount", u8),
+            ("first_acc_data", "u1"),
+            ("second_acc_data", "u1"),
+        ]
+    )
+
+
+def deal_headers(values: Iterable[bytes]):
+    # Decode many deal box values at once by viewing their heads as records
+    import numpy as np
+
+    heads = b"".join(value[:DealHeaderLength] for value in values)
+    return np.frombuffer(heads, dtype=deal_header_dtype())
+
+
+def settlement_totals(deals):
+    """Total payout per (account, asset) if every deal in `deals` settled now.
+
+    `deals` is a structured array with deal_header_dtype(). Returns a structured
+    array of (account, asset, amount) rows sorted by account then asset. NumPy
+    drops trailing NUL bytes when an S32 account is read back as bytes, so pad
+    it with ljust(32, b"\0") before comparing against raw addresses.
+    """
+    import numpy as np
+
+    first = deals["first_acc_address"]
+    second = deals["second_acc_address"]
+    first_dep = deals["first_acc_dep_amount"].astype(np.uint64)
+    first_fwd = deals["first_acc_forward_amount"].astype(np.uint64)
+    second_dep = deals["second_acc_dep_amount"].astype(np.uint64)
+    second_fwd = deals["second_acc_forward_amount"].astype(np.uint64)
+    if np.any(first_fwd > first_dep) or np.any(second_fwd > second_dep):
+        raise ValueError("Forward amount exceeds deposit amount")
+
+    # Every branch of send_disbursements forwards `forward` and returns the rest
+    accounts = np.concatenate((second, first, first, first, second, second))
+    assets = np.concatenate(
+        (
+            deals["first_acc_dep_asset"],
+            deals["first_acc_dep_asset"],
+            deals["first_acc_col_asset"],
+            deals["second_acc_dep_asset"],
+            deals["second_acc_dep_asset"],
+            deals["second_acc_col_asset"],
+        )
+    ).astype(np.uint64)
+    amounts = np.concatenate(
+        (
+            first_fwd,
+            first_dep - first_fwd,
+            deals["first_acc_col_amount"].astype(np.uint64),
+            second_fwd,
+            second_dep - second_fwd,
+            deals["second_acc_col_amount"].astype(np.uint64),
+        )
+    )
+    paid = amounts != 0
+    accounts, assets, amounts = accounts[paid], assets[paid], amounts[paid]
+
+    totals_dtype = np.dtype(
+        [("account", "S32"), ("asset", np.uint64), ("amount", np.uint64)]
+    )
+    if not len(amounts):
+        return np.zeros(0, dtype=totals_dtype)
+    order = np.lexsort((assets, accounts))
+    accounts, assets, amounts = accounts[order], assets[order], amounts[order]
+    starts = np.flatnonzero(
+        np.concatenate(
+            ([True], (accounts[1:] != accounts[:-1]) | (assets[1:] != assets[:-1]))
+        )
+    )
+    totals = np.zeros(len(starts), dtype=totals_dtype)
+    totals["account"] = accounts[starts]
+    totals["asset"] = assets[starts]
+    totals["amount"] = np.add.reduceat(amounts, starts)
+    return totals
@@ -0,0 +1,255 @@
+"""Route deals across several deployments of AlrightApp.
+
+Every shard is an independent app with its own escrow account, counters and
+box namespace. A new deal goes to the shard its deal key routes to, by jump
+consistent hash of the key's hash bytes, so both accounts derive the same
+shard without coordination and adding a shard moves as few keys as possible.
+Accounts pinned to a shard, e.g. to isolate a hot account, take every deal
+they are in with them. Each account needs a deal list box in every shard it
+deals on.
+
+Deals that already exist stay where they were created, so lookups by key try
+the routed shard first and then the others, and queries fan out to all shards
+at once. merge_feeds interleaves per-shard indexer feeds in chain order for
+stream.DealView, which then sees the shards as one app.
+"""
+
+import base64
+import copy
+import heapq
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
+
+from algosdk import abi, logic, transaction
+from algosdk.error import AlgodHTTPError
+
+from alright_client.counters import DealCounters, deal_counters, decode_global_state
+from alright_client.layout import Deal, ZeroDealKey, decode_deal, deal_list_keys
+from alright_client.relayer import txn_fee
+
+OptInSelector = abi.Method.from_signature(
+    "opt_in_to_asas(uint64[],pay)uint64"
+).get_selector()
+AssetMBR = 100_000
+MaxOptInAssets = 8  # Each asset must be in the call's foreign assets
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    # Lamping and Veach, "A Fast, Minimal Memory, Consistent Hash Algorithm"
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
+
+
+class ShardSet:
+    def __init__(
+        self, app_ids: Sequence[int], pinned: Mapping[bytes, int] | None = None
+    ) -> None:
+        # Order matters: new shards go at the end so existing keys mostly stay
+        if not app_ids:
+            raise ValueError("At least one shard")
+        self.app_ids = tuple(app_ids)
+        # Account public key -> app id for accounts kept on one shard
+        self.pinned = dict(pinned or {})
+
+    def __len__(self) -> int:
+        return len(self.app_ids)
+
+    def app_for(
+        self, deal_key: bytes, first: bytes | None = None, second: bytes | None = None
+    ) -> int:
+        # A pinned account wins, the deal's first account if both are pinned.
+        # As in the contract, the first account is the greater address, so both
+        # sides route a deal the same way whichever order they pass them in.
+        accounts = sorted(
+            (account for account in (first, second) if account is not None),
+            reverse=True,
+        )
+        for account in accounts:
+            if account in self.pinned:
+                return self.pinned[account]
+        key = int.from_bytes(deal_key[1:9], "big")
+        return self.app_ids[jump_hash(key, len(self.app_ids))]
+
+    def app_address(self, app_id: int) -> str:
+        return logic.get_application_address(app_id)
+
+    def lookup_order(self, deal_key: bytes) -> list[int]:
+        routed = self.app_for(deal_key)
+        return [routed] + [app_id for app_id in self.app_ids if app_id != routed]
+
+
+def discover_shards(
+    algod_client,
+    creator: str,
+    approval_program: bytes | None = None,
+    pinned: Mapping[bytes, int] | None = None,
+) -> ShardSet:
+    """ShardSet of the apps `creator` deployed, oldest first.
+
+    With approval_program only apps running exactly that program count,
+    otherwise any app whose global state has the deal counters.
+    """
+    app_ids = []
+    for app in algod_client.account_info(creator).get("created-apps", []):
+        params = app["params"]
+        if approval_program is not None:
+            if base64.b64decode(params["approval-program"]) != approval_program:
+                continue
+        elif b"total_deals" not in decode_global_state(params.get("global-state", [])):
+            continue
+        app_ids.append(app["id"])
+    return ShardSet(sorted(app_ids), pinned)
+
+
+def opt_in_groups(
+    algod_client,
+    owner: str,
+    shards: ShardSet,
+    assets: Iterable[int],
+    sp: transaction.SuggestedParams | None = None,
+) -> list[list[transaction.Transaction]]:
+    """Unsigned owner groups that opt every shard into `assets`.
+
+    Assets a shard already holds are skipped. Each group pays the 0.1A MBR
+    per asset and covers the inner opt-ins with the app call's fee.
+    """
+    if sp is None:
+        sp = algod_client.suggested_params()
+    assets = list(dict.fromkeys(assets))
+    groups = []
+    for app_id in shards.app_ids:
+        address = shards.app_address(app_id)
+        held = {
+            holding["asset-id"]
+            for holding in algod_client.account_info(address).get("assets", [])
+        }
+        missing = [asset for asset in assets if asset not in held]
+        for i in range(0, len(missing), MaxOptInAssets):
+            chunk = missing[i : i + MaxOptInAssets]
+            call_sp = copy.copy(sp)
+            call_sp.flat_fee = True
+            call_sp.fee = txn_fee(sp) * (1 + len(chunk))
+            groups.append(
+                transaction.assign_group_id(
+                    [
+                        transaction.PaymentTxn(
+                            owner, sp, address, AssetMBR * len(chunk)
+                        ),
+                        transaction.ApplicationNoOpTxn(
+                            owner,
+                            call_sp,
+                            app_id,
+                            app_args=[
+                                OptInSelector,
+                                abi.ABIType.from_string("uint64[]").encode(chunk),
+                            ],
+                            foreign_assets=chunk,
+                        ),
+                    ]
+                )
+            )
+    return groups
+
+
+def _fan_out(shards: ShardSet, fetch) -> dict[int, object]:
+    with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+        return dict(zip(shards.app_ids, pool.map(fetch, shards.app_ids)))
+
+
+def read_box(algod_client, app_id: int, name: bytes) -> bytes | None:
+    try:
+        box = algod_client.application_box_by_name(app_id, name)
+    except AlgodHTTPError as error:
+        if error.code == 404:
+            return None
+        raise
+    return base64.b64decode(box["value"])
+
+
+def aggregate_counters(
+    algod_client, shards: ShardSet, current_round: int | None = None
+) -> DealCounters:
+    # Sum of counters.deal_counters over every shard
+    per_shard = _fan_out(
+        shards,
+        lambda app_id: deal_counters(
+            decode_global_state(
+                algod_client.application_info(app_id)["params"].get("global-state", [])
+            ),
+            current_round,
+        ),
+    )
+    by_class: dict[str, list[int]] = {}
+    by_epoch: dict[int, list[int]] = {}
+    for counters in per_shard.values():
+        for totals, buckets in (
+            (by_class, counters.by_class),
+            (by_epoch, counters.by_epoch),
+        ):
+            for bucket, (matched, completed) in buckets.items():
+                total = totals.setdefault(bucket, [0, 0])
+                total[0] += matched
+                total[1] += completed
+    return DealCounters(
+        sum(counters.total_deals for counters in per_shard.values()),
+        sum(counters.active_deals for counters in per_shard.values()),
+        sum(counters.completed_deals for counters in per_shard.values()),
+        {name: tuple(counts) for name, counts in by_class.items()},
+        {epoch: tuple(by_epoch[epoch]) for epoch in sorted(by_epoch)},
+    )
+
+
+def account_deals(
+    algod_client, shards: ShardSet, address: bytes
+) -> list[tuple[int, int, bytes, Deal]]:
+    """(app id, key index, deal key, deal) for every deal of `address`.
+
+    Reads the account's deal list on every shard, then its deals, all shards
+    at once.
+    """
+
+    def fetch(app_id: int) -> list[tuple[int, int, bytes, Deal]]:
+        deal_list = read_box(algod_client, app_id, address)
+        if deal_list is None:
+            return []
+        deals = []
+        for index, deal_key in enumerate(deal_list_keys(deal_list)):
+            if deal_key == ZeroDealKey:
+                continue
+            value = read_box(algod_client, app_id, deal_key)
+            if value is not None:
+                deals.append((app_id, index, deal_key, decode_deal(value)))
+        return deals
+
+    return [deal for deals in _fan_out(shards, fetch).values() for deal in deals]
+
+
+def find_deal(
+    algod_client, shards: ShardSet, deal_key: bytes
+) -> tuple[int, Deal] | None:
+    # The routed shard first, as that is where new deals go
+    for app_id in shards.lookup_order(deal_key):
+        value = read_box(algod_client, app_id, deal_key)
+        if value is not None:
+            return app_id, decode_deal(value)
+    return None
+
+
+def merge_feeds(*feeds: Iterable[dict]) -> Iterator[dict]:
+    """Interleave per-shard indexer feeds by (round, intra-round offset).
+
+    Each feed must be in chain order, e.g. stream.read_feed of one shard's
+    export. The offset is unique within a round across all apps, so the merge
+    is the order the chain confirmed them in.
+    """
+    return heapq.merge(
+        *feeds,
+        key=lambda record: (
+            record["confirmed-round"],
+            record.get("intra-round-offset", 0),
+        ),
+    )
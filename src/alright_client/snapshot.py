@@ -0,0 +1,255 @@
+"""Columnar snapshot of the app's boxes and global state, for analytics.
+
+A snapshot is a directory of NumPy .npy files, one structured array per box
+kind, whose big-endian dtypes are the contract's fixed-offset layouts:
+
+    deals.npy        deal_key, DealValue header fields, note_start, note_length
+    deal_notes.bin   every deal_note back to back, at note_start
+    deal_lists.npy   address, the 31 deal key slots
+    legs.npy         legs_key, then one DealLeg record per row
+    manifest.json    app id, round, row counts and the decoded global state
+
+Rows are box bytes copied as they are, so the writer never holds more than one
+batch of boxes and needs neither numpy nor pyarrow. The row count goes into
+each .npy header when the file is closed. load_snapshot memory-maps the
+arrays, so even a multi-GB snapshot opens at once and columns load on first
+touch. Data boxes hold opaque attachments and are left out.
+
+    python -m alright_client.snapshot ALGOD_ADDRESS APP_ID OUT_DIR [TOKEN]
+"""
+
+import ast
+import base64
+import json
+import os
+import struct
+import sys
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+from alright_client.counters import decode_global_state
+from alright_client.layout import (
+    Deal,
+    DealDetailsKeyLength,
+    DealHeader,
+    DealHeaderLength,
+    DealListBoxLength,
+    DealListKeyLength,
+    DealListSlots,
+    DealNoteOffset,
+    HashedDealKeyPrefix,
+    LegLength,
+    LegsKeyPrefix,
+)
+from alright_client.shards import read_box
+
+NpyMagic = b"\x93NUMPY\x01\x00"
+# Header room for any row count, rewritten in place on close
+NpyHeaderLength = 1024
+DealKeyPrefixes = (b"D", HashedDealKeyPrefix)
+
+DealsDtype = [
+    ("deal_key", "S33"),
+    ("first_acc_status", "u1"),
+    ("second_acc_status", "u1"),
+    ("first_acc_address", "S32"),
+    ("first_acc_dep_amount", ">u8"),
+    ("first_acc_dep_asset", ">u8"),
+    ("first_acc_col_amount", ">u8"),
+    ("first_acc_col_asset", ">u8"),
+    ("second_acc_address", "S32"),
+    ("second_acc_dep_amount", ">u8"),
+    ("second_acc_dep_asset", ">u8"),
+    ("second_acc_col_amount", ">u8"),
+    ("second_acc_col_asset", ">u8"),
+    ("first_acc_forward_amount", ">u8"),
+    ("second_acc_forward_amount", ">u8"),
+    ("first_acc_data", "u1"),
+    ("second_acc_data", "u1"),
+    ("note_start", ">u8"),
+    ("note_length", ">u2"),
+]
+DealListsDtype = [
+    ("address", "S32"),
+    ("deal_keys", "S33", (DealListSlots,)),
+]
+LegsDtype = [
+    ("legs_key", "S33"),
+    ("flags", "u1"),
+    ("asset", ">u8"),
+    ("amount", ">u8"),
+    ("forward_amount", ">u8"),
+]
+DealRow = struct.Struct(f">{DealDetailsKeyLength}s{DealHeaderLength}sQH")  # 191 bytes
+
+
+class NpyWriter:
+    """Appends raw rows of a structured dtype to an .npy file."""
+
+    def __init__(self, path: str, dtype: list[tuple]) -> None:
+        self._file = open(path, "wb")
+        self._descr = dtype
+        self.rows = 0
+        self._write_header()
+
+    def _write_header(self) -> None:
+        header = repr(
+            {"descr": self._descr, "fortran_order": False, "shape": (self.rows,)}
+        ).encode()
+        padding = NpyHeaderLength - len(NpyMagic) - 2 - len(header) - 1
+        self._file.seek(0)
+        self._file.write(
+            NpyMagic
+            + (NpyHeaderLength - len(NpyMagic) - 2).to_bytes(2, "little")
+            + header
+            + b" " * padding
+            + b"\n"
+        )
+
+    def write(self, row: bytes) -> None:
+        self._file.write(row)
+        self.rows += 1
+
+    def close(self) -> None:
+        self._write_header()
+        self._file.close()
+
+
+def read_npy_header(path: str) -> tuple[dict, int]:
+    # (header dict, offset of the first row) of an .npy file
+    with open(path, "rb") as npy:
+        prefix = npy.read(len(NpyMagic) + 2)
+        if prefix[:6] != NpyMagic[:6]:
+            raise ValueError(f"{path} is not an .npy file")
+        length = int.from_bytes(prefix[8:], "little")
+        return ast.literal_eval(npy.read(length).decode()), len(prefix) + length
+
+
+def algod_boxes(
+    algod_client, app_id: int, max_workers: int = 16, batch: int = 256
+) -> Iterator[tuple[bytes, bytes]]:
+    # (name, value) of every box of the app, `batch` reads in memory at a time
+    names = [
+        base64.b64decode(box["name"])
+        for box in algod_client.application_boxes(app_id)["boxes"]
+    ]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for i in range(0, len(names), batch):
+            chunk = names[i : i + batch]
+            values = pool.map(lambda name: read_box(algod_client, app_id, name), chunk)
+            for name, value in zip(chunk, values):
+                if value is not None:
+                    yield name, value
+
+
+def export_snapshot(
+    path: str,
+    boxes: Iterable[tuple[bytes, bytes]],
+    global_state: dict[bytes, int | bytes],
+    app_id: int | None = None,
+    round_: int | None = None,
+) -> dict[str, int]:
+    """Write a snapshot directory from (box name, value) pairs.
+
+    Returns the row count of each array.
+    """
+    os.makedirs(path, exist_ok=True)
+    deals = NpyWriter(os.path.join(path, "deals.npy"), DealsDtype)
+    deal_lists = NpyWriter(os.path.join(path, "deal_lists.npy"), DealListsDtype)
+    legs = NpyWriter(os.path.join(path, "legs.npy"), LegsDtype)
+    note_start = 0
+    with open(os.path.join(path, "deal_notes.bin"), "wb") as notes:
+        for name, value in boxes:
+            if len(name) == DealListKeyLength and len(value) == DealListBoxLength:
+                deal_lists.write(name + value)
+            elif len(name) == DealDetailsKeyLength and name[:1] in DealKeyPrefixes:
+                note_length = int.from_bytes(
+                    value[DealHeaderLength + 2 : DealNoteOffset], "big"
+                )
+                note = value[DealNoteOffset : DealNoteOffset + note_length]
+                deals.write(
+                    DealRow.pack(name, value[:DealHeaderLength], note_start, len(note))
+                )
+                notes.write(note)
+                note_start += len(note)
+            elif len(name) == DealDetailsKeyLength and name[:1] == LegsKeyPrefix:
+                for i in range(0, len(value), LegLength):
+                    legs.write(name + value[i : i + LegLength])
+    counts = {}
+    for name, writer in (("deals", deals), ("deal_lists", deal_lists), ("legs", legs)):
+        writer.close()
+        counts[name] = writer.rows
+    with open(os.path.join(path, "manifest.json"), "w") as manifest:
+        json.dump(
+            {
+                "app_id": app_id,
+                "round": round_,
+                "rows": counts,
+                "global_state": {
+                    key.decode(errors="backslashreplace"): (
+                        value if isinstance(value, int) else value.hex()
+                    )
+                    for key, value in global_state.items()
+                },
+            },
+            manifest,
+            indent=2,
+        )
+    return counts
+
+
+def export_app(algod_client, app_id: int, path: str, max_workers: int = 16) -> dict:
+    round_ = algod_client.status()["last-round"]
+    state = decode_global_state(
+        algod_client.application_info(app_id)["params"].get("global-state", [])
+    )
+    return export_snapshot(
+        path, algod_boxes(algod_client, app_id, max_workers), state, app_id, round_
+    )
+
+
+def load_snapshot(path: str) -> dict:
+    """Memory-mapped arrays of a snapshot, by name, plus "deal_notes" bytes.
+
+    Needs numpy. Amounts keep the contract's big-endian byte order; numpy
+    converts them on arithmetic.
+    """
+    import numpy
+
+    snapshot = {
+        name: numpy.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        for name in ("deals", "deal_lists", "legs")
+    }
+    notes_path = os.path.join(path, "deal_notes.bin")
+    snapshot["deal_notes"] = (
+        numpy.memmap(notes_path, dtype="u1", mode="r")
+        if os.path.getsize(notes_path)
+        else numpy.zeros(0, dtype="u1")
+    )
+    return snapshot
+
+
+def iter_deals(path: str) -> Iterator[tuple[bytes, Deal]]:
+    # Standard library reader of deals.npy, for environments without numpy
+    _, offset = read_npy_header(os.path.join(path, "deals.npy"))
+    with open(os.path.join(path, "deals.npy"), "rb") as deals, open(
+        os.path.join(path, "deal_notes.bin"), "rb"
+    ) as notes:
+        deals.seek(offset)
+        while row := deals.read(DealRow.size):
+            deal_key, header, note_start, note_length = DealRow.unpack(row)
+            notes.seek(note_start)
+            yield deal_key, Deal(*DealHeader.unpack(header), notes.read(note_length))
+
+
+def main(argv: list[str] | None = None) -> None:
+    from algosdk.v2client import algod
+
+    argv = sys.argv[1:] if argv is None else argv
+    address, app_id, path = argv[0], int(argv[1]), argv[2]
+    client = algod.AlgodClient(argv[3] if len(argv) > 3 else "", address)
+    print(json.dumps(export_app(client, app_id, path)))
+
+
+if __name__ == "__main__":
+    main()
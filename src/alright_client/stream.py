@@ -0,0 +1,237 @@
+"""Streaming consumer that folds deal events into a live view of open deals.
+
+The feed is a JSON-lines export of app call transactions as returned by the
+indexer (confirmed-round, intra-round-offset and base64 logs per line). A file
+replay stands in for the network: with follow=True the reader keeps tailing the
+file as new rounds are appended.
+"""
+
+import base64
+import json
+import os
+import time
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+
+from alright_client.events import (
+    DataAttachedEvent,
+    DealCreatedEvent,
+    DealDisbursedEvent,
+    DealEvent,
+    DealLegsEvent,
+    DealMatchedEvent,
+    DealRecalledEvent,
+    DealRejectedEvent,
+    DisbursementAdjustedEvent,
+    DisbursementAgreedEvent,
+    LegsEvent,
+    decode_deal_and_legs_events,
+)
+from alright_client.layout import DealLeg, LegSecondAccount
+
+# (confirmed round, intra-round offset, event index within the transaction)
+Position = tuple[int, int, int]
+# DealEvent fields held as bytes, hex-encoded in checkpoints
+BytesFields = (1, 4, 9)
+
+
+def read_feed(
+    path: str, follow: bool = False, poll_interval: float = 0.5
+) -> Iterator[dict]:
+    with open(path, "rb") as feed:
+        while True:
+            line = feed.readline()
+            if line.endswith(b"\n"):
+                yield json.loads(line)
+            elif follow:
+                # Partial or no line yet, rewind and wait for the writer
+                feed.seek(-len(line), os.SEEK_CUR)
+                time.sleep(poll_interval)
+            else:
+                if line.strip():
+                    yield json.loads(line)
+                return
+
+
+def iter_transactions(txns: Iterable[dict]) -> Iterator[dict]:
+    # Logs can sit on inner app calls as well as the outer transaction
+    for txn in txns:
+        yield txn
+        inner = txn.get("inner-txns")
+        if inner:
+            yield from iter_transactions(inner)
+
+
+def feed_events(
+    records: Iterable[dict], after: Position = (-1, -1, -1)
+) -> Iterator[tuple[Position, DealEvent | LegsEvent]]:
+    b64decode = base64.b64decode
+    for record in records:
+        round_, offset = record["confirmed-round"], record.get("intra-round-offset", 0)
+        if (round_, offset) < after[:2]:
+            continue
+        index = 0
+        for txn in iter_transactions((record,)):
+            logs = txn.get("logs")
+            if logs:
+                for event in decode_deal_and_legs_events(
+                    b64decode(log) for log in logs
+                ):
+                    position = (round_, offset, index)
+                    index += 1
+                    if position > after:
+                        yield position, event
+
+
+class DealView:
+    def __init__(self) -> None:
+        self.position: Position = (-1, -1, -1)
+        # Deal key -> latest event for every open deal
+        self.deals: dict[bytes, DealEvent] = {}
+        # Deal key -> extra legs of every open deal that has them
+        self.legs: dict[bytes, list[DealLeg]] = {}
+        # (address, asset) -> amount held in escrow by the app for that account
+        self.balances: defaultdict[tuple[bytes, int], int] = defaultdict(int)
+
+    def _escrow(self, event: DealEvent, first: bool, sign: int) -> None:
+        if first:
+            address = event.first_acc_address
+            holdings = (
+                (event.first_acc_dep_asset, event.first_acc_dep_amount),
+                (event.first_acc_col_asset, event.first_acc_col_amount),
+            )
+        else:
+            address = event.second_acc_address
+            holdings = (
+                (event.second_acc_dep_asset, event.second_acc_dep_amount),
+                (event.second_acc_col_asset, event.second_acc_col_amount),
+            )
+        side = 0 if first else LegSecondAccount
+        holdings += tuple(
+            (leg.asset, leg.amount)
+            for leg in self.legs.get(event.deal_key, ())
+            if leg.flags & LegSecondAccount == side
+        )
+        for asset, amount in holdings:
+            self._add_balance(address, asset, sign * amount)
+
+    def _add_balance(self, address: bytes, asset: int, amount: int) -> None:
+        if amount:
+            key = (address, asset)
+            self.balances[key] += amount
+            if not self.balances[key]:
+                del self.balances[key]
+
+    def _apply_legs(self, event: LegsEvent) -> None:
+        # add_deal_legs logs the legs first, as the creator pays in their own.
+        # adjust_leg_disbursement logs them again with new forward amounts only.
+        added = event.deal_key not in self.legs
+        self.legs[event.deal_key] = event.legs
+        deal = self.deals.get(event.deal_key)
+        if added and deal is not None:
+            first = deal.first_acc_status == 1
+            side = 0 if first else LegSecondAccount
+            address = deal.first_acc_address if first else deal.second_acc_address
+            for leg in event.legs:
+                if leg.flags & LegSecondAccount == side:
+                    self._add_balance(address, leg.asset, leg.amount)
+
+    def apply(self, position: Position, event: DealEvent | LegsEvent) -> None:
+        code = event.event
+        if code == DealLegsEvent:
+            self._apply_legs(event)
+        elif code == DealCreatedEvent:
+            self.deals[event.deal_key] = event
+            self._escrow(event, event.first_acc_status == 1, 1)
+        elif code == DealMatchedEvent:
+            # The matching account is the one whose status was 0 before, which
+            # needs the create event, so replays should start at app creation
+            previous = self.deals.get(event.deal_key, event)
+            self.deals[event.deal_key] = event
+            self._escrow(event, previous.first_acc_status == 0, 1)
+        elif code in (
+            DataAttachedEvent,
+            DisbursementAdjustedEvent,
+            DisbursementAgreedEvent,
+        ):
+            self.deals[event.deal_key] = event
+        elif code in (DealRecalledEvent, DealRejectedEvent):
+            # Only the account at status 1 had deposited
+            self.deals.pop(event.deal_key, None)
+            self._escrow(event, event.first_acc_status == 1, -1)
+            self.legs.pop(event.deal_key, None)
+        elif code == DealDisbursedEvent:
+            self.deals.pop(event.deal_key, None)
+            self._escrow(event, True, -1)
+            self._escrow(event, False, -1)
+            self.legs.pop(event.deal_key, None)
+        self.position = position
+
+    def to_json(self) -> dict:
+        return {
+            "position": list(self.position),
+            "deals": [
+                [
+                    value.hex() if i in BytesFields else value
+                    for i, value in enumerate(event)
+                ]
+                for event in self.deals.values()
+            ],
+            "balances": [
+                [address.hex(), asset, amount]
+                for (address, asset), amount in self.balances.items()
+            ],
+            "legs": [
+                [deal_key.hex(), [list(leg) for leg in legs]]
+                for deal_key, legs in self.legs.items()
+            ],
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "DealView":
+        view = cls()
+        view.position = tuple(data["position"])
+        for row in data["deals"]:
+            for i in BytesFields:
+                row[i] = bytes.fromhex(row[i])
+            event = DealEvent._make(row)
+            view.deals[event.deal_key] = event
+        for address, asset, amount in data["balances"]:
+            view.balances[(bytes.fromhex(address), asset)] = amount
+        for deal_key, legs in data.get("legs", []):
+            view.legs[bytes.fromhex(deal_key)] = [DealLeg._make(leg) for leg in legs]
+        return view
+
+
+def save_checkpoint(view: DealView, path: str) -> None:
+    data = view.to_json()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as tmp:
+        json.dump(data, tmp, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str) -> DealView:
+    if not os.path.exists(path):
+        return DealView()
+    with open(path) as checkpoint:
+        return DealView.from_json(json.load(checkpoint))
+
+
+def consume(
+    feed_path: str,
+    checkpoint_path: str,
+    follow: bool = False,
+    checkpoint_rounds: int = 1000,
+) -> Iterator[tuple[Position, DealEvent, DealView]]:
+    view = load_checkpoint(checkpoint_path)
+    last_saved = view.position[0]
+    try:
+        for position, event in feed_events(read_feed(feed_path, follow), view.position):
+            if position[0] - last_saved >= checkpoint_rounds:
+                save_checkpoint(view, checkpoint_path)
+                last_saved = position[0]
+            view.apply(position, event)
+            yield position, event, view
+    finally:
+        save_checkpoint(view, checkpoint_path)
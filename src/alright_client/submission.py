@@ -0,0 +1,264 @@
+"""Retry-safe submission of deal groups with transaction leases.
+
+While a transaction with a given (sender, lease) is valid, up to its last
+valid round, the ledger refuses any other transaction from that sender with
+the same lease. deal_lease derives the lease from the method, deal key and
+caller. A rebuilt retry of a create_deal or match_deal group therefore cannot
+land twice. Either it is the same signed group, which algod deduplicates by
+txid, or it fails with an overlapping lease while the first attempt is live.
+
+Relayer.build puts the lease on its fee payment. A group the user sends
+themselves gets it from with_lease before it is signed.
+
+Submitter records the txid and last valid round of every leased group it
+sends, optionally in a JSON-lines journal that survives restarts. A retry
+first settles what became of the last attempt and only sends again once that
+attempt has expired unconfirmed. When algod no longer knows the txid, an
+indexer, if given, looks it up. Without one, landed() reads the deal box, which
+can only confirm: a missing box may also be a deal that was since recalled,
+rejected or closed. Calls for one lease queue behind each other instead of
+racing, and transient send errors back off with jitter.
+"""
+
+import copy
+import hashlib
+import json
+import random
+import threading
+import time
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from algosdk import transaction
+from algosdk.error import AlgodHTTPError
+
+from alright_client.layout import Deal, decode_deal
+from alright_client.shards import read_box
+
+LeaseDomain = b"alright-lease"
+# Substrings of algod's errors for a group that was already sent
+DuplicateErrors = ("already in ledger", "already in pool")
+OverlappingLeaseError = "overlapping lease"
+
+Confirmed, Pending, Expired, Unknown = "confirmed", "pending", "expired", "unknown"
+
+
+def deal_lease(method: str, deal_key: bytes, sender: bytes, nonce: int = 0) -> bytes:
+    # Bump the nonce for a method a deal can take more than once, e.g. adjusting
+    return hashlib.sha256(
+        b"".join(
+            (LeaseDomain, method.encode(), deal_key, sender, nonce.to_bytes(8, "big"))
+        )
+    ).digest()
+
+
+def with_lease(
+    txns: Sequence[transaction.Transaction], lease: bytes
+) -> list[transaction.Transaction]:
+    # A user-built group with the lease on its first transaction, grouped anew
+    txns = [copy.copy(txn) for txn in txns]
+    txns[0].lease = lease
+    for txn in txns:
+        txn.group = None
+    return transaction.assign_group_id(txns)
+
+
+def landed(method: str, deal: Deal | None) -> bool | None:
+    """Whether the deal box shows the method's effect, None if it cannot tell.
+
+    A missing deal box says nothing: the deal may have been created or matched
+    and then recalled, rejected or closed.
+    """
+    if method in ("create_deal", "create_hashed_deal"):
+        return True if deal is not None else None
+    if method == "match_deal":
+        if deal is None:
+            return None
+        return min(deal.first_acc_status, deal.second_acc_status) >= 2
+    return None
+
+
+class LeaseInUseError(Exception):
+    # Another group holding the lease is still live, e.g. sent by another process
+    def __init__(self, lease: bytes) -> None:
+        super().__init__(f"Lease {lease.hex()} is held by a live transaction")
+        self.lease = lease
+
+
+class Attempt(NamedTuple):
+    txid: str  # Of the first transaction, as send_transactions returns it
+    last_valid: int
+    method: str | None = None
+    deal_key: bytes | None = None
+
+
+class Submitter:
+    def __init__(
+        self,
+        algod_client,
+        app_id: int,
+        journal: str | None = None,
+        retries: int = 5,
+        backoff: float = 0.5,
+        indexer_client=None,
+    ) -> None:
+        self.algod_client = algod_client
+        self.app_id = app_id
+        self.indexer_client = indexer_client
+        self.retries = retries
+        self.backoff = backoff
+        self.attempts: dict[bytes, Attempt] = {}
+        self._journal = journal
+        self._lock = threading.Lock()
+        self._lease_locks: dict[bytes, threading.Lock] = {}
+        if journal is not None:
+            try:
+                with open(journal) as lines:
+                    for line in lines:
+                        record = json.loads(line)
+                        self.attempts[bytes.fromhex(record["lease"])] = Attempt(
+                            record["txid"],
+                            record["last_valid"],
+                            record.get("method"),
+                            (
+                                bytes.fromhex(record["deal_key"])
+                                if record.get("deal_key")
+                                else None
+                            ),
+                        )
+            except FileNotFoundError:
+                pass
+
+    def _lease_lock(self, lease: bytes) -> threading.Lock:
+        with self._lock:
+            return self._lease_locks.setdefault(lease, threading.Lock())
+
+    def _record(self, lease: bytes, attempt: Attempt) -> None:
+        with self._lock:
+            self.attempts[lease] = attempt
+            if self._journal is not None:
+                with open(self._journal, "a") as journal:
+                    journal.write(
+                        json.dumps(
+                            {
+                                "lease": lease.hex(),
+                                "txid": attempt.txid,
+                                "last_valid": attempt.last_valid,
+                                "method": attempt.method,
+                                "deal_key": (
+                                    attempt.deal_key.hex() if attempt.deal_key else None
+                                ),
+                            }
+                        )
+                        + "\n"
+                    )
+
+    def status(self, attempt: Attempt) -> str:
+        """Confirmed, Pending, Expired or Unknown, from algod, the indexer or
+        the deal box.
+
+        Unknown is an attempt past its last valid round that algod has
+        forgotten, with no indexer, and whose deal box does not show it.
+        """
+        try:
+            info = self.algod_client.pending_transaction_info(attempt.txid)
+        except AlgodHTTPError as error:
+            if error.code != 404:
+                raise
+            info = None
+        if info is not None:
+            if info.get("confirmed-round", 0) > 0:
+                return Confirmed
+            # The pool rejected it, e.g. on a failed assert
+            return Expired if info.get("pool-error") else Pending
+        if self.algod_client.status()["last-round"] <= attempt.last_valid:
+            return Pending
+        if self.indexer_client is not None:
+            found = self.indexer_client.search_transactions(txid=attempt.txid)
+            if found["transactions"]:
+                return Confirmed
+            # Pending until the indexer has caught up past the last valid round
+            return Expired if found["current-round"] > attempt.last_valid else Pending
+        if attempt.method is None or attempt.deal_key is None:
+            return Unknown
+        value = read_box(self.algod_client, self.app_id, attempt.deal_key)
+        result = landed(attempt.method, None if value is None else decode_deal(value))
+        return {True: Confirmed, False: Expired, None: Unknown}[result]
+
+    def wait(self, attempt: Attempt) -> str:
+        # Anything but Pending: a leased group is settled by its last valid round
+        while (status := self.status(attempt)) == Pending:
+            current = self.algod_client.status()["last-round"]
+            self.algod_client.status_after_block(current)
+        return status
+
+    def _send(
+        self, group: Sequence[transaction.SignedTransaction], lease: bytes
+    ) -> None:
+        for attempt in range(self.retries):
+            try:
+                self.algod_client.send_transactions(list(group))
+                return
+            except AlgodHTTPError as error:
+                message = str(error)
+                if any(duplicate in message for duplicate in DuplicateErrors):
+                    return
+                if OverlappingLeaseError in message:
+                    raise LeaseInUseError(lease) from error
+                if error.code is not None and error.code < 500:
+                    raise
+                if attempt == self.retries - 1:
+                    raise
+            time.sleep(self.backoff * 2**attempt * random.uniform(0.5, 1.5))
+
+    def submit(
+        self,
+        lease: bytes,
+        group: Sequence[transaction.SignedTransaction],
+        method: str | None = None,
+        deal_key: bytes | None = None,
+    ) -> str:
+        """Txid of the confirmed attempt for `lease`, sending `group` if needed.
+
+        `group` must carry `lease` on a transaction, e.g. through
+        Relayer.build(lease=...) or with_lease. An attempt algod has forgotten
+        is looked up in the indexer, or else, with method and deal_key,
+        reconciled against the deal box. Raises RuntimeError
+        if the group expires without confirming, or if an earlier attempt's
+        fate is Unknown, rather than risk sending it twice.
+        """
+        with self._lease_lock(lease):
+            previous = self.attempts.get(lease)
+            if previous is not None:
+                status = self.wait(previous)
+                if status == Confirmed:
+                    return previous.txid
+                if status == Unknown:
+                    raise RuntimeError(f"Cannot tell whether {previous.txid} landed")
+            attempt = Attempt(
+                group[0].get_txid(),
+                max(stxn.transaction.last_valid_round for stxn in group),
+                method,
+                deal_key,
+            )
+            self._record(lease, attempt)
+            self._send(group, lease)
+            if self.wait(attempt) != Confirmed:
+                raise RuntimeError(f"Group {attempt.txid} expired unconfirmed")
+            return attempt.txid
+
+    def submit_all(
+        self,
+        submissions: Iterable[tuple],
+        max_workers: int = 16,
+    ) -> list[str | Exception]:
+        # (lease, group, method, deal_key) tuples, sent and awaited concurrently
+        def submit(submission: tuple) -> str | Exception:
+            try:
+                return self.submit(*submission)
+            except Exception as error:
+                return error
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(submit, submissions))
@@ -0,0 +1,86 @@
+"""Deal status transition table shared with the contract.
+
+Each account's status byte in a deal box is 0 (not deposited), 1 (deposited,
+waiting for the counterparty), 2 (locked) or 3 (agreed). check_transition in
+alright.py accepts a call only if the (first, second) status pair is allowed
+for the method's rule and the sender's role, by one bit lookup in StatusTable.
+TRANSITIONS adds the pair each call leaves behind, so clients can pre-validate
+a call and predict the deal's next state without touching the network.
+"""
+
+# Mirrors StatusRules in alright.py
+StatusRules = (
+    ({(1, 0)}, {(0, 1)}),  # CreatorRule
+    ({(0, 1)}, {(1, 0)}),  # CounterpartyRule
+    ({(f, s) for f in (2, 3) for s in (2, 3)},) * 2,  # AdjustRule
+    ({(2, 2), (2, 3)}, {(2, 2), (3, 2)}),  # AgreeRule
+    (
+        {(f, s) for f in (1, 2, 3) for s in range(4)},
+        {(f, s) for f in range(4) for s in (1, 2, 3)},
+    ),  # AttachRule
+    ({(2, 3)}, {(3, 2)}),  # PairRule
+)
+CreatorRule, CounterpartyRule, AdjustRule, AgreeRule, AttachRule, PairRule = range(6)
+StatusTable = b"".join(
+    sum(1 << (15 - f * 4 - s) for f, s in pairs).to_bytes(2, "big")
+    for rule in StatusRules
+    for pairs in rule
+)
+
+MethodRules = {
+    "add_deal_legs": CreatorRule,
+    "recall_deal": CreatorRule,
+    "match_deal": CounterpartyRule,
+    "reject_deal": CounterpartyRule,
+    "adjust_disbursement": AdjustRule,
+    "adjust_leg_disbursement": AdjustRule,
+    "settle_deal": AdjustRule,  # Checked on the first account's call only
+    "agree_disbursement": AgreeRule,
+    "attach_data": AttachRule,
+    "settle_pair": PairRule,  # For every deal it settles
+}
+
+Closed = None  # The call disburses or refunds the deal and deletes its box
+
+
+def allowed(method: str, sender_is_first: bool, first: int, second: int) -> bool:
+    # Same bit as check_transition reads
+    bit = MethodRules[method] * 32 + (not sender_is_first) * 16 + first * 4 + second
+    return bool(StatusTable[bit // 8] >> (7 - bit % 8) & 1)
+
+
+def next_statuses(
+    method: str, sender_is_first: bool, first: int, second: int
+) -> tuple[int, int] | None:
+    """Status pair a legal call leaves behind, or Closed.
+
+    Raises ValueError for a call the contract would reject.
+    """
+    if not allowed(method, sender_is_first, first, second):
+        raise ValueError(
+            f"{method} not allowed from ({first}, {second}) for the "
+            f"{'first' if sender_is_first else 'second'} account"
+        )
+    if method in ("recall_deal", "reject_deal", "settle_deal", "settle_pair"):
+        return Closed
+    if method == "match_deal":
+        return (2, 2)
+    if method in ("adjust_disbursement", "adjust_leg_disbursement"):
+        return (3, 2) if sender_is_first else (2, 3)
+    if method == "agree_disbursement":
+        if (first, second) == (2, 2):
+            return (3, 2) if sender_is_first else (2, 3)
+        return Closed
+    return (first, second)
+
+
+# (method, sender_is_first, (first, second)) -> next pair or Closed, for every
+# legal call
+TRANSITIONS = {
+    (method, role, (first, second)): next_statuses(method, role, first, second)
+    for method in MethodRules
+    for role in (True, False)
+    for first in range(4)
+    for second in range(4)
+    if allowed(method, role, first, second)
+}
@@ -0,0 +1,336 @@
+"""Client-side pre-flight checks mirroring the asserts in alright.py.
+
+Each check walks the same conditions, in the same order, as the contract method
+it mirrors and returns the comment of the first assert that would fail, or None
+if the group would pass. State comes from a local cache of boxes and globals, so
+nothing here touches the network.
+"""
+
+from collections.abc import Mapping
+from typing import NamedTuple
+
+from alright_client.layout import (
+    Deal,
+    DealDetailsKeyLength,
+    DealLeg,
+    DealListCost,
+    DealListSlots,
+    DealNoteMaxLength,
+    DealNoteOffset,
+    HashedDealBoxLength,
+    HashedDealKeyPrefix,
+    LegSecondAccount,
+    ZeroAddress,
+    ZeroDealKey,
+    create_deal_key,
+    deal_box_cost,
+    deal_has_legs,
+    decode_deal,
+    decode_legs,
+    legs_box_key,
+    twin_deal_key,
+)
+from alright_client.transitions import allowed
+
+PaymentType = 1
+AssetTransferType = 4
+
+
+class Txn(NamedTuple):
+    # Unset fields read as zero values, as they do in the AVM
+    type_enum: int
+    sender: bytes
+    receiver: bytes = ZeroAddress
+    amount: int = 0
+    asset_receiver: bytes = ZeroAddress
+    asset_amount: int = 0
+    xfer_asset: int = 0
+
+
+class AppState(NamedTuple):
+    app_address: bytes
+    status: bytes
+    # Box name -> box contents for deal-list, deal and legs boxes
+    boxes: Mapping[bytes, bytes]
+
+
+class CreateDeal(NamedTuple):
+    sender: bytes
+    deposit_payment: Txn
+    collateral_payment: Txn
+    key_index: int
+    your_dep_amount: int
+    your_dep_asset: int
+    your_col_amount: int
+    your_col_asset: int
+    their_address: bytes
+    their_key_index: int
+    their_dep_amount: int
+    their_dep_asset: int
+    their_col_amount: int
+    their_col_asset: int
+    deal_note: bytes
+    registration_payment: Txn
+
+
+class MatchDeal(NamedTuple):
+    sender: bytes
+    deposit_payment: Txn
+    collateral_payment: Txn
+    deal_key: bytes
+    key_index: int
+    their_address: bytes
+    their_key_index: int
+    # Every txn after the call, which pay the sender's legs if the deal has any
+    leg_payments: tuple[Txn, ...] = ()
+
+
+def _payment_matches(txn: Txn, app_address: bytes, amount: int, asset: int) -> bool:
+    # Either an Algo payment for asset 0 or an asset transfer of that asset
+    return (txn.receiver == app_address and txn.amount == amount and asset == 0) or (
+        txn.type_enum == AssetTransferType
+        and txn.asset_receiver == app_address
+        and txn.asset_amount == amount
+        and txn.xfer_asset == asset
+    )
+
+
+def _slot(deal_list: bytes, key_index: int) -> bytes | None:
+    # The contract panics on an out-of-range extract, which has no comment
+    if not 0 <= key_index < DealListSlots:
+        return None
+    start = key_index * DealDetailsKeyLength
+    return deal_list[start : start + DealDetailsKeyLength]
+
+
+def check_create_deal(
+    state: AppState, call: CreateDeal, hashed: bool = False
+) -> str | None:
+    # hashed=True checks create_hashed_deal, which differs only in the box stored
+    app_address = state.app_address
+    boxes = state.boxes
+    deposit = call.deposit_payment
+    collateral = call.collateral_payment
+
+    if state.status != b"active":
+        return "App is active"
+    if call.sender == call.their_address:
+        return "Addresses not equal"
+    if deposit.sender != call.sender:
+        return "Deposit sender is caller"
+    if not _payment_matches(
+        deposit, app_address, call.your_dep_amount, call.your_dep_asset
+    ):
+        return "Deposit payment matches args"
+    if collateral.sender != call.sender:
+        return "Collateral sender is caller"
+    # The contract does not check the collateral type_enum on the asset branch
+    if not (
+        (
+            collateral.receiver == app_address
+            and collateral.amount == call.your_col_amount
+            and call.your_col_asset == 0
+        )
+        or (
+            collateral.asset_receiver == app_address
+            and collateral.asset_amount == call.your_col_amount
+            and collateral.xfer_asset == call.your_col_asset
+        )
+    ):
+        return "Collateral payment matches args"
+    if len(call.deal_note) > DealNoteMaxLength:
+        return "deal_note string length<=872"
+    if len(call.their_address) != 32:
+        return "their_address length=32"
+    if hashed:
+        deal_key = create_deal_key(
+            call.sender, call.their_address, call.deal_note, HashedDealKeyPrefix
+        )
+        box_cost = deal_box_cost(HashedDealBoxLength)
+    else:
+        deal_key = create_deal_key(call.sender, call.their_address, call.deal_note)
+        box_cost = deal_box_cost(DealNoteOffset + len(call.deal_note))
+    if deal_key in boxes:
+        return "Deal does not already exist"
+    if twin_deal_key(deal_key) in boxes:
+        return "No deal of the other kind exists"
+    registration_cost = 0
+    for address, key_index in (
+        (call.sender, call.key_index),
+        (call.their_address, call.their_key_index),
+    ):
+        deal_list = boxes.get(address)
+        if deal_list is None:
+            registration_cost += DealListCost
+            continue
+        slot = _slot(deal_list, key_index)
+        if slot is None:
+            return "key_index out of range"
+        if slot != ZeroDealKey:
+            return "deal_key[index] is zero bytes"
+
+    algos_deposited = 0
+    if deposit.type_enum == PaymentType:
+        algos_deposited = deposit.amount
+    if collateral.type_enum == PaymentType:
+        algos_deposited += collateral.amount
+
+    if registration_cost > 0:
+        if call.registration_payment.receiver != app_address:
+            return "Registration payment receiver is app address"
+        if call.registration_payment.amount != registration_cost:
+            return "Registrations cost = Algos paid"
+    if box_cost > algos_deposited:
+        return "Created boxes cost < Algos deposited"
+    return None
+
+
+def _check_deal_keys(
+    state: AppState,
+    sender: bytes,
+    deal_key: bytes,
+    key_index: int,
+    their_address: bytes,
+    their_key_index: int,
+) -> str | None:
+    if state.status != b"active":
+        return "App is active"
+    if sender == their_address:
+        return "Addresses not equal"
+    if len(deal_key) != DealDetailsKeyLength:
+        return "deal_key len=33"
+    for address, index, comment in (
+        (sender, key_index, "Deal key in sender list"),
+        (their_address, their_key_index, "Deal key in their list"),
+    ):
+        deal_list = state.boxes.get(address)
+        if deal_list is None or _slot(deal_list, index) != deal_key:
+            return comment
+    return None
+
+
+def _check_match_payment(
+    txn: Txn, app_address: bytes, amount: int, asset: int, label: str
+) -> str | None:
+    if asset == 0:
+        if txn.receiver != app_address:
+            return f"{label} receiver is app address"
+        if txn.amount != amount:
+            return f"{label} amount matches deal"
+        return None
+    if txn.type_enum != AssetTransferType:
+        return f"{label} is asset transfer"
+    if txn.asset_receiver != app_address:
+        return f"{label} receiver is app address"
+    if txn.asset_amount != amount:
+        return f"{label} amount matches deal"
+    if txn.xfer_asset != asset:
+        return f"{label} asset matches deal"
+    return None
+
+
+def check_match_deal(state: AppState, call: MatchDeal) -> str | None:
+    if call.deposit_payment.sender != call.sender:
+        return "Deposit sender is caller"
+    if call.collateral_payment.sender != call.sender:
+        return "Collateral sender is caller"
+    failed = _check_deal_keys(
+        state,
+        call.sender,
+        call.deal_key,
+        call.key_index,
+        call.their_address,
+        call.their_key_index,
+    )
+    if failed:
+        return failed
+    value = state.boxes.get(call.deal_key)
+    if value is None:
+        return "deal_value has value"
+
+    deal = decode_deal(value)
+    sender_is_first = call.sender > call.their_address
+    if not allowed(
+        "match_deal", sender_is_first, deal.first_acc_status, deal.second_acc_status
+    ):
+        return "Status transition allowed"
+    if sender_is_first:
+        dep_amount, dep_asset, col_amount, col_asset = deal[3:7]
+    else:
+        dep_amount, dep_asset, col_amount, col_asset = deal[8:12]
+    failed = _check_match_payment(
+        call.deposit_payment, state.app_address, dep_amount, dep_asset, "Deposit"
+    ) or _check_match_payment(
+        call.collateral_payment,
+        state.app_address,
+        col_amount,
+        col_asset,
+        "Collateral",
+    )
+    if failed or not deal_has_legs(deal):
+        return failed
+    side = 0 if sender_is_first else LegSecondAccount
+    legs = decode_legs(state.boxes.get(legs_box_key(call.deal_key), b""))
+    sender_legs = [leg for leg in legs if leg.flags & LegSecondAccount == side]
+    # Too few txns panics reading past the group, which has no comment
+    if len(call.leg_payments) < len(sender_legs):
+        return "Leg payment matches deal"
+    for leg, payment in zip(sender_legs, call.leg_payments):
+        if payment.sender != call.sender or not (
+            (
+                leg.asset == 0
+                and payment.type_enum == PaymentType
+                and payment.receiver == state.app_address
+                and payment.amount == leg.amount
+            )
+            or (
+                leg.asset != 0
+                and payment.type_enum == AssetTransferType
+                and payment.asset_receiver == state.app_address
+                and payment.asset_amount == leg.amount
+                and payment.xfer_asset == leg.asset
+            )
+        ):
+            return "Leg payment matches deal"
+    if sender_legs and len(call.leg_payments) > len(sender_legs):
+        return "Leg payments end the group"
+    return None
+
+
+def _awaited_assets(deal: Deal, legs: list[DealLeg]) -> set[int]:
+    # Assets an unmatched deal still expects from the account at status 0
+    if deal.first_acc_status == 0:
+        side, terms = 0, (deal.first_acc_dep_asset, deal.first_acc_col_asset)
+    else:
+        side, terms = LegSecondAccount, (
+            deal.second_acc_dep_asset,
+            deal.second_acc_col_asset,
+        )
+    return {
+        *terms,
+        *(leg.asset for leg in legs if leg.flags & LegSecondAccount == side),
+    }
+
+
+def check_close_out_asas(state: AppState, assets: list[int]) -> str | None:
+    """Pre-flight for close_out_asas, plus the rule the contract cannot check.
+
+    Closing out an asset that an unmatched deal awaits from its counterparty
+    would block that match, so any such deal fails the check here. The app's
+    asset holdings are not in AppState, so the zero balance check is left out.
+    """
+    if not assets:
+        return "At least one asset"
+    for name, value in state.boxes.items():
+        if len(name) != DealDetailsKeyLength or name[:1] not in (
+            b"D",
+            HashedDealKeyPrefix,
+        ):
+            continue
+        deal = decode_deal(value)
+        if min(deal.first_acc_status, deal.second_acc_status) != 0:
+            continue
+        legs = decode_legs(state.boxes.get(legs_box_key(name), b""))
+        if _awaited_assets(deal, legs) & set(assets):
+            return "Asset awaited by an unmatched deal"
+    return None
@@ -0,0 +1,333 @@
+import base64
+import sys
+from pathlib import Path
+
+import pytest
+
+# The contract and the client package live in src, which is not installed
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+Artifacts = Path(__file__).resolve().parent.parent / "artifacts"
+# algokit localnet, which the contract-level tests deploy a fresh app to
+LocalnetServer = "http://localhost:4001"
+LocalnetToken = "a" * 64
+
+
+@pytest.fixture(scope="session")
+def algod():
+    algokit_utils = pytest.importorskip("algokit_utils")
+    client = algokit_utils.get_algod_client(
+        algokit_utils.AlgoClientConfig(LocalnetServer, LocalnetToken)
+    )
+    try:
+        client.status()
+    except Exception:
+        pytest.skip(f"No localnet at {LocalnetServer}")
+    return client
+
+
+@pytest.fixture
+def alright(algod):
+    return Localnet(algod)
+
+
+class Localnet:
+    """A fresh, active AlrightApp on localnet and the calls the tests make on it.
+
+    Deals are Algo only. Every app call references all boxes of its deal, so it
+    never fails for a missing reference before the assert a test is after.
+    """
+
+    def __init__(self, algod) -> None:
+        import algokit_utils
+
+        self.algod = algod
+        self.owner = algokit_utils.get_localnet_default_account(algod)
+        self.client = algokit_utils.ApplicationClient(
+            algod,
+            Artifacts / "application.json",
+            signer=self.owner,
+            template_values={"UPDATABLE": 1, "DELETABLE": 1},
+        )
+        self.client.create()
+        self.app_id = self.client.app_id
+        self.app_address = self.client.app_address
+        self.fund(self.app_address, 1_000_000)
+        self.client.call("change_status", new_status="active")
+
+    def fund(self, address: str, amount: int) -> None:
+        import algokit_utils
+
+        algokit_utils.ensure_funded(
+            self.algod,
+            algokit_utils.EnsureBalanceParameters(
+                account_to_fund=address, min_spending_balance_micro_algos=amount
+            ),
+        )
+
+    def account(self, amount: int = 10_000_000):
+        from algokit_utils import Account
+        from algosdk import account
+
+        new_account = Account(private_key=account.generate_account()[0])
+        self.fund(new_account.address, amount)
+        return new_account
+
+    def sp(self, fee: int = 0):
+        # fee counts min fees
+        sp = self.algod.suggested_params()
+        sp.flat_fee = True
+        sp.fee = fee * sp.min_fee
+        return sp
+
+    def pay(self, sender, amount: int, fee: int = 1, receiver: str | None = None):
+        # To the app unless `receiver` is given
+        from algosdk.atomic_transaction_composer import TransactionWithSigner
+        from algosdk.transaction import PaymentTxn
+
+        return TransactionWithSigner(
+            PaymentTxn(
+                sender.address, self.sp(fee), receiver or self.app_address, amount
+            ),
+            sender.signer,
+        )
+
+    def app_call(self, sender, call, boxes=(), fee: int = 1):
+        # An app call's fee is 1 + the inner txns it sends
+        from algosdk.atomic_transaction_composer import TransactionWithSigner
+        from algosdk.transaction import ApplicationNoOpTxn
+
+        return TransactionWithSigner(
+            ApplicationNoOpTxn(
+                sender.address,
+                self.sp(fee),
+                self.app_id,
+                app_args=call.app_args,
+                accounts=call.accounts,
+                foreign_assets=call.assets,
+                foreign_apps=call.apps,
+                boxes=[(0, box) for box in boxes],
+            ),
+            sender.signer,
+        )
+
+    def send(self, *txns) -> list[dict]:
+        """Send `txns` as one group and return each one's confirmed info.
+
+        A rejected app call raises algokit_utils.LogicError, see rejected.
+        """
+        from algosdk.atomic_transaction_composer import AtomicTransactionComposer
+
+        atc = AtomicTransactionComposer()
+        for txn in txns:
+            atc.add_transaction(txn)
+        response = self.client.execute_atc(atc)
+        return [self.algod.pending_transaction_info(txid) for txid in response.tx_ids]
+
+    def rejected(self, *txns) -> str:
+        # Comment of the assert that rejects the group, e.g. "Deal key"
+        from algokit_utils import LogicError
+
+        with pytest.raises(LogicError) as error:
+            self.send(*txns)
+        return error.value.lines[error.value.line_no].partition("//")[2].strip()
+
+    def box(self, name: bytes) -> bytes | None:
+        from alright_client.shards import read_box
+
+        return read_box(self.algod, self.app_id, name)
+
+    def key_index(self, account, deal_key: bytes) -> int:
+        from alright_client.layout import address_bytes, deal_list_keys
+
+        return deal_list_keys(self.box(address_bytes(account.address))).index(deal_key)
+
+    def deal_boxes(self, sender, partner, deal_key: bytes) -> list[bytes]:
+        from alright_client.attachments import data_box_key
+        from alright_client.layout import address_bytes, legs_box_key
+
+        sender_key = address_bytes(sender.address)
+        partner_key = address_bytes(partner.address)
+        return [
+            sender_key,
+            partner_key,
+            deal_key,
+            legs_box_key(deal_key),
+            data_box_key(sender_key, deal_key),
+            data_box_key(partner_key, deal_key),
+        ]
+
+    def create_deal(
+        self,
+        creator,
+        partner,
+        deal_note: bytes = b"Alright",
+        dep_amount: int = 100_000,
+        col_amount: int = 50_000,
+        their_dep_amount: int = 200_000,
+        their_col_amount: int = 0,
+    ) -> bytes:
+        from alright_client import runtime
+        from alright_client.layout import (
+            DealListCost,
+            address_bytes,
+            create_deal_key,
+            free_key_index,
+            twin_deal_key,
+        )
+
+        creator_key = address_bytes(creator.address)
+        partner_key = address_bytes(partner.address)
+        deal_key = create_deal_key(creator_key, partner_key, deal_note)
+        creator_list, partner_list = self.box(creator_key), self.box(partner_key)
+        registration = DealListCost * [creator_list, partner_list].count(None)
+        self.send(
+            self.pay(creator, dep_amount),
+            self.pay(creator, col_amount),
+            self.pay(creator, registration),
+            self.app_call(
+                creator,
+                runtime.create_deal(
+                    free_key_index(creator_list),
+                    dep_amount,
+                    0,
+                    col_amount,
+                    0,
+                    partner.address,
+                    free_key_index(partner_list),
+                    their_dep_amount,
+                    0,
+                    their_col_amount,
+                    0,
+                    deal_note,
+                ),
+                [creator_key, partner_key, deal_key, twin_deal_key(deal_key)],
+            ),
+        )
+        return deal_key
+
+    def add_deal_legs(
+        self, creator, partner, deal_key: bytes, legs, leg_amounts=()
+    ) -> list[dict]:
+        # leg_amounts are the Algo legs the creator pays, in leg order
+        from alright_client import runtime
+        from alright_client.layout import legs_cost
+
+        return self.send(
+            self.pay(creator, legs_cost(legs)),
+            self.app_call(
+                creator,
+                runtime.add_deal_legs(
+                    deal_key,
+                    self.key_index(creator, deal_key),
+                    partner.address,
+                    self.key_index(partner, deal_key),
+                    legs,
+                ),
+                self.deal_boxes(creator, partner, deal_key),
+            ),
+            *(self.pay(creator, amount) for amount in leg_amounts),
+        )
+
+    def match_deal(self, partner, creator, deal_key: bytes, leg_amounts=()) -> None:
+        # leg_amounts are the Algo legs the partner pays, in leg order
+        from alright_client import runtime
+        from alright_client.layout import address_bytes, decode_deal
+
+        deal = decode_deal(self.box(deal_key))
+        if address_bytes(partner.address) > address_bytes(creator.address):
+            dep_amount, col_amount = (
+                deal.first_acc_dep_amount,
+                deal.first_acc_col_amount,
+            )
+        else:
+            dep_amount, col_amount = (
+                deal.second_acc_dep_amount,
+                deal.second_acc_col_amount,
+            )
+        self.send(
+            self.pay(partner, dep_amount),
+            self.pay(partner, col_amount),
+            self.app_call(
+                partner,
+                runtime.match_deal(
+                    deal_key,
+                    self.key_index(partner, deal_key),
+                    creator.address,
+                    self.key_index(creator, deal_key),
+                ),
+                self.deal_boxes(partner, creator, deal_key),
+            ),
+            *(self.pay(partner, amount) for amount in leg_amounts),
+        )
+
+    def agree_disbursement(self, sender, partner, deal_key: bytes) -> list[dict]:
+        # Only the call that agrees second disburses, so pay for its inner txns
+        from alright_client import runtime
+
+        return self.send(
+            self.app_call(
+                sender,
+                runtime.agree_disbursement(
+                    deal_key,
+                    self.key_index(sender, deal_key),
+                    partner.address,
+                    self.key_index(partner, deal_key),
+                ),
+                self.deal_boxes(sender, partner, deal_key),
+                fee=7,
+            )
+        )
+
+    def settle_deal(
+        self,
+        first,
+        second,
+        deal_key: bytes,
+        first_acc_forward_amount: int,
+        second_acc_forward_amount: int,
+        inner_txns: int = 6,
+    ) -> list[dict]:
+        """Both settle_deal calls, first account first, and their confirmed info.
+
+        The first call pays the fees of the group and its inner txns.
+        """
+        from alright_client import runtime
+
+        def call(sender, partner):
+            return runtime.settle_deal(
+                deal_key,
+                self.key_index(sender, deal_key),
+                partner.address,
+                self.key_index(partner, deal_key),
+                first_acc_forward_amount,
+                second_acc_forward_amount,
+                0,
+            )
+
+        return self.send(
+            self.app_call(
+                first,
+                call(first, second),
+                self.deal_boxes(first, second, deal_key),
+                fee=2 + inner_txns,
+            ),
+            self.app_call(second, call(second, first), fee=0),
+        )
+
+    @staticmethod
+    def transfers(info: dict) -> list[tuple]:
+        # (receiver, asset, amount, note) of each inner payment or asset
+        # transfer in confirmed txn info, comparable with settlement.Transfer
+        from alright_client.layout import address_bytes
+
+        transfers = []
+        for inner in info.get("inner-txns", []):
+            txn = inner["txn"]["txn"]
+            if txn["type"] == "pay":
+                receiver, asset, amount = txn["rcv"], 0, txn.get("amt", 0)
+            else:
+                receiver, asset, amount = txn["arcv"], txn["xaid"], txn.get("aamt", 0)
+            note = base64.b64decode(txn.get("note", ""))
+            transfers.append((address_bytes(receiver), asset, amount, note))
+        return transfers
@@ -0,0 +1,193 @@
+"""Attachment framing, sealing and reading from an in-memory data box."""
+
+import hashlib
+import io
+import random
+
+import pytest
+
+from alright_client import attachments, runtime
+from alright_client.attachments import (
+    AttachChunkSize,
+    CompressedReader,
+    DataBoxReader,
+    DigestLength,
+    IntegrityError,
+    SimulateFetcher,
+    compress_frames,
+    data_box_key,
+    open_attachments,
+    prepare_attachment,
+)
+from alright_client.layout import (
+    CompressedWriteFlag,
+    DataAttachedFlag,
+    DataCompressedFlag,
+    Deal,
+    address_bytes,
+    decode_deal,
+)
+
+Text = b"".join(b"line %d of the attachment\n" % i for i in range(5000))
+First = b"\x02" * 32
+Second = b"\x01" * 32
+
+
+def box_fetch(box: bytes):
+    return lambda offset, length: (len(box), box[offset : offset + length])
+
+
+def box_of(data_length: int, writes: list[tuple[int, bytes]], digest: bytes | None):
+    box = bytearray(data_length)
+    for index, data in writes:
+        box[index : index + len(data)] = data
+    if digest is not None:
+        box[-DigestLength:] = digest
+    return bytes(box)
+
+
+def test_reader_reads_ranges():
+    with DataBoxReader(box_fetch(Text), chunk_size=500) as raw:
+        assert raw.length == len(Text)
+        # Raw reads stop at chunk ends, so read ranges through a buffer
+        reader = io.BufferedReader(raw)
+        rng = random.Random(0)
+        for _ in range(50):
+            start = rng.randrange(len(Text))
+            size = rng.randrange(1, 3000)
+            reader.seek(start)
+            assert reader.read(size) == Text[start : start + size]
+        reader.seek(len(Text))
+        assert reader.read(10) == b""
+
+
+def test_sealed_box_is_verified():
+    plain = Text[:20000]
+    data_length, writes, digest = prepare_attachment(plain, compress=False, seal=True)
+    assert data_length == len(plain) + DigestLength
+    assert digest == hashlib.sha256(plain).digest()
+    box = box_of(data_length, writes, digest)
+    with DataBoxReader(box_fetch(box), sealed=True, chunk_size=512) as reader:
+        assert reader.length == len(plain)
+        assert reader.readall() == plain
+        assert reader.verify()
+    tampered = box[:-1] + bytes([box[-1] ^ 1])
+    with DataBoxReader(box_fetch(tampered), sealed=True, chunk_size=512) as reader:
+        with pytest.raises(IntegrityError):
+            reader.readall()
+
+
+def test_open_attachments_closes_readers_on_failure(monkeypatch):
+    deal = Deal(
+        2, 2, First, 0, 0, 0, 0, Second, 0, 0, 0, 0, 0, 0,
+        DataAttachedFlag, DataAttachedFlag, b"",
+    )  # fmt: skip
+    opened = []
+
+    class Reader(DataBoxReader):
+        def __init__(self, *args, **kwargs) -> None:
+            super().__init__(*args, **kwargs)
+            opened.append(self)
+
+    def fetcher(data_key: bytes):
+        if data_key.startswith(Second):
+            return lambda offset, length: 1 / 0
+        return box_fetch(Text)
+
+    monkeypatch.setattr(attachments, "DataBoxReader", Reader)
+    readers = open_attachments(
+        lambda key: box_fetch(Text), b"D" + bytes(32), deal._replace(first_acc_data=0)
+    )
+    assert readers[First] is None
+    with readers[Second] as reader:
+        assert reader.read(4) == Text[:4]
+
+    opened.clear()
+    with pytest.raises(ZeroDivisionError):
+        open_attachments(fetcher, b"D" + bytes(32), deal)
+    assert len(opened) == 1 and opened[0].closed
+
+
+def test_compressed_frames_read_back():
+    framed = compress_frames(Text, frame_size=1000)
+    raw = CompressedReader(io.BytesIO(framed))
+    assert raw.length == len(Text)
+    assert raw.read() == Text
+    # Raw reads stop at frame ends, so read ranges through a buffer
+    reader = io.BufferedReader(raw)
+    rng = random.Random(0)
+    for _ in range(50):
+        start = rng.randrange(len(Text))
+        size = rng.randrange(1, 3000)
+        reader.seek(start)
+        assert reader.read(size) == Text[start : start + size]
+
+
+def test_prepare_attachment_compresses_when_smaller():
+    data_length, writes, digest = prepare_attachment(Text)
+    assert digest is None
+    assert writes[0][0] == CompressedWriteFlag
+    assert all(index < CompressedWriteFlag for index, _ in writes[1:])
+    assert all(len(data) <= AttachChunkSize for _, data in writes)
+    box = box_of(data_length, [(0, writes[0][1]), *writes[1:]], digest)
+    assert CompressedReader(DataBoxReader(box_fetch(box))).read() == Text
+
+    noise = random.Random(1).randbytes(3000)
+    data_length, writes, _ = prepare_attachment(noise)
+    assert writes[0][0] == 0
+    assert box_of(data_length, writes, None) == noise
+
+
+def test_sealed_compressed_box_is_verified():
+    data_length, writes, digest = prepare_attachment(Text, seal=True)
+    box = box_of(data_length, [(0, writes[0][1]), *writes[1:]], digest)
+    with CompressedReader(DataBoxReader(box_fetch(box), sealed=True)) as reader:
+        assert reader.read() == Text
+
+
+def attach(alright, sender, deal_key, writes, data_length):
+    data_key = data_box_key(address_bytes(sender.address), deal_key)
+    for data_index, data in writes:
+        call = runtime.attach_data(
+            deal_key, alright.key_index(sender, deal_key), data_length, data_index, data
+        )
+        alright.send(
+            alright.app_call(
+                sender, call, [address_bytes(sender.address), deal_key, data_key]
+            )
+        )
+
+
+def sender_data(deal: Deal, address: bytes) -> int:
+    if address == deal.first_acc_address:
+        return deal.first_acc_data
+    return deal.second_acc_data
+
+
+def test_attach_data_flags_compressed_box(alright):
+    creator, partner = alright.account(), alright.account()
+    deal_key = alright.create_deal(creator, partner, dep_amount=1_000_000)
+    creator_key = address_bytes(creator.address)
+    plain = Text[:3000]
+    data_length, writes, _ = prepare_attachment(plain)
+    assert writes[0][0] == CompressedWriteFlag
+    attach(alright, creator, deal_key, writes, data_length)
+
+    deal = decode_deal(alright.box(deal_key))
+    data = sender_data(deal, creator_key)
+    assert data & DataCompressedFlag
+    readers = open_attachments(
+        lambda key: SimulateFetcher(
+            alright.algod, alright.app_id, creator.address, key
+        ),
+        deal_key,
+        deal,
+    )
+    with readers[creator_key] as reader:
+        assert reader.read() == plain
+
+    # A write at index 0 without the flag starts plain data over
+    attach(alright, creator, deal_key, [(0, plain[:data_length])], data_length)
+    deal = decode_deal(alright.box(deal_key))
+    data = sender_data(deal, creator_key)
+    assert data & DataAttachedFlag and not data & DataCompressedFlag
@@ -0,0 +1,97 @@
+"""Both builds of the contract, plain and ALRIGHT_INSTRUMENT=1, fit the AVM."""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# Approval and clear program together, with the 3 extra pages the app deploys with
+MaxProgramLength = 8192
+Src = Path(__file__).resolve().parent.parent / "src"
+# Ops whose immediates are 2-byte branch offsets
+BranchOps = {"b", "bz", "bnz", "callsub"}
+
+
+def varuint_length(value: int) -> int:
+    length = 1
+    while value >= 0x80:
+        value >>= 7
+        length += 1
+    return length
+
+
+def bytes_length(literal: str) -> int:
+    # Of a 0x... or "..." literal as PyTeal emits them
+    if literal.startswith("0x"):
+        return (len(literal) - 2) // 2
+    return len(literal[1:-1].encode().decode("unicode_escape"))
+
+
+def program_length(teal: str) -> int:
+    """Assembled length of PyTeal output, from the op and immediate encodings."""
+    length = 0
+    for line in teal.splitlines():
+        parts = line.split("//")[0].split()
+        if not parts or parts[0].endswith(":"):
+            continue
+        op, args = parts[0], parts[1:]
+        if op == "#pragma":
+            length += varuint_length(int(args[1]))
+        elif op == "intcblock":
+            length += 1 + varuint_length(len(args))
+            length += sum(varuint_length(int(arg)) for arg in args)
+        elif op == "bytecblock":
+            length += 1 + varuint_length(len(args))
+            for arg in args:
+                length += varuint_length(bytes_length(arg)) + bytes_length(arg)
+        elif op == "pushint":
+            # Deploy-time templates such as TMPL_UPDATABLE become 0 or 1
+            length += 1 + (varuint_length(int(args[0])) if args[0].isdigit() else 1)
+        elif op == "pushbytes":
+            length += 1 + varuint_length(bytes_length(args[0])) + bytes_length(args[0])
+        elif op == "method":
+            length += 1 + 1 + 4
+        elif op in BranchOps:
+            length += 3
+        elif op in ("switch", "match"):
+            length += 2 + 2 * len(args)
+        else:
+            # Field names, scratch slots and small indexes are one byte each
+            length += 1 + len(args)
+    return length
+
+
+def build(instrumented: bool) -> dict[str, str]:
+    env = dict(os.environ, ALRIGHT_INSTRUMENT="1" if instrumented else "0")
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import json, alright; spec = alright.app.build(); "
+            "print(json.dumps([spec.approval_program, spec.clear_program]))",
+        ],
+        cwd=Src,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    approval, clear = json.loads(result.stdout.splitlines()[-1])
+    return {"approval": approval, "clear": clear}
+
+
+def test_program_length_counts_immediates():
+    teal = "#pragma version 8\nintcblock 0 1 300\npushbytes 0x0102 // x\nbnz l1\nl1:\n"
+    assert program_length(teal) == 1 + (2 + 1 + 1 + 2) + 4 + 3
+
+
+@pytest.mark.parametrize("instrumented", [False, True], ids=["plain", "instrumented"])
+def test_build_fits(instrumented):
+    pytest.importorskip("beaker")
+    pytest.importorskip("smart_contracts.helpers.deployment_standard")
+    programs = build(instrumented)
+    length = program_length(programs["approval"]) + program_length(programs["clear"])
+    assert length <= MaxProgramLength
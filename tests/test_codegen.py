@@ -0,0 +1,91 @@
+"""runtime.py is current and encodes every method as algosdk.abi does."""
+
+import json
+import random
+from pathlib import Path
+
+import pytest
+from algosdk import abi, account
+
+from alright_client import codegen, runtime
+
+Artifacts = Path(__file__).resolve().parent.parent / "artifacts"
+Contract = json.loads((Artifacts / "contract.json").read_text())
+ReferenceTypes = (
+    abi.ABIReferenceType.ACCOUNT,
+    abi.ABIReferenceType.ASSET,
+    abi.ABIReferenceType.APPLICATION,
+)
+
+
+def sample(abi_type: abi.ABIType, rng: random.Random):
+    # A random value of abi_type, in the form runtime's encoders take
+    if isinstance(abi_type, abi.UintType):
+        return rng.randrange(2**abi_type.bit_size)
+    if isinstance(abi_type, abi.ByteType):
+        return rng.randrange(256)
+    if isinstance(abi_type, abi.AddressType):
+        return rng.randbytes(32)
+    if isinstance(abi_type, abi.StringType):
+        return "".join(rng.choice("alright ") for _ in range(rng.randrange(40)))
+    if isinstance(abi_type, abi.TupleType):
+        return tuple(sample(child, rng) for child in abi_type.child_types)
+    if isinstance(abi_type, abi.ArrayStaticType):
+        if isinstance(abi_type.child_type, abi.ByteType):
+            return rng.randbytes(abi_type.static_length)
+        return [sample(abi_type.child_type, rng) for _ in range(abi_type.static_length)]
+    if isinstance(abi_type, abi.ArrayDynamicType):
+        if isinstance(abi_type.child_type, abi.ByteType):
+            return rng.randbytes(rng.randrange(40))
+        return [sample(abi_type.child_type, rng) for _ in range(rng.randrange(4))]
+    raise TypeError(f"No sample for {abi_type}")
+
+
+def test_runtime_is_generated_from_artifacts(tmp_path):
+    # codegen formats with black when it is installed, as the checked-in file is
+    pytest.importorskip("black")
+    output = tmp_path / "runtime.py"
+    codegen.main([str(Artifacts), str(output)])
+    assert output.read_text() == Path(runtime.__file__).read_text()
+
+
+@pytest.mark.parametrize(
+    "method",
+    [abi.Method.undictify(method) for method in Contract["methods"]],
+    ids=lambda method: method.name,
+)
+def test_method_encoding_matches_algosdk(method):
+    rng = random.Random(method.name)
+    call_args, expected = [], [method.get_selector()]
+    references = {reference: [] for reference in ReferenceTypes}
+    for arg in method.args:
+        if abi.is_abi_transaction_type(arg.type):
+            continue
+        if arg.type == abi.ABIReferenceType.ACCOUNT:
+            value = account.generate_account()[1]
+        elif abi.is_abi_reference_type(arg.type):
+            value = rng.randrange(1, 2**32)
+        else:
+            value = sample(arg.type, rng)
+            call_args.append(value)
+            expected.append(arg.type.encode(value))
+            continue
+        # Accounts and apps count from 1, after the sender and the called app
+        call_args.append(value)
+        references[arg.type].append(value)
+        first_index = 0 if arg.type == abi.ABIReferenceType.ASSET else 1
+        expected.append(bytes([len(references[arg.type]) - 1 + first_index]))
+
+    call = getattr(runtime, method.name)(*call_args)
+    assert call.app_args == expected
+    assert call.accounts == references[abi.ABIReferenceType.ACCOUNT]
+    assert call.assets == references[abi.ABIReferenceType.ASSET]
+    assert call.apps == references[abi.ABIReferenceType.APPLICATION]
+    # get_txn_calls counts the app call itself
+    assert call.txn_args == method.get_txn_calls() - 1
+
+    if method.returns.type != abi.Returns.VOID:
+        value = sample(method.returns.type, rng)
+        log = runtime.RETURN_PREFIX + method.returns.type.encode(value)
+        decoded = runtime.decode_return(method.get_selector(), log)
+        assert method.returns.type.encode(decoded) == method.returns.type.encode(value)
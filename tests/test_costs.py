@@ -0,0 +1,60 @@
+"""CostCollector folds cost records into histograms and padding advice."""
+
+import base64
+
+from alright_client import runtime
+from alright_client.costs import (
+    CallCost,
+    CallCostEvent,
+    CallCostRecord,
+    CostCollector,
+    decode_cost_record,
+)
+
+Methods = {runtime.SETTLE_DEAL: "settle_deal", runtime.MATCH_DEAL: "match_deal"}
+
+
+def cost_log(selector: bytes, box_bytes: int, inner_txns: int, opcodes: int) -> bytes:
+    return CallCostRecord.pack(
+        CallCostEvent, selector, box_bytes, inner_txns, 20_000, 20_000 - opcodes
+    )
+
+
+def test_decode_cost_record():
+    log = cost_log(runtime.SETTLE_DEAL, 3000, 6, 1500)
+    cost = decode_cost_record(log)
+    assert cost == CallCost(CallCostEvent, runtime.SETTLE_DEAL, 3000, 6, 20_000, 18_500)
+    assert cost.opcodes == 1500
+    assert decode_cost_record(runtime.RETURN_PREFIX + log[4:]) is None
+    assert decode_cost_record(log[:-1]) is None
+
+
+def test_collector_histograms_and_padding():
+    def record(*logs: bytes, inner=()) -> dict:
+        txn = {"logs": [base64.b64encode(log).decode() for log in logs]}
+        if inner:
+            txn["inner-txns"] = [record(*logs) for logs in inner]
+        return txn
+
+    collector = CostCollector(Methods)
+    collector.add_records(
+        [
+            record(
+                runtime.RETURN_PREFIX + b"Disbursed",
+                cost_log(runtime.SETTLE_DEAL, 3000, 6, 1500),
+            ),
+            record(cost_log(runtime.SETTLE_DEAL, 1024, 8, 600)),
+            # Records of inner app calls count too
+            record(inner=[[cost_log(runtime.MATCH_DEAL, 0, 0, 1)]]),
+            record(cost_log(bytes(4), 0, 0, 0)),
+        ]
+    )
+    assert collector.calls == {"settle_deal": 2, "match_deal": 1, "00000000": 1}
+    assert collector.histograms()["settle_deal"] == {
+        "opcodes": {1024: 1, 2048: 1},
+        "box_bytes": {1024: 1, 4096: 1},
+        "inner_txns": {6: 1, 8: 1},
+    }
+    # 3000 box bytes take 3 refs, 800 opcodes over the call's own 700 take 2 calls
+    assert collector.suggested_padding("settle_deal") == (3, 2)
+    assert collector.suggested_padding("match_deal") == (0, 0)
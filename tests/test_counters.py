@@ -0,0 +1,66 @@
+"""deal_counters reads count_deal's buckets out of the app's global state."""
+
+import base64
+
+from alright_client.counters import (
+    EpochRounds,
+    EpochSlots,
+    ReservedUintPrefix,
+    deal_counters,
+    decode_global_state,
+)
+
+
+def entry(key: bytes, value: int | bytes) -> dict:
+    if isinstance(value, int):
+        typed = {"type": 2, "uint": value}
+    else:
+        typed = {"type": 1, "bytes": base64.b64encode(value).decode()}
+    return {"key": base64.b64encode(key).decode(), "value": typed}
+
+
+def test_deal_counters_buckets():
+    epoch = 20
+    state = decode_global_state(
+        [
+            entry(b"total_deals", 7),
+            entry(b"active_deals", 3),
+            entry(b"completed_deals", 2),
+            entry(b"owner", b"\x01" * 32),
+            entry(ReservedUintPrefix + b"ma\x00", 4),
+            entry(ReservedUintPrefix + b"ma\x02", 1),
+            entry(ReservedUintPrefix + b"ca\x00", 2),
+            entry(ReservedUintPrefix + b"me\x04", epoch << 32 | 5),
+            entry(ReservedUintPrefix + b"ce\x04", epoch << 32 | 2),
+            # Epoch 13's slot, which epoch 21 takes over once a deal lands in it
+            entry(ReservedUintPrefix + b"me\x05", (epoch - EpochSlots + 1) << 32 | 9),
+            entry(ReservedUintPrefix + b"xe\x01", 1),
+        ]
+    )
+    counters = deal_counters(state)
+    assert counters[:3] == (7, 3, 2)
+    assert counters.by_class == {"algo": (4, 2), "asa": (0, 0), "legs": (1, 0)}
+    assert counters.by_epoch == {epoch - EpochSlots + 1: (9, 0), epoch: (5, 2)}
+    current = deal_counters(state, current_round=(epoch + 1) * EpochRounds)
+    assert current.by_epoch == {epoch: (5, 2)}
+
+
+def test_matched_and_completed_deals_are_counted(alright):
+    def counters():
+        params = alright.algod.application_info(alright.app_id)["params"]
+        return deal_counters(decode_global_state(params["global-state"]))
+
+    creator, partner = alright.account(), alright.account()
+    deal_key = alright.create_deal(creator, partner)
+    assert counters().by_class["algo"] == (0, 0)
+    alright.match_deal(partner, creator, deal_key)
+    matched = counters()
+    assert matched.by_class["algo"] == (1, 0)
+    assert sum(matched_count for matched_count, _ in matched.by_epoch.values()) == 1
+
+    alright.agree_disbursement(creator, partner, deal_key)
+    alright.agree_disbursement(partner, creator, deal_key)
+    completed = counters()
+    assert completed.completed_deals == 1
+    assert completed.by_class["algo"] == (1, 1)
+    assert list(completed.by_epoch.values()) == [(1, 1)]
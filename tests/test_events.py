@@ -0,0 +1,79 @@
+"""Deal event logs decode to the deal header as it stood in the box."""
+
+import base64
+
+from alright_client import runtime
+from alright_client.costs import CallCostEvent
+from alright_client.events import (
+    DealCreatedEvent,
+    DealEvent,
+    DealEventLength,
+    DealLegsEvent,
+    DealNoteEvent,
+    DisbursementAgreedEvent,
+    LegsEvent,
+    decode_deal_and_legs_events,
+    decode_event,
+    decode_events,
+    decode_legs_event,
+    decode_note_event,
+)
+from alright_client.layout import (
+    Deal,
+    DealHeader,
+    DealHeaderLength,
+    DealLeg,
+    address_bytes,
+    encode_deal,
+    encode_legs,
+)
+
+DealKey = b"D" + bytes(range(32))
+Header = encode_deal(
+    Deal(
+        1, 0, b"\x02" * 32, 10, 0, 5, 7, b"\x01" * 32, 20, 0, 0, 0, 0, 0, 0, 16,
+        b"note",
+    )
+)[:DealHeaderLength]  # fmt: skip
+Legs = [DealLeg(1, 7, 3, 0)]
+
+
+def test_decode_logs_in_order():
+    created = bytes([DealCreatedEvent]) + DealKey + Header
+    legs = bytes([DealLegsEvent]) + DealKey + encode_legs(Legs)
+    note = bytes([DealNoteEvent]) + DealKey + b"a note"
+    abi_return = runtime.RETURN_PREFIX + created[: DealEventLength - 4]
+    cost = bytes([CallCostEvent]) + bytes(DealEventLength - 1)
+    assert len(created) == DealEventLength
+    event = decode_event(created)
+    assert event == DealEvent(DealCreatedEvent, DealKey, *DealHeader.unpack(Header))
+    assert decode_event(abi_return) is None and decode_event(cost) is None
+
+    logs = [abi_return, created, note, legs, cost]
+    assert list(decode_events(logs)) == [event]
+    assert list(decode_deal_and_legs_events(logs)) == [
+        event,
+        LegsEvent(DealLegsEvent, DealKey, Legs),
+    ]
+    assert decode_note_event(note) == (DealKey, b"a note")
+    assert decode_legs_event(legs) == (DealKey, Legs)
+    assert decode_note_event(created) is None and decode_legs_event(note) is None
+
+
+def test_agree_logs_box_header(alright):
+    creator, partner = alright.account(), alright.account()
+    deal_key = alright.create_deal(creator, partner)
+    alright.match_deal(partner, creator, deal_key)
+    (info,) = alright.agree_disbursement(creator, partner, deal_key)
+    logs = [base64.b64decode(log) for log in info.get("logs", [])]
+    (event,) = decode_events(logs)
+    assert event.event == DisbursementAgreedEvent
+    assert event.deal_key == deal_key
+    assert event[2:] == DealHeader.unpack(alright.box(deal_key)[:DealHeaderLength])
+    creator_key = address_bytes(creator.address)
+    creator_status = (
+        event.first_acc_status
+        if event.first_acc_address == creator_key
+        else event.second_acc_status
+    )
+    assert creator_status == 3
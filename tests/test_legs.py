@@ -0,0 +1,89 @@
+"""Extra legs encode as the contract stores them and settle with the MBR refund."""
+
+from alright_client import runtime
+from alright_client.layout import (
+    Deal,
+    DealLeg,
+    DealLegsFlag,
+    LegCollateral,
+    LegSecondAccount,
+    address_bytes,
+    decode_deal,
+    decode_legs,
+    encode_legs,
+    legs_box_key,
+    legs_cost,
+)
+from alright_client.settlement import Transfer, settlement_plan
+
+First = b"\x02" * 32
+Second = b"\x01" * 32
+Legs = [
+    DealLeg(0, 0, 2, 2),
+    DealLeg(LegSecondAccount, 9, 8, 3),
+    DealLeg(LegSecondAccount | LegCollateral, 9, 4),
+]
+
+
+def make_deal(first_acc_data: int = 0, second_acc_data: int = 0) -> Deal:
+    return Deal(
+        2, 2, First, 10, 0, 0, 0, Second, 20, 7, 0, 0, 10, 0,
+        first_acc_data, second_acc_data, b"note",
+    )  # fmt: skip
+
+
+def test_legs_round_trip():
+    value = encode_legs(Legs)
+    assert len(value) == 25 * len(Legs)
+    assert decode_legs(value) == Legs
+    assert legs_cost(Legs) == 2500 + 400 * (len(value) + 33)
+    # The ABI arg is the legs box value behind a uint16 count
+    call = runtime.add_deal_legs(b"D" * 33, 0, "A" * 58, 1, Legs)
+    assert call.app_args[-1] == len(Legs).to_bytes(2, "big") + value
+
+
+def test_settlement_plan_legs():
+    assert settlement_plan(make_deal(first_acc_data=DealLegsFlag), Legs)[2:] == [
+        (Second, 0, 2, b"Leg payment"),
+        (First, 9, 3, b"Leg payment"),
+        (Second, 9, 5, b"Leg payment"),
+        (Second, 9, 4, b"Leg payment"),
+        (First, 0, legs_cost(Legs), b"Legs box MBR returned"),
+    ]
+
+
+def test_legs_box_mbr_goes_to_creator():
+    refund = Transfer(Second, 0, legs_cost(Legs), b"Legs box MBR returned")
+    assert settlement_plan(make_deal(second_acc_data=DealLegsFlag), Legs)[-1] == refund
+    assert b"Legs box MBR returned" not in [
+        transfer.note for transfer in settlement_plan(make_deal())
+    ]
+
+
+def test_settle_deal_with_legs(alright):
+    a, b = alright.account(), alright.account()
+    first, second = (
+        (a, b) if address_bytes(a.address) > address_bytes(b.address) else (b, a)
+    )
+    deal_key = alright.create_deal(second, first)
+    legs = [
+        DealLeg(LegSecondAccount, 0, 20_000, 5_000),
+        DealLeg(0, 0, 30_000, 30_000),
+        DealLeg(LegSecondAccount | LegCollateral, 0, 40_000),
+    ]
+    alright.add_deal_legs(second, first, deal_key, legs, [20_000, 40_000])
+    assert decode_legs(alright.box(legs_box_key(deal_key))) == legs
+    alright.match_deal(first, second, deal_key, [30_000])
+    deal = decode_deal(alright.box(deal_key))
+    assert deal.second_acc_data & DealLegsFlag
+
+    first_info, _ = alright.settle_deal(
+        first,
+        second,
+        deal_key,
+        deal.first_acc_forward_amount,
+        deal.second_acc_forward_amount,
+        inner_txns=6 + 2 * len(legs) + 1,
+    )
+    assert alright.transfers(first_info) == settlement_plan(deal, legs)
+    assert alright.box(legs_box_key(deal_key)) is None
@@ -0,0 +1,53 @@
+"""Only deal boxes are migrated, by the client and by the contract."""
+
+import pytest
+from algosdk import transaction
+
+from alright_client import runtime
+from alright_client.layout import (
+    DealLeg,
+    LegSecondAccount,
+    address_bytes,
+    legs_box_key,
+)
+from alright_client.migration import migration_groups, stale_deal_keys
+
+Sender = "7ZUECA7HFLZTXENRV24SHLU4AVPUTMTTDUFUBNBD64C73F3UHRTHAIOF6Q"
+Hash = bytes(range(32))
+
+
+def suggested_params() -> transaction.SuggestedParams:
+    return transaction.SuggestedParams(0, 1, 1000, "A" * 44, flat_fee=True)
+
+
+def test_stale_deal_keys_skips_legs_boxes():
+    old_header = bytes(148)
+    boxes = [(b"D" + Hash, old_header), (b"L" + Hash, old_header)]
+    assert list(stale_deal_keys(boxes)) == [b"D" + Hash]
+
+
+def test_migration_groups_rejects_legs_key():
+    groups = migration_groups(Sender, suggested_params(), 1, [b"D" + Hash, b"H" + Hash])
+    assert len(groups) == 1
+    with pytest.raises(ValueError, match="Not a deal key"):
+        migration_groups(Sender, suggested_params(), 1, [b"L" + Hash])
+
+
+def test_contract_rejects_legs_key(alright):
+    # Byte 147 of a 6-leg box is in leg 5's forward amount, where a deal keeps
+    # its version, so a legs key read as a deal would look stale
+    creator, partner = alright.account(), alright.account()
+    deal_key = alright.create_deal(creator, partner)
+    partner_side = (
+        LegSecondAccount
+        if address_bytes(creator.address) > address_bytes(partner.address)
+        else 0
+    )
+    legs = [DealLeg(partner_side, 0, 1000, 0)] * 6
+    alright.add_deal_legs(creator, partner, deal_key, legs)
+    legs_key = legs_box_key(deal_key)
+    before = alright.box(legs_key)
+
+    call = runtime.migrate_deals([legs_key])
+    assert alright.rejected(alright.app_call(creator, call, [legs_key])) == "Deal key"
+    assert alright.box(legs_key) == before
@@ -0,0 +1,62 @@
+"""Deal events open and close offers in the order book."""
+
+from alright_client.events import (
+    DataAttachedEvent,
+    DealCreatedEvent,
+    DealEvent,
+    DealMatchedEvent,
+    DealRecalledEvent,
+)
+from alright_client.layout import DataAttachedFlag
+from alright_client.orderbook import OrderBook
+
+First = b"\x02" * 32
+Second = b"\x01" * 32
+Third = b"\x03" * 32
+
+
+def event(
+    code: int,
+    deal_key: bytes,
+    dep_amount: int,
+    statuses: tuple[int, int] = (1, 0),
+    counterparty: bytes = Second,
+    first_acc_data: int = 0,
+) -> DealEvent:
+    # First creates, depositing Algo against 5 of asset 7 as collateral
+    return DealEvent(
+        code, deal_key, *statuses, First, dep_amount, 0, 5, 7,
+        counterparty, 100, 0, 0, 0, 0, 0, first_acc_data, 0,
+    )  # fmt: skip
+
+
+def test_attach_keeps_offer_open():
+    book = OrderBook()
+    book.apply(event(DealCreatedEvent, b"A" * 33, 300))
+    book.apply(event(DealCreatedEvent, b"B" * 33, 100, counterparty=Third))
+    book.apply(event(DealCreatedEvent, b"C" * 33, 200))
+    offer = book.offers[b"A" * 33]
+
+    book.apply(
+        event(DataAttachedEvent, b"A" * 33, 300, first_acc_data=DataAttachedFlag)
+    )
+    assert book.offers[b"A" * 33] == offer
+    assert [o.deal_key for o in book.range(0, 7)] == [b"B" * 33, b"C" * 33, b"A" * 33]
+    assert book.best_match(0, 7, 150).deal_key == b"C" * 33
+    assert book.best_match(0, 7, 150, counterparty=Third) is None
+    assert [o.deal_key for o in book.offers_for(Second)] == [b"A" * 33, b"C" * 33]
+
+    book.apply(event(DealMatchedEvent, b"A" * 33, 300, statuses=(2, 2)))
+    book.apply(event(DealRecalledEvent, b"C" * 33, 200, statuses=(0, 0)))
+    assert list(book.offers) == [b"B" * 33]
+    assert book.offers_for(Second) == []
+
+
+def test_offer_from_second_account():
+    book = OrderBook.from_deals(
+        [(b"A" * 33, event(DealCreatedEvent, b"A" * 33, 300, statuses=(0, 1)))]
+    )
+    offer = book.offers[b"A" * 33]
+    assert (offer.creator, offer.counterparty) == (Second, First)
+    assert (offer.dep_amount, offer.want_dep_amount) == (100, 300)
+    assert (offer.want_col_asset, offer.want_col_amount) == (7, 5)
@@ -0,0 +1,77 @@
+"""load_portfolios reads each deal once and keeps every account's slots."""
+
+import threading
+from collections import Counter
+
+from alright_client.layout import (
+    Deal,
+    DealListBoxLength,
+    ZeroDealKey,
+    address_bytes,
+    decode_deal,
+    encode_deal,
+)
+from alright_client.portfolio import box_fetcher, load_portfolios
+
+A, B, C = (bytes([i]) * 32 for i in (3, 2, 1))
+AB, AC, Gone = (b"D" + bytes([i]) * 32 for i in (1, 2, 3))
+
+
+def deal_list(*slots: bytes) -> bytes:
+    return b"".join(slots).ljust(DealListBoxLength, b"\0")
+
+
+def make_deal(first: bytes, second: bytes, amount: int, note: bytes) -> Deal:
+    return Deal(
+        2, 2, first, amount, 0, 0, 0, second, 2 * amount, 7, 0, 0, 0, 0, 0, 16,
+        note,
+    )  # fmt: skip
+
+
+Deals = {AB: make_deal(A, B, 10, b"ab"), AC: make_deal(A, C, 20, b"")}
+Boxes = {
+    A: deal_list(AB, ZeroDealKey, AC),
+    B: deal_list(Gone, AB),
+    C: deal_list(AC),
+    **{deal_key: encode_deal(deal) for deal_key, deal in Deals.items()},
+}
+
+
+def test_load_portfolios_reads_each_deal_once():
+    reads = Counter()
+    lock = threading.Lock()
+
+    def fetch(name: bytes) -> bytes | None:
+        with lock:
+            reads[name] += 1
+        return Boxes.get(name)
+
+    # D has no deal list, and Gone was deleted after B's list named it
+    D = bytes(32)
+    portfolio = load_portfolios(fetch, [A, B, C, D, A], max_workers=4)
+    assert set(reads.values()) == {1}
+    assert set(reads) == {A, B, C, D, AB, AC, Gone}
+
+    assert sorted(portfolio.deal_keys) == [AB, AC]
+    for row, deal_key in enumerate(portfolio.deal_keys):
+        assert portfolio.deal(row) == Deals[deal_key]
+    assert portfolio.deals_of(A) == [(0, AB, Deals[AB]), (2, AC, Deals[AC])]
+    assert portfolio.deals_of(B) == [(1, AB, Deals[AB])]
+    assert portfolio.deals_of(D) == []
+    # Columns total without building a Deal per row
+    assert sum(portfolio.columns["first_acc_dep_amount"]) == 30
+    assert bytes(portfolio.columns["second_acc_address"]) in (B + C, C + B)
+
+
+def test_load_portfolios_from_app(alright):
+    creator, partner = alright.account(), alright.account()
+    deal_key = alright.create_deal(creator, partner)
+    creator_key = address_bytes(creator.address)
+    portfolio = load_portfolios(
+        box_fetcher(alright.algod, alright.app_id),
+        [creator_key, address_bytes(partner.address)],
+    )
+    deal = decode_deal(alright.box(deal_key))
+    assert portfolio.deals_of(creator_key) == [
+        (alright.key_index(creator, deal_key), deal_key, deal)
+    ]
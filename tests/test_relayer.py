@@ -0,0 +1,65 @@
+"""The relayer's fee covers every transaction at the network's fee."""
+
+import json
+from pathlib import Path
+
+import pytest
+from algosdk import transaction
+
+from alright_client.migration import migration_groups
+from alright_client.relayer import MethodInnerTxns, inner_txn_count, relay_group
+from alright_client.shards import ShardSet, opt_in_groups
+
+Contract = json.loads(
+    (Path(__file__).resolve().parent.parent / "artifacts" / "contract.json").read_text()
+)
+Relayer = "7ZUECA7HFLZTXENRV24SHLU4AVPUTMTTDUFUBNBD64C73F3UHRTHAIOF6Q"
+User = "GD64YIY3TWGDMCNPP553DZPPR6LDUSFQOIJVFDPPXWEG3FVOJCCDBBHU5A"
+
+
+def suggested_params(fee: int = 0, min_fee: int = 2000, flat_fee: bool = False):
+    return transaction.SuggestedParams(
+        fee, 1, 1000, "A" * 44, flat_fee=flat_fee, min_fee=min_fee
+    )
+
+
+def test_every_method_has_an_inner_txn_count():
+    assert set(MethodInnerTxns) == {method["name"] for method in Contract["methods"]}
+
+
+def test_inner_txn_count():
+    assert inner_txn_count("settle_deal") == 6
+    assert inner_txn_count("settle_deal", legs=3) == 13
+    assert inner_txn_count("recall_deal", legs=3) == 6
+    assert inner_txn_count("create_deal", legs=3) == 0
+    assert inner_txn_count("settle_pair", assets=2) == 4
+    assert inner_txn_count("opt_in_to_asas", assets=8) == 8
+    assert inner_txn_count("close_out_asas", assets=8) == 9
+    with pytest.raises(KeyError):
+        inner_txn_count("no_such_method")
+
+
+def test_relay_fee_follows_network_fee():
+    user_txns = [
+        transaction.PaymentTxn(User, suggested_params(flat_fee=True), Relayer, 0),
+        transaction.ApplicationNoOpTxn(User, suggested_params(1000, flat_fee=True), 1),
+    ]
+    group = relay_group(user_txns, Relayer, suggested_params(), 1, inner_txns=6)
+    # 3 outer and 6 inner txns at the network minimum, less the user's 1000
+    assert group[0].fee == 2000 * 9 - 1000
+    raised = relay_group(user_txns, Relayer, suggested_params(3000, flat_fee=True), 1)
+    assert raised[0].fee == 3000 * 3 - 1000
+
+
+def test_owner_groups_use_network_fee():
+    (migration,) = migration_groups(Relayer, suggested_params(), 1, [b"D" * 33])
+    assert migration[0].fee == 2000
+
+    class Algod:
+        def account_info(self, address: str) -> dict:
+            return {"assets": []}
+
+    (opt_in,) = opt_in_groups(
+        Algod(), Relayer, ShardSet([1]), [5, 6], suggested_params()
+    )
+    assert opt_in[1].fee == 2000 * 3
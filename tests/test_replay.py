@@ -0,0 +1,136 @@
+"""Recorded groups replay a round per simulate request, state carried forward."""
+
+import base64
+import json
+
+from algosdk import abi, logic
+
+from alright_client.layout import BoxByteMBR, BoxFlatMBR
+from alright_client.replay import mbr_series, read_groups, replay, summarize
+
+AppId = 1001
+Sender = "7ZUECA7HFLZTXENRV24SHLU4AVPUTMTTDUFUBNBD64C73F3UHRTHAIOF6Q"
+Selector = abi.Method.from_signature("create_deal()void").get_selector()
+Methods = {Selector: "create_deal"}
+
+
+def b64(value: bytes) -> str:
+    return base64.b64encode(value).decode()
+
+
+def record(round_: int, offset: int, group: bytes | None = None, pay=False) -> dict:
+    txn = {
+        "sender": Sender,
+        "fee": 1000,
+        "first-valid": round_ - 1,
+        "last-valid": round_ + 100,
+        "genesis-hash": b64(bytes(32)),
+        "confirmed-round": round_,
+        "intra-round-offset": offset,
+        "round-time": 1000 + round_,
+    }
+    if group is not None:
+        txn["group"] = b64(group)
+    if pay:
+        txn["tx-type"] = "pay"
+        txn["payment-transaction"] = {
+            "receiver": logic.get_application_address(AppId),
+            "amount": 5,
+        }
+    else:
+        txn["tx-type"] = "appl"
+        txn["application-transaction"] = {
+            "application-id": AppId,
+            "on-completion": "noop",
+            "application-args": [b64(Selector)],
+            "box-references": [{"app": AppId, "name": b64(b"box")}],
+        }
+    return txn
+
+
+Feed = [
+    record(10, 0, b"G" * 32, pay=True),
+    record(10, 1, b"G" * 32),
+    record(10, 2),
+    record(10, 3, b"H" * 32),
+    record(11, 0),
+]
+
+
+def call_result(written: int) -> dict:
+    # A simulated app call with two nested inner txns that writes "box"
+    change = {
+        "app-state-type": "b",
+        "key": b64(b"box"),
+        "operation": "w",
+        "new-value": {"bytes": b64(bytes(written))},
+    }
+    return {
+        "txn-result": {"inner-txns": [{"inner-txns": [{}]}]},
+        "app-budget-consumed": 700,
+        "exec-trace": {"approval-program-trace": [{"state-changes": [change]}]},
+    }
+
+
+class Algod:
+    # Each request's calls write 10 more bytes to "box" than the last request's
+    def __init__(self) -> None:
+        self.requests = []
+
+    def simulate_transactions(self, request) -> dict:
+        self.requests.append(request)
+        written = len(self.requests) * 10
+        return {
+            "txn-groups": [
+                {"txn-results": [call_result(written) for _ in group.txns]}
+                for group in request.txn_groups
+            ]
+        }
+
+
+def write_feed(tmp_path) -> str:
+    path = tmp_path / "feed.jsonl"
+    path.write_text("".join(json.dumps(txn) + "\n" for txn in Feed))
+    return str(path)
+
+
+def test_read_groups_splits_on_group_and_round():
+    groups = list(read_groups(Feed))
+    assert [[txn["intra-round-offset"] for txn in group] for group in groups] == [
+        [0, 1],
+        [2],
+        [3],
+        [0],
+    ]
+
+
+def test_replay_batches_each_round(tmp_path):
+    algod = Algod()
+    samples = list(replay(algod, write_feed(tmp_path), Methods, AppId))
+    # One request per round against the round before, groups in recorded order
+    assert [request.round for request in algod.requests] == [9, 10]
+    assert [
+        [len(group.txns) for group in request.txn_groups] for request in algod.requests
+    ] == [[2, 1, 1], [1]]
+    assert [sample.round for sample in samples] == [10, 10, 10, 11]
+    assert {sample.method for sample in samples} == {"create_deal"}
+    assert {(sample.opcode_cost, sample.inner_txns) for sample in samples} == {(700, 2)}
+    assert [sample.box_bytes_written for sample in samples] == [10, 10, 10, 20]
+    assert mbr_series(samples) == [
+        (10, BoxFlatMBR + BoxByteMBR * 13),
+        (11, BoxFlatMBR + BoxByteMBR * 23),
+    ]
+    assert summarize(samples)["create_deal"]["calls"] == 4
+
+
+def test_replay_against_target_is_one_request(tmp_path):
+    algod = Algod()
+    samples = list(replay(algod, write_feed(tmp_path), Methods, AppId, 1.0, 2002))
+    (request,) = algod.requests
+    assert request.round == 9
+    assert len(request.txn_groups) == 4
+    pay, call = (stxn.transaction for stxn in request.txn_groups[0].txns)
+    assert pay.receiver == logic.get_application_address(2002)
+    assert call.index == 2002
+    assert pay.group == call.group != base64.b64decode(Feed[0]["group"])
+    assert len(samples) == 4
@@ -0,0 +1,73 @@
+"""settle_deal only disburses with the partner's matching call right after it."""
+
+from alright_client import runtime
+from alright_client.layout import address_bytes
+
+
+def matched_deal(alright):
+    # A matched deal and its accounts, first account (greater address) first
+    a, b = alright.account(), alright.account()
+    first, second = (
+        (a, b) if address_bytes(a.address) > address_bytes(b.address) else (b, a)
+    )
+    deal_key = alright.create_deal(first, second)
+    alright.match_deal(second, first, deal_key)
+    return first, second, deal_key
+
+
+def settle_call(alright, sender, partner, deal_key, forward=(0, 0), nonce=0, fee=8):
+    call = runtime.settle_deal(
+        deal_key,
+        alright.key_index(sender, deal_key),
+        partner.address,
+        alright.key_index(partner, deal_key),
+        *forward,
+        nonce,
+    )
+    return alright.app_call(
+        sender, call, alright.deal_boxes(sender, partner, deal_key), fee=fee
+    )
+
+
+def test_first_call_needs_partner_call_after(alright):
+    first, second, deal_key = matched_deal(alright)
+    assert (
+        alright.rejected(settle_call(alright, first, second, deal_key))
+        == "Second account call follows"
+    )
+    assert (
+        alright.rejected(
+            settle_call(alright, first, second, deal_key),
+            settle_call(alright, second, first, deal_key, nonce=1, fee=0),
+        )
+        == "Second account call matches"
+    )
+    assert (
+        alright.rejected(
+            settle_call(alright, first, second, deal_key, forward=(100_000, 0)),
+            settle_call(alright, second, first, deal_key, fee=0),
+        )
+        == "Second account call matches"
+    )
+    # Nothing settled, so the partners can still settle as agreed
+    first_info, second_info = alright.settle_deal(first, second, deal_key, 0, 0)
+    assert alright.box(deal_key) is None
+    assert len(alright.transfers(first_info)) > 0
+    assert alright.transfers(second_info) == []
+
+
+def test_second_call_needs_first_call_before(alright):
+    first, second, deal_key = matched_deal(alright)
+    assert (
+        alright.rejected(settle_call(alright, second, first, deal_key, fee=2))
+        == "First account call precedes"
+    )
+    # A payment ahead of the second account's call is not the first's call
+    assert (
+        alright.rejected(
+            alright.pay(first, 0, fee=2),
+            settle_call(alright, second, first, deal_key, fee=0),
+        )
+        == "First account call matches"
+    )
+    assert alright.box(deal_key) is not None
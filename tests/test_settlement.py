@@ -0,0 +1,172 @@
+"""settlement_plan, net_settlement_plan and settlement_totals match the contract."""
+
+import random
+
+import pytest
+
+from alright_client import runtime
+from alright_client.layout import (
+    Deal,
+    address_bytes,
+    decode_deal,
+    encode_deal,
+)
+from alright_client.settlement import (
+    deal_headers,
+    net_settlement_plan,
+    settlement_plan,
+    settlement_totals,
+)
+
+First = b"\x02" * 31 + b"\x00"  # Trailing NUL, as settlement_totals strips them
+Second = b"\x01" * 32
+
+
+def make_deal(dep=(10, 20), fwd=(10, 0), assets=(0, 7), col=(5, 0)) -> Deal:
+    return Deal(
+        2,
+        2,
+        First,
+        dep[0],
+        assets[0],
+        col[0],
+        0,
+        Second,
+        dep[1],
+        assets[1],
+        col[1],
+        0,
+        fwd[0],
+        fwd[1],
+        0,
+        0,
+        b"note",
+    )
+
+
+def random_deals(count: int, seed: int = 0) -> list[Deal]:
+    rng = random.Random(seed)
+    deals = []
+    for _ in range(count):
+        dep = (rng.randrange(0, 100), rng.randrange(0, 100))
+        deals.append(
+            make_deal(
+                dep,
+                (rng.randint(0, dep[0]), rng.randint(0, dep[1])),
+                (rng.choice((0, 7, 9)), rng.choice((0, 7, 9))),
+                (rng.randrange(0, 10), rng.randrange(0, 10)),
+            )
+        )
+    return deals
+
+
+def plan_totals(deals: list[Deal]) -> dict[tuple[bytes, int], int]:
+    totals: dict[tuple[bytes, int], int] = {}
+    for deal in deals:
+        for transfer in settlement_plan(deal):
+            key = (transfer.receiver, transfer.asset)
+            totals[key] = totals.get(key, 0) + transfer.amount
+    return totals
+
+
+def array_totals(deals: list[Deal]) -> dict[tuple[bytes, int], int]:
+    rows = settlement_totals(deal_headers(encode_deal(deal) for deal in deals))
+    return {
+        (bytes(row["account"]).ljust(32, b"\0"), int(row["asset"])): int(row["amount"])
+        for row in rows
+    }
+
+
+def test_settlement_plan_branches():
+    assert settlement_plan(make_deal(fwd=(10, 0))) == [
+        (Second, 0, 10, b"Payment forward"),
+        (First, 0, 5, b"Collateral returned"),
+        (Second, 7, 20, b"Payment returned"),
+    ]
+    assert settlement_plan(make_deal(fwd=(4, 20), col=(0, 0))) == [
+        (Second, 0, 4, b"Partial payment forward"),
+        (First, 0, 6, b"Partial payment returned"),
+        (First, 7, 20, b"Payment forward"),
+    ]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_totals_match_plans(seed):
+    pytest.importorskip("numpy")
+    deals = random_deals(50, seed)
+    expected = {key: amount for key, amount in plan_totals(deals).items() if amount}
+    assert array_totals(deals) == expected
+    assert {
+        (transfer.receiver, transfer.asset): transfer.amount
+        for transfer in net_settlement_plan(deals)
+    } == plan_totals(deals)
+
+
+def test_forward_exceeding_deposit_is_refused():
+    deal = make_deal(fwd=(11, 0))
+    with pytest.raises(ValueError):
+        settlement_plan(deal)
+    with pytest.raises(ValueError):
+        net_settlement_plan([deal])
+    pytest.importorskip("numpy")
+    with pytest.raises(ValueError):
+        array_totals([deal])
+
+
+def test_settle_deal_sends_the_plan(alright):
+    a, b = alright.account(), alright.account()
+    first, second = (
+        (a, b) if address_bytes(a.address) > address_bytes(b.address) else (b, a)
+    )
+    for note, forward in (
+        (b"full", (1, 1)),
+        (b"returned", (0, 1)),
+        (b"partial", (0.25, 0)),
+        (b"both partial", (0.5, 0.75)),
+    ):
+        deal_key = alright.create_deal(first, second, note, their_col_amount=30_000)
+        alright.match_deal(second, first, deal_key)
+        deal = decode_deal(alright.box(deal_key))
+        deal = deal._replace(
+            first_acc_forward_amount=int(deal.first_acc_dep_amount * forward[0]),
+            second_acc_forward_amount=int(deal.second_acc_dep_amount * forward[1]),
+        )
+        first_info, _ = alright.settle_deal(
+            first,
+            second,
+            deal_key,
+            deal.first_acc_forward_amount,
+            deal.second_acc_forward_amount,
+        )
+        assert alright.transfers(first_info) == settlement_plan(deal)
+        assert alright.box(deal_key) is None
+
+
+def test_settle_pair_sends_the_net_plan(alright):
+    a, b = alright.account(), alright.account()
+    one = alright.create_deal(a, b, b"one")
+    alright.match_deal(b, a, one)
+    two = alright.create_deal(b, a, b"two", dep_amount=300_000, col_amount=0)
+    alright.match_deal(a, b, two)
+    for deal_key in (one, two):
+        alright.agree_disbursement(b, a, deal_key)
+    deals = [decode_deal(alright.box(deal_key)) for deal_key in (one, two)]
+
+    call = runtime.settle_pair(
+        b.address,
+        [one, two],
+        [alright.key_index(a, one), alright.key_index(a, two)],
+        [alright.key_index(b, one), alright.key_index(b, two)],
+    )
+    # Box references count group-wide, so a box_budget call carries the data
+    # boxes the call has no room for
+    lists = alright.deal_boxes(a, b, one)[:2]
+    data_boxes = [
+        box for key in (one, two) for box in alright.deal_boxes(a, b, key)[4:]
+    ]
+    pair_info, _ = alright.send(
+        alright.app_call(a, call, [*lists, one, two], fee=6),
+        alright.app_call(a, runtime.box_budget(), data_boxes, fee=0),
+    )
+    assert alright.transfers(pair_info) == net_settlement_plan(deals)
+    assert alright.box(one) is None and alright.box(two) is None
@@ -0,0 +1,25 @@
+"""Both accounts of a deal route it to the same shard."""
+
+from alright_client.shards import ShardSet
+
+DealKey = b"D" + bytes(range(32))
+Greater = b"\x02" * 32
+Lesser = b"\x01" * 32
+
+
+def test_pinned_first_account_wins_in_either_order():
+    shards = ShardSet([1, 2, 3], {Greater: 2, Lesser: 3})
+    assert shards.app_for(DealKey, Greater, Lesser) == 2
+    assert shards.app_for(DealKey, Lesser, Greater) == 2
+    assert shards.app_for(DealKey, None, Lesser) == 3
+
+
+def test_unpinned_deal_routes_by_key():
+    shards = ShardSet([1, 2, 3], {Lesser: 3})
+    routed = shards.app_for(DealKey)
+    assert shards.app_for(DealKey, Greater, b"\x04" * 32) == routed
+    assert shards.lookup_order(DealKey)[0] == routed
+    assert sorted(shards.lookup_order(DealKey)) == [1, 2, 3]
+    # Adding a shard moves a key only onto the new shard
+    grown = ShardSet([1, 2, 3, 4])
+    assert grown.app_for(DealKey) in (routed, 4)
@@ -0,0 +1,72 @@
+"""A snapshot exported from boxes reads back the same deals and legs."""
+
+import hashlib
+import json
+
+import pytest
+
+from alright_client.layout import (
+    Deal,
+    DealLeg,
+    DealListSlots,
+    LegSecondAccount,
+    ZeroDealKey,
+    create_deal_key,
+    encode_deal,
+    encode_legs,
+    legs_box_key,
+)
+from alright_client.snapshot import export_snapshot, iter_deals, load_snapshot
+
+First = b"\x02" * 32
+Second = b"\x01" * 32
+
+
+def sample_boxes() -> tuple[dict[bytes, Deal], list[tuple[bytes, bytes]]]:
+    deals = {}
+    for i, note in enumerate((b"first deal", b"", b"x" * 872)):
+        deal_key = create_deal_key(First, Second, note)
+        deals[deal_key] = Deal(
+            2, 2, First, 10 + i, 0, 1, 7, Second, 20, 9, 0, 0, 3, 0, 0, 0x10, note
+        )
+    hashed_key = create_deal_key(First, Second, b"secret", b"H")
+    deals[hashed_key] = next(iter(deals.values()))._replace(
+        deal_note=hashlib.sha256(b"secret").digest()
+    )
+    legs_key = legs_box_key(hashed_key)
+    deal_list = b"".join(deals) + ZeroDealKey * (DealListSlots - len(deals))
+    boxes = [(key, encode_deal(deal)) for key, deal in deals.items()]
+    boxes += [
+        (First, deal_list),
+        (Second, deal_list),
+        (legs_key, encode_legs([DealLeg(0, 5, 8, 8), DealLeg(LegSecondAccount, 0, 2)])),
+        (First + hashed_key[1:], b"attachment"),  # Data boxes are left out
+    ]
+    return deals, boxes
+
+
+def test_snapshot_round_trip(tmp_path):
+    deals, boxes = sample_boxes()
+    counts = export_snapshot(str(tmp_path), boxes, {b"status": b"active"}, 1, 99)
+    assert counts == {"deals": 4, "deal_lists": 2, "legs": 2}
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    assert manifest["rows"] == counts
+    assert manifest["global_state"] == {"status": b"active".hex()}
+    assert dict(iter_deals(str(tmp_path))) == deals
+
+
+def test_snapshot_arrays(tmp_path):
+    pytest.importorskip("numpy")
+    deals, boxes = sample_boxes()
+    export_snapshot(str(tmp_path), boxes, {})
+    snapshot = load_snapshot(str(tmp_path))
+    rows = snapshot["deals"]
+    assert [bytes(key) for key in rows["deal_key"]] == list(deals)
+    assert list(rows["first_acc_dep_amount"]) == [10, 11, 12, 10]
+    for row, deal in zip(rows, deals.values()):
+        start, length = int(row["note_start"]), int(row["note_length"])
+        assert bytes(snapshot["deal_notes"][start : start + length]) == deal.deal_note
+    assert bytes(snapshot["deal_lists"]["address"][0]) == First
+    legs = snapshot["legs"]
+    assert list(legs["flags"]) == [0, LegSecondAccount]
+    assert list(legs["amount"]) == [8, 2]
@@ -0,0 +1,89 @@
+"""A feed of deal events folds into the open deals and escrow balances."""
+
+import base64
+import json
+
+from alright_client.events import (
+    DealCreatedEvent,
+    DealDisbursedEvent,
+    DealEventRecord,
+    DealMatchedEvent,
+    DealRecalledEvent,
+)
+from alright_client.stream import DealView, consume, feed_events, load_checkpoint
+
+First = b"\x02" * 32
+Second = b"\x01" * 32
+
+
+def log(code: int, deal_key: bytes, statuses: tuple[int, int]) -> str:
+    # First deposits 10 Algo and 5 of asset 7, second 20 Algo
+    record = DealEventRecord.pack(
+        code, deal_key, *statuses, First, 10, 0, 5, 7,
+        Second, 20, 0, 0, 0, 0, 0, 0, 0,
+    )  # fmt: skip
+    return base64.b64encode(record).decode()
+
+
+def record(round_: int, offset: int, logs: list[str], inner=()) -> dict:
+    txn = {"confirmed-round": round_, "intra-round-offset": offset, "logs": logs}
+    if inner:
+        txn["inner-txns"] = [{"logs": logs} for logs in inner]
+    return txn
+
+
+A, B = b"D" + b"a" * 32, b"D" + b"b" * 32
+Feed = [
+    record(1, 0, [log(DealCreatedEvent, A, (1, 0))]),
+    record(1, 1, [log(DealCreatedEvent, B, (1, 0))]),
+    # Events of inner app calls count, after the outer call's own
+    record(2, 0, [log(DealMatchedEvent, A, (2, 2))], [[log(DealRecalledEvent, B, (1, 0))]]),
+    record(3, 0, [log(DealDisbursedEvent, A, (3, 3))]),
+]  # fmt: skip
+
+
+def write_feed(path, records) -> str:
+    with open(path, "a") as feed:
+        for txn in records:
+            feed.write(json.dumps(txn) + "\n")
+    return str(path)
+
+
+def test_view_tracks_escrow():
+    view = DealView()
+    balances = []
+    for position, event in feed_events(Feed):
+        view.apply(position, event)
+        balances.append(dict(view.balances))
+    assert view.position == (3, 0, 0)
+    assert balances == [
+        {(First, 0): 10, (First, 7): 5},
+        {(First, 0): 20, (First, 7): 10},
+        {(First, 0): 20, (First, 7): 10, (Second, 0): 20},
+        {(First, 0): 10, (First, 7): 5, (Second, 0): 20},
+        {},
+    ]
+    assert view.deals == {}
+    # Resuming skips up to and including the last applied position
+    assert [position for position, _ in feed_events(Feed, after=(2, 0, 0))] == [
+        (2, 0, 1),
+        (3, 0, 0),
+    ]
+
+
+def test_consume_resumes_from_checkpoint(tmp_path):
+    feed = write_feed(tmp_path / "feed.jsonl", Feed[:2])
+    checkpoint = str(tmp_path / "view.json")
+    assert len(list(consume(feed, checkpoint))) == 2
+    view = load_checkpoint(checkpoint)
+    assert view.position == (1, 1, 0)
+    assert sorted(view.deals) == [A, B]
+    assert view.balances == {(First, 0): 20, (First, 7): 10}
+
+    write_feed(feed, Feed[2:3])
+    positions = [position for position, _, _ in consume(feed, checkpoint)]
+    assert positions == [(2, 0, 0), (2, 0, 1)]
+    view = load_checkpoint(checkpoint)
+    assert list(view.deals) == [A]
+    assert view.deals[A].first_acc_status == 2
+    assert DealView.from_json(view.to_json()).balances == view.balances
@@ -0,0 +1,102 @@
+"""Submitter settles what became of an attempt before it sends again."""
+
+import base64
+
+import pytest
+from algosdk.error import AlgodHTTPError
+
+from alright_client.layout import Deal, encode_deal
+from alright_client.submission import (
+    Attempt,
+    Confirmed,
+    Expired,
+    Pending,
+    Submitter,
+    Unknown,
+)
+
+DealKey = b"D" + bytes(range(32))
+Lease = bytes(32)
+
+
+class Algod:
+    # Forgets every txid, as algod does once a txn leaves its pool
+    def __init__(
+        self, last_round: int, boxes: dict[bytes, bytes] | None = None
+    ) -> None:
+        self.last_round = last_round
+        self.boxes = boxes or {}
+
+    def pending_transaction_info(self, txid: str):
+        raise AlgodHTTPError("txn not found", 404)
+
+    def status(self) -> dict:
+        return {"last-round": self.last_round}
+
+    def application_box_by_name(self, app_id: int, name: bytes) -> dict:
+        if name not in self.boxes:
+            raise AlgodHTTPError("box not found", 404)
+        return {"value": base64.b64encode(self.boxes[name]).decode()}
+
+
+class Indexer:
+    def __init__(self, transactions: list, current_round: int) -> None:
+        self.found = {"transactions": transactions, "current-round": current_round}
+
+    def search_transactions(self, txid: str) -> dict:
+        return self.found
+
+
+def deal_box(first_acc_status: int, second_acc_status: int) -> bytes:
+    return encode_deal(
+        Deal(
+            first_acc_status, second_acc_status, bytes(32), 0, 0, 0, 0,
+            bytes(32), 0, 0, 0, 0, 0, 0, 0, 0, b"",
+        )
+    )  # fmt: skip
+
+
+def test_live_attempt_is_pending():
+    attempt = Attempt("TXID", 100, "create_deal", DealKey)
+    assert Submitter(Algod(100), 1).status(attempt) == Pending
+
+
+def test_missing_box_cannot_tell():
+    # The deal may have landed and then been recalled, so never Expired
+    submitter = Submitter(Algod(101), 1)
+    assert submitter.status(Attempt("TXID", 100, "create_deal", DealKey)) == Unknown
+    assert submitter.status(Attempt("TXID", 100, "match_deal", DealKey)) == Unknown
+    assert submitter.status(Attempt("TXID", 100)) == Unknown
+
+    submitter.attempts[Lease] = Attempt("TXID", 100, "create_deal", DealKey)
+    with pytest.raises(RuntimeError, match="Cannot tell whether TXID landed"):
+        submitter.submit(Lease, [])
+
+
+def test_deal_box_settles_attempt():
+    created = Submitter(Algod(101, {DealKey: deal_box(1, 0)}), 1)
+    assert created.status(Attempt("TXID", 100, "create_deal", DealKey)) == Confirmed
+    assert created.status(Attempt("TXID", 100, "match_deal", DealKey)) == Expired
+    created.attempts[Lease] = Attempt("TXID", 100, "create_deal", DealKey)
+    assert created.submit(Lease, []) == "TXID"
+
+    matched = Submitter(Algod(101, {DealKey: deal_box(2, 2)}), 1)
+    assert matched.status(Attempt("TXID", 100, "match_deal", DealKey)) == Confirmed
+
+
+def test_indexer_settles_forgotten_txid():
+    attempt = Attempt("TXID", 100, "create_deal", DealKey)
+    found = Indexer([{"id": "TXID"}], 101)
+    assert Submitter(Algod(101), 1, indexer_client=found).status(attempt) == Confirmed
+    # The indexer overrides a missing box, and waits until it has caught up
+    behind = Indexer([], 100)
+    assert Submitter(Algod(101), 1, indexer_client=behind).status(attempt) == Pending
+    caught_up = Indexer([], 101)
+    assert Submitter(Algod(101), 1, indexer_client=caught_up).status(attempt) == Expired
+
+
+def test_journal_survives_restart(tmp_path):
+    journal = str(tmp_path / "attempts.jsonl")
+    attempt = Attempt("TXID", 100, "match_deal", DealKey)
+    Submitter(Algod(0), 1, journal=journal)._record(Lease, attempt)
+    assert Submitter(Algod(0), 1, journal=journal).attempts == {Lease: attempt}
@@ -0,0 +1,46 @@
+"""transitions.py mirrors the contract's status table and status writes."""
+
+import pytest
+
+from alright_client.transitions import (
+    TRANSITIONS,
+    Closed,
+    MethodRules,
+    StatusRules,
+    StatusTable,
+    allowed,
+    next_statuses,
+)
+
+
+def test_status_table_matches_contract():
+    pytest.importorskip("beaker")
+    pytest.importorskip("smart_contracts.helpers.deployment_standard")
+    import alright
+
+    assert alright.StatusTable == StatusTable
+    assert [tuple(map(set, rule)) for rule in alright.StatusRules] == [
+        tuple(rule) for rule in StatusRules
+    ]
+
+
+def test_allowed_reads_status_rules():
+    for method, rule in MethodRules.items():
+        for role, pairs in zip((True, False), StatusRules[rule]):
+            for first in range(4):
+                for second in range(4):
+                    assert allowed(method, role, first, second) == (
+                        (first, second) in pairs
+                    )
+
+
+def test_transitions_cover_allowed_calls():
+    assert TRANSITIONS[("match_deal", False, (1, 0))] == (2, 2)
+    assert TRANSITIONS[("recall_deal", True, (1, 0))] is Closed
+    assert TRANSITIONS[("adjust_disbursement", True, (2, 3))] == (3, 2)
+    assert TRANSITIONS[("agree_disbursement", False, (2, 2))] == (2, 3)
+    assert TRANSITIONS[("agree_disbursement", False, (3, 2))] is Closed
+    assert TRANSITIONS[("attach_data", False, (1, 1))] == (1, 1)
+    assert ("match_deal", True, (1, 0)) not in TRANSITIONS
+    with pytest.raises(ValueError):
+        next_statuses("settle_pair", True, 2, 2)
@@ -0,0 +1,412 @@
+"""Pre-flight checks return the comment of the assert the contract would fail."""
+
+from algosdk import transaction
+
+from alright_client import runtime
+from alright_client.layout import (
+    Deal,
+    DealLeg,
+    DealLegsFlag,
+    DealListCost,
+    DealListSlots,
+    HashedDealKeyPrefix,
+    LegSecondAccount,
+    ZeroDealKey,
+    address_bytes,
+    create_deal_key,
+    encode_address,
+    encode_deal,
+    encode_legs,
+    free_key_index,
+    legs_box_key,
+    twin_deal_key,
+)
+from alright_client.snapshot import algod_boxes
+from alright_client.validate import (
+    AppState,
+    AssetTransferType,
+    CreateDeal,
+    MatchDeal,
+    PaymentType,
+    Txn,
+    check_close_out_asas,
+    check_create_deal,
+    check_match_deal,
+)
+
+App = b"\xaa" * 32
+First = b"\x02" * 32  # Greater, so the first account
+Second = b"\x01" * 32
+Note = b"terms"
+DealKey = create_deal_key(First, Second, Note)
+
+
+def deal_list(*keys: bytes) -> bytes:
+    return b"".join(keys) + ZeroDealKey * (DealListSlots - len(keys))
+
+
+def create_call(**changes) -> CreateDeal:
+    call = CreateDeal(
+        sender=First,
+        deposit_payment=Txn(PaymentType, First, App, 10**6),
+        collateral_payment=Txn(PaymentType, First, App, 0),
+        key_index=0,
+        your_dep_amount=10**6,
+        your_dep_asset=0,
+        your_col_amount=0,
+        your_col_asset=0,
+        their_address=Second,
+        their_key_index=0,
+        their_dep_amount=5,
+        their_dep_asset=7,
+        their_col_amount=0,
+        their_col_asset=0,
+        deal_note=Note,
+        registration_payment=Txn(PaymentType, First, App, 2 * DealListCost),
+    )
+    return call._replace(**changes)
+
+
+def unmatched_deal(legs: list[DealLeg] = ()) -> dict[bytes, bytes]:
+    # Created by First, waiting for Second to deposit 5 of asset 7
+    deal = Deal(1, 0, First, 10**6, 0, 0, 0, Second, 5, 7, 0, 0, 0, 0, 0, 0x10, Note)
+    boxes = {First: deal_list(DealKey), Second: deal_list(DealKey)}
+    if legs:
+        deal = deal._replace(first_acc_data=DealLegsFlag)
+        boxes[legs_box_key(DealKey)] = encode_legs(legs)
+    boxes[DealKey] = encode_deal(deal)
+    return boxes
+
+
+def match_call(**changes) -> MatchDeal:
+    call = MatchDeal(
+        sender=Second,
+        deposit_payment=Txn(
+            AssetTransferType, Second, asset_receiver=App, asset_amount=5, xfer_asset=7
+        ),
+        collateral_payment=Txn(PaymentType, Second, App, 0),
+        deal_key=DealKey,
+        key_index=0,
+        their_address=First,
+        their_key_index=0,
+    )
+    return call._replace(**changes)
+
+
+def test_create_deal():
+    state = AppState(App, b"active", {})
+    assert check_create_deal(state, create_call()) is None
+    assert check_create_deal(state._replace(status=b"paused"), create_call()) == (
+        "App is active"
+    )
+    assert check_create_deal(state, create_call(their_address=First)) == (
+        "Addresses not equal"
+    )
+    assert (
+        check_create_deal(
+            state, create_call(deposit_payment=Txn(PaymentType, First, App, 1))
+        )
+        == "Deposit payment matches args"
+    )
+    assert (
+        check_create_deal(
+            state, create_call(registration_payment=Txn(PaymentType, First, App, 1))
+        )
+        == "Registrations cost = Algos paid"
+    )
+
+
+def test_create_deal_existing_boxes():
+    state = AppState(App, b"active", {DealKey: b""})
+    assert check_create_deal(state, create_call()) == "Deal does not already exist"
+    state = AppState(App, b"active", {twin_deal_key(DealKey): b""})
+    assert check_create_deal(state, create_call()) == (
+        "No deal of the other kind exists"
+    )
+    assert check_create_deal(state, create_call(), hashed=True) == (
+        "Deal does not already exist"
+    )
+    taken = AppState(App, b"active", {First: deal_list(b"D" * 33)})
+    assert check_create_deal(taken, create_call()) == "deal_key[index] is zero bytes"
+
+
+def test_match_deal():
+    state = AppState(App, b"active", unmatched_deal())
+    assert check_match_deal(state, match_call()) is None
+    assert check_match_deal(state, match_call(sender=First, their_address=Second)) == (
+        "Deposit sender is caller"
+    )
+    assert check_match_deal(state, match_call(key_index=1)) == (
+        "Deal key in sender list"
+    )
+    wrong_amount = match_call().deposit_payment._replace(asset_amount=4)
+    assert check_match_deal(state, match_call(deposit_payment=wrong_amount)) == (
+        "Deposit amount matches deal"
+    )
+
+
+def test_match_deal_legs():
+    state = AppState(App, b"active", unmatched_deal([DealLeg(LegSecondAccount, 0, 3)]))
+    payment = Txn(PaymentType, Second, App, 3)
+    assert check_match_deal(state, match_call()) == "Leg payment matches deal"
+    assert check_match_deal(state, match_call(leg_payments=(payment,))) is None
+    assert (
+        check_match_deal(state, match_call(leg_payments=(payment._replace(amount=2),)))
+        == "Leg payment matches deal"
+    )
+    assert check_match_deal(state, match_call(leg_payments=(payment, payment))) == (
+        "Leg payments end the group"
+    )
+
+
+def test_close_out_asas():
+    state = AppState(App, b"active", unmatched_deal([DealLeg(LegSecondAccount, 9, 3)]))
+    assert check_close_out_asas(state, []) == "At least one asset"
+    assert check_close_out_asas(state, [7]) == "Asset awaited by an unmatched deal"
+    assert check_close_out_asas(state, [9]) == "Asset awaited by an unmatched deal"
+    assert check_close_out_asas(state, [8]) is None
+
+
+# The same checks against the contract on localnet: every case builds one group
+# and the CreateDeal or MatchDeal it amounts to, and the validator has to name
+# the assert the contract rejects the group with.
+
+
+def localnet_state(alright) -> AppState:
+    return AppState(
+        address_bytes(alright.app_address),
+        alright.client.get_global_state()["status"].encode(),
+        dict(algod_boxes(alright.algod, alright.app_id)),
+    )
+
+
+def as_txn(signed) -> Txn:
+    txn = signed.txn
+    if isinstance(txn, transaction.AssetTransferTxn):
+        return Txn(
+            AssetTransferType,
+            address_bytes(txn.sender),
+            asset_receiver=address_bytes(txn.receiver),
+            asset_amount=txn.amount,
+            xfer_asset=txn.index,
+        )
+    return Txn(
+        PaymentType, address_bytes(txn.sender), address_bytes(txn.receiver), txn.amt
+    )
+
+
+def contract_agrees(alright, failed: str | None, txns) -> bool:
+    if failed is None:
+        alright.send(*txns)
+        return True
+    return alright.rejected(*txns) == failed
+
+
+def create_case(alright, sender, partner, hashed=False, **changes):
+    # Algo deposit of 100_000 and collateral of 50_000 against 200_000
+    state = localnet_state(alright)
+    sender_key = address_bytes(sender.address)
+    partner_key = address_bytes(partner.address)
+    registration = DealListCost * [
+        state.boxes.get(sender_key),
+        state.boxes.get(partner_key),
+    ].count(None)
+    txns = {
+        "deposit_payment": alright.pay(sender, 100_000),
+        "collateral_payment": alright.pay(sender, 50_000),
+        "registration_payment": alright.pay(sender, registration),
+    }
+    txns.update((name, changes.pop(name)) for name in list(txns) if name in changes)
+    call = CreateDeal(
+        sender=sender_key,
+        deposit_payment=as_txn(txns["deposit_payment"]),
+        collateral_payment=as_txn(txns["collateral_payment"]),
+        key_index=free_key_index(state.boxes.get(sender_key)),
+        your_dep_amount=100_000,
+        your_dep_asset=0,
+        your_col_amount=50_000,
+        your_col_asset=0,
+        their_address=partner_key,
+        their_key_index=free_key_index(state.boxes.get(partner_key)),
+        their_dep_amount=200_000,
+        their_dep_asset=0,
+        their_col_amount=0,
+        their_col_asset=0,
+        deal_note=b"terms",
+        registration_payment=as_txn(txns["registration_payment"]),
+    )._replace(**changes)
+    prefix = HashedDealKeyPrefix if hashed else b"D"
+    deal_key = create_deal_key(sender_key, call.their_address, call.deal_note, prefix)
+    method = runtime.create_hashed_deal if hashed else runtime.create_deal
+    app_call = alright.app_call(
+        sender,
+        method(*call[3:8], encode_address(call.their_address), *call[9:15]),
+        [sender_key, call.their_address, deal_key, twin_deal_key(deal_key)],
+    )
+    group = [
+        txns["deposit_payment"],
+        txns["collateral_payment"],
+        txns["registration_payment"],
+        app_call,
+    ]
+    return check_create_deal(state, call, hashed), group
+
+
+def test_create_deal_rules_match_contract(alright):
+    cases = [
+        (None, {}),
+        ("Addresses not equal", {"their_address": "sender"}),
+        ("Deposit sender is caller", {"deposit_payment": ("partner", 100_000)}),
+        ("Deposit payment matches args", {"deposit_payment": ("sender", 99_999)}),
+        ("Collateral sender is caller", {"collateral_payment": ("partner", 50_000)}),
+        ("Collateral payment matches args", {"collateral_payment": ("sender", 1)}),
+        ("deal_note string length<=872", {"deal_note": b"x" * 873}),
+        ("Registrations cost = Algos paid", {"registration_payment": ("sender", 1)}),
+        (
+            "Created boxes cost < Algos deposited",
+            {
+                "your_dep_amount": 1000,
+                "your_col_amount": 0,
+                "deposit_payment": ("sender", 1000),
+                "collateral_payment": ("sender", 0),
+            },
+        ),
+    ]
+    for expected, changes in cases:
+        sender, partner = alright.account(), alright.account()
+        accounts = {"sender": sender, "partner": partner}
+        for name, change in changes.items():
+            if name == "their_address":
+                changes[name] = address_bytes(accounts[change].address)
+            elif name.endswith("_payment"):
+                changes[name] = alright.pay(accounts[change[0]], change[1])
+        failed, group = create_case(alright, sender, partner, **changes)
+        assert failed == expected
+        assert contract_agrees(alright, failed, group), expected
+
+
+def test_create_deal_box_rules_match_contract(alright):
+    sender, partner = alright.account(), alright.account()
+    registration = DealListCost * 2
+    wrong_receiver = alright.pay(sender, registration, receiver=partner.address)
+    failed, group = create_case(
+        alright, sender, partner, registration_payment=wrong_receiver
+    )
+    assert failed == "Registration payment receiver is app address"
+    assert contract_agrees(alright, failed, group)
+
+    alright.create_deal(sender, partner, b"terms")
+    failed, group = create_case(alright, sender, partner)
+    assert failed == "Deal does not already exist"
+    assert contract_agrees(alright, failed, group)
+    failed, group = create_case(alright, sender, partner, hashed=True)
+    assert failed == "No deal of the other kind exists"
+    assert contract_agrees(alright, failed, group)
+    failed, group = create_case(
+        alright, sender, partner, deal_note=b"more", key_index=0
+    )
+    assert failed == "deal_key[index] is zero bytes"
+    assert contract_agrees(alright, failed, group)
+
+    alright.client.call("change_status", new_status="paused")
+    failed, group = create_case(alright, sender, partner, deal_note=b"more")
+    assert failed == "App is active"
+    assert contract_agrees(alright, failed, group)
+
+
+def match_case(alright, sender, partner, deal_key, leg_payments=(), **changes):
+    # The sender deposits 200_000 and no collateral, as create_case's deals ask
+    state = localnet_state(alright)
+    txns = {
+        "deposit_payment": alright.pay(sender, 200_000),
+        "collateral_payment": alright.pay(sender, 0),
+    }
+    txns.update((name, changes.pop(name)) for name in list(txns) if name in changes)
+    call = MatchDeal(
+        sender=address_bytes(sender.address),
+        deposit_payment=as_txn(txns["deposit_payment"]),
+        collateral_payment=as_txn(txns["collateral_payment"]),
+        deal_key=deal_key,
+        key_index=alright.key_index(sender, deal_key),
+        their_address=address_bytes(partner.address),
+        their_key_index=alright.key_index(partner, deal_key),
+        leg_payments=tuple(as_txn(txn) for txn in leg_payments),
+    )._replace(**changes)
+    app_call = alright.app_call(
+        sender,
+        runtime.match_deal(
+            deal_key, call.key_index, partner.address, call.their_key_index
+        ),
+        alright.deal_boxes(sender, partner, deal_key),
+    )
+    group = [
+        txns["deposit_payment"],
+        txns["collateral_payment"],
+        app_call,
+        *leg_payments,
+    ]
+    return check_match_deal(state, call), group
+
+
+def test_match_deal_rules_match_contract(alright):
+    creator, partner = alright.account(), alright.account()
+    deal_key = alright.create_deal(creator, partner, b"terms")
+    cases = [
+        ("Deposit sender is caller", {"deposit_payment": (creator, 200_000)}),
+        ("Collateral sender is caller", {"collateral_payment": (creator, 0)}),
+        ("Deal key in sender list", {"key_index": 1}),
+        ("Deal key in their list", {"their_key_index": 1}),
+        ("Deposit amount matches deal", {"deposit_payment": (partner, 199_999)}),
+        ("Collateral amount matches deal", {"collateral_payment": (partner, 1)}),
+    ]
+    for expected, changes in cases:
+        for name, change in changes.items():
+            if name.endswith("_payment"):
+                changes[name] = alright.pay(*change)
+        failed, group = match_case(alright, partner, creator, deal_key, **changes)
+        assert failed == expected
+        assert contract_agrees(alright, failed, group), expected
+
+    wrong_receiver = alright.pay(partner, 200_000, receiver=creator.address)
+    failed, group = match_case(
+        alright, partner, creator, deal_key, deposit_payment=wrong_receiver
+    )
+    assert failed == "Deposit receiver is app address"
+    assert contract_agrees(alright, failed, group)
+    # The creator cannot match their own deal
+    failed, group = match_case(
+        alright,
+        creator,
+        partner,
+        deal_key,
+        deposit_payment=alright.pay(creator, 100_000),
+        collateral_payment=alright.pay(creator, 50_000),
+    )
+    assert failed == "Status transition allowed"
+    assert contract_agrees(alright, failed, group)
+
+    failed, group = match_case(alright, partner, creator, deal_key)
+    assert failed is None
+    assert contract_agrees(alright, failed, group)
+
+
+def test_match_deal_leg_rules_match_contract(alright):
+    creator, partner = alright.account(), alright.account()
+    deal_key = alright.create_deal(creator, partner, b"terms")
+    partner_side = (
+        LegSecondAccount
+        if address_bytes(creator.address) > address_bytes(partner.address)
+        else 0
+    )
+    alright.add_deal_legs(creator, partner, deal_key, [DealLeg(partner_side, 0, 3000)])
+    for expected, amounts in (
+        ("Leg payment matches deal", (2999,)),
+        ("Leg payments end the group", (3000, 3000)),
+        (None, (3000,)),
+    ):
+        leg_payments = [alright.pay(partner, amount) for amount in amounts]
+        failed, group = match_case(
+            alright, partner, creator, deal_key, leg_payments=leg_payments
+        )
+        assert failed == expected
+        assert contract_agrees(alright, failed, group), expected